@@ -2,11 +2,14 @@ from __future__ import annotations
 
 import logging
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Optional
 
-from .config import load_config
-from .openai_compat import chat_completion, from_config_dict
+from .config import load_config, resolve_paths
+from .embed_cache import get_or_compute
+from .openai_compat import chat_completion, chat_completion_stream, embed, from_config_dict
 from .search import RetrievedChunk, search_kb
+from .semantic_cache import lookup_answer, store_answer
+from .util import resolve_path_cached
 
 logger = logging.getLogger(__name__)
 
@@ -18,13 +21,31 @@ def ask_kb(
     top_context: int,
     semantic: bool,
     hybrid: bool,
+    on_delta: Optional[Callable[[str], None]] = None,
 ) -> dict[str, Any]:
-    kb_root = kb_root.expanduser().resolve()
+    kb_root = resolve_path_cached(kb_root)
     cfg = load_config(kb_root)
     oa_cfg = from_config_dict(cfg.get("openai_compat", {}) if isinstance(cfg, dict) else {})
 
     mode = "hybrid" if hybrid else ("semantic" if semantic else "fts")
     logger.info("ask mode=%s top_context=%d", mode, int(top_context))
+
+    paths = resolve_paths(kb_root)
+    query_vec = None
+    if (semantic or hybrid) and oa_cfg.base_url and oa_cfg.model_embed:
+        query_vec = get_or_compute(
+            paths.vector_dir,
+            model_id=oa_cfg.model_embed,
+            text=query,
+            compute=lambda: embed(oa_cfg, texts=[query])[0],
+        )
+        cached = lookup_answer(paths.vector_dir, model_id=oa_cfg.model_embed, query_vec=query_vec)
+        if cached is not None:
+            logger.info("ask answered from semantic cache")
+            if on_delta is not None:
+                on_delta(cached["answer"])
+            return {"query": query, "answer": cached["answer"], "sources": cached["sources"], "cached": True}
+
     chunks = search_kb(
         kb_root,
         query=query,
@@ -42,9 +63,26 @@ def ask_kb(
         {"role": "user", "content": f"Question:\n{query}\n\nSources:\n{sources_text}"},
     ]
     logger.info("ask calling chat completion")
-    answer = chat_completion(oa_cfg, messages=messages)
+    if on_delta is not None:
+        pieces: list[str] = []
+        for piece in chat_completion_stream(oa_cfg, messages=messages):
+            pieces.append(piece)
+            on_delta(piece)
+        answer = "".join(pieces)
+    else:
+        answer = chat_completion(oa_cfg, messages=messages)
     logger.info("ask done answer_chars=%d", len(answer))
-    return {"query": query, "answer": answer, "sources": [c.to_dict() for c in chunks]}
+    sources = [c.to_dict() for c in chunks]
+    if query_vec is not None:
+        store_answer(
+            paths.vector_dir,
+            model_id=oa_cfg.model_embed,
+            query=query,
+            query_vec=query_vec,
+            answer=answer,
+            sources=sources,
+        )
+    return {"query": query, "answer": answer, "sources": sources}
 
 
 def _format_sources(chunks: list[RetrievedChunk]) -> str:
@@ -1,25 +1,64 @@
 from __future__ import annotations
 
-import json
+import hashlib
 import logging
+import math
 import os
 import re
+import threading
 from pathlib import Path
 from typing import Any, Optional
 
 from .config import load_config, resolve_paths
 from .fs_ops import ensure_dir_meta_chain, merge_meta, read_dir_meta
 from .openai_compat import OpenAICompatError, chat_completion, from_config_dict
-from .util import ensure_rel_under_base, now_iso, write_json_atomic
+from .util import ensure_rel_under_base, json_dumps_compact, json_loads, now_iso, resolve_path_cached, write_json_atomic
 
 logger = logging.getLogger(__name__)
 
+# autoadd 批次跑在线程池里，同一目标目录的 meta.json 读-合并-写必须串行，
+# 否则两个批次交错会互相覆盖、丢掉一方合并进去的 tags/keywords
+_meta_write_lock = threading.Lock()
+
 
 _re_json_obj = re.compile(r"\{[\s\S]*\}")
 
+# 提示词中 existing_dirs 的字段缩写，需与 _PROMPT_DIRS_LEGEND 保持一致
+_DIR_FIELD_ALIASES = (("r", "rel_dir"), ("t", "title"), ("s", "summary"), ("g", "tags"), ("k", "keywords"), ("d", "dir_type"))
+
+_PROMPT_DIRS_LEGEND = "existing_dirs 条目字段缩写：r=rel_dir, t=title, s=summary, g=tags, k=keywords, d=dir_type。"
+
+_SYSTEM_PROMPT = (
+    "你是一个本地知识库的归档助手。根据目录元数据与文档内容，输出严格 JSON，不要输出多余文字。" + _PROMPT_DIRS_LEGEND
+)
+
+# 提示词中最多携带的目录条数：超出时按与文档的词频相关度裁剪
+_MAX_PROMPT_DIRS = 30
+
+_re_token = re.compile(r"[0-9A-Za-z]+|[一-鿿]")
+
+_re_unsafe_filename = re.compile(r"[^0-9A-Za-z一-鿿._-]+")
+
+# ASCII 快路径：不安全字符映射为 '_'，C 层完成，无需正则
+_ASCII_FILENAME_TRANS = {
+    c: "_" for c in range(128) if chr(c) not in "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz._-"
+}
+
+
+# 内容哈希 -> LLM 建议；同一进程内重复内容（inbox 重复件、模板件）只询问一次
+_llm_suggest_cache: dict[bytes, dict[str, Any]] = {}
+
+_LLM_SUGGEST_CACHE_MAX = 256
+
 
 def suggest_destination_with_llm(kb_root: Path, *, src_text: str, src_name: str) -> dict[str, Any]:
-    kb_root = kb_root.expanduser().resolve()
+    cache_key = hashlib.blake2b(src_text.encode("utf-8"), digest_size=16).digest()
+    cached = _llm_suggest_cache.get(cache_key)
+    if cached is not None:
+        logger.info("llm suggest cache hit src=%s", src_name)
+        return cached
+
+    kb_root = resolve_path_cached(kb_root)
     cfg = load_config(kb_root)
     oa_cfg = from_config_dict(cfg.get("openai_compat", {}) if isinstance(cfg, dict) else {})
     dirs = _collect_dir_summaries(resolve_paths(kb_root).kb_dir, meta_filename=str(cfg.get("meta_filename", "meta.json")))
@@ -32,14 +71,14 @@ def suggest_destination_with_llm(kb_root: Path, *, src_text: str, src_name: str)
     messages = [
         {
             "role": "system",
-            "content": "你是一个本地知识库的归档助手。根据目录元数据与文档内容，输出严格 JSON，不要输出多余文字。",
+            "content": _SYSTEM_PROMPT,
         },
         {
             "role": "user",
-            "content": json.dumps(
+            "content": json_dumps_compact(
                 {
                     "now": now_iso(),
-                    "existing_dirs": dirs,
+                    "existing_dirs": _prompt_dirs(dirs, query_text=excerpt),
                     "document": {"filename": src_name, "excerpt": excerpt},
                     "required_json_schema": {
                         "doc_title": "string",
@@ -58,8 +97,7 @@ def suggest_destination_with_llm(kb_root: Path, *, src_text: str, src_name: str)
                         "dir_meta_chain 可选：用于为目录链路中多个目录分别补全/新建元数据（例如 A、A/B、A/B/C）",
                         "如果 suggested_rel_dir 不在 existing_dirs 中（即新目录），请至少提供该目录的 dir_meta 或在 dir_meta_chain 中覆盖该目录",
                     ],
-                },
-                ensure_ascii=False,
+                }
             ),
         },
     ]
@@ -67,9 +105,75 @@ def suggest_destination_with_llm(kb_root: Path, *, src_text: str, src_name: str)
     obj = _extract_json_object(raw)
     if not isinstance(obj, dict):
         raise OpenAICompatError("invalid JSON from model")
+    if len(_llm_suggest_cache) >= _LLM_SUGGEST_CACHE_MAX:
+        _llm_suggest_cache.clear()
+    _llm_suggest_cache[cache_key] = obj
     return obj
 
 
+def suggest_destinations_batch(kb_root: Path, *, docs: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    kb_root = resolve_path_cached(kb_root)
+    cfg = load_config(kb_root)
+    oa_cfg = from_config_dict(cfg.get("openai_compat", {}) if isinstance(cfg, dict) else {})
+    dirs = _collect_dir_summaries(resolve_paths(kb_root).kb_dir, meta_filename=str(cfg.get("meta_filename", "meta.json")))
+
+    documents = []
+    for d in docs:
+        excerpt = str(d.get("excerpt", "")).strip()
+        if len(excerpt) > 4000:
+            excerpt = excerpt[:4000]
+        documents.append({"filename": str(d.get("filename", "")), "excerpt": excerpt})
+
+    logger.info("llm suggest batch docs=%d dirs=%d", len(documents), len(dirs))
+    query_text = "\n".join(d["excerpt"] for d in documents)
+    messages = [
+        {
+            "role": "system",
+            "content": _SYSTEM_PROMPT,
+        },
+        {
+            "role": "user",
+            "content": json_dumps_compact(
+                {
+                    "now": now_iso(),
+                    "existing_dirs": _prompt_dirs(dirs, query_text=query_text),
+                    "documents": documents,
+                    "required_json_schema": {
+                        "suggestions": [
+                            {
+                                "doc_title": "string",
+                                "doc_summary": "string",
+                                "tags": ["string"],
+                                "keywords": ["string"],
+                                "suggested_rel_dir": "string",
+                                "suggested_filename": "string",
+                                "dir_meta": "object",
+                                "dir_meta_chain": [{"rel_dir": "string", "dir_meta": "object"}],
+                            }
+                        ]
+                    },
+                    "constraints": [
+                        "suggestions 数组长度必须与 documents 相同，且按相同顺序一一对应",
+                        "suggested_rel_dir 必须是 kb/ 下的相对路径，不能包含 .. 或绝对路径",
+                        "suggested_filename 可选，若为空使用原文件名",
+                        "dir_meta 仅在需要新建目录或补全目录元数据时给出（默认作用于 suggested_rel_dir）",
+                        "dir_meta_chain 可选：用于为目录链路中多个目录分别补全/新建元数据（例如 A、A/B、A/B/C）",
+                        "如果 suggested_rel_dir 不在 existing_dirs 中（即新目录），请至少提供该目录的 dir_meta 或在 dir_meta_chain 中覆盖该目录",
+                    ],
+                }
+            ),
+        },
+    ]
+    raw = chat_completion(oa_cfg, messages=messages)
+    obj = _extract_json_object(raw)
+    if not isinstance(obj, dict):
+        raise OpenAICompatError("invalid JSON from model")
+    suggestions = obj.get("suggestions")
+    if not isinstance(suggestions, list) or len(suggestions) != len(documents):
+        raise OpenAICompatError("invalid suggestions array from model")
+    return [s if isinstance(s, dict) else {} for s in suggestions]
+
+
 def apply_auto_suggestion(
     kb_root: Path,
     *,
@@ -86,7 +190,6 @@ def apply_auto_suggestion(
 
     paths = resolve_paths(kb_root)
     target_dir = paths.kb_dir / rel_dir if rel_dir else paths.kb_dir
-    ensure_dir_meta_chain(paths.kb_dir, rel_dir=rel_dir, meta_filename=meta_filename)
     patches_by_rel_dir: dict[str, dict[str, Any]] = {}
 
     def _merge_patch(existing_patch: dict[str, Any], incoming_patch: dict[str, Any]) -> dict[str, Any]:
@@ -124,14 +227,31 @@ def apply_auto_suggestion(
         patches_by_rel_dir.setdefault(rel_dir, {})
         patches_by_rel_dir[rel_dir] = _merge_patch(patches_by_rel_dir[rel_dir], dir_meta_patch)
 
-    for p_rel_dir in sorted(patches_by_rel_dir.keys(), key=lambda x: (0 if x == "" else x.count("/") + 1, x)):
-        p_target_dir = paths.kb_dir / p_rel_dir if p_rel_dir else paths.kb_dir
-        ensure_dir_meta_chain(paths.kb_dir, rel_dir=p_rel_dir, meta_filename=meta_filename)
-        existing = read_dir_meta(p_target_dir, meta_filename=meta_filename)
-        merged = merge_meta(existing, patches_by_rel_dir[p_rel_dir])
-        write_json_atomic(p_target_dir / meta_filename, merged)
+    # rel_dir 链路上的目录已由上面的 ensure_dir_meta_chain 创建，无需重复保障
+    chain_dirs = {""}
+    acc = ""
+    for part in rel_dir.split("/") if rel_dir else []:
+        acc = part if not acc else f"{acc}/{part}"
+        chain_dirs.add(acc)
 
-    merged = read_dir_meta(target_dir, meta_filename=meta_filename)
+    merged_by_rel_dir: dict[str, dict[str, Any]] = {}
+    # 落盘阶段整体持锁：并发批次可能写同一目录的 meta.json，
+    # 读-合并-写不串行会丢失更新
+    with _meta_write_lock:
+        ensure_dir_meta_chain(paths.kb_dir, rel_dir=rel_dir, meta_filename=meta_filename)
+        for p_rel_dir in sorted(patches_by_rel_dir.keys(), key=lambda x: (0 if x == "" else x.count("/") + 1, x)):
+            p_target_dir = paths.kb_dir / p_rel_dir if p_rel_dir else paths.kb_dir
+            if p_rel_dir not in chain_dirs:
+                ensure_dir_meta_chain(paths.kb_dir, rel_dir=p_rel_dir, meta_filename=meta_filename)
+            existing = read_dir_meta(p_target_dir, meta_filename=meta_filename)
+            merged, changed = merge_meta(existing, patches_by_rel_dir[p_rel_dir])
+            if changed:
+                write_json_atomic(p_target_dir / meta_filename, merged)
+            merged_by_rel_dir[p_rel_dir] = merged
+
+        merged = merged_by_rel_dir.get(rel_dir)
+        if merged is None:
+            merged = read_dir_meta(target_dir, meta_filename=meta_filename)
     logger.info("apply suggestion rel_dir=%s filename=%s", rel_dir, filename)
     return rel_dir, filename, merged
 
@@ -145,47 +265,142 @@ def default_filename(src_path: Path, *, title: Optional[str] = None) -> str:
     if name.lower().endswith(".md"):
         return name
     base = (title or src_path.stem).strip() or src_path.stem
-    safe = re.sub(r"[^0-9A-Za-z\u4e00-\u9fff._-]+", "_", base).strip("_")
+    if base.isascii():
+        safe = base.translate(_ASCII_FILENAME_TRANS)
+        while "__" in safe:
+            safe = safe.replace("__", "_")
+        safe = safe.strip("_")
+    else:
+        safe = _re_unsafe_filename.sub("_", base).strip("_")
     return f"{safe}.md" if safe else f"{src_path.stem}.md"
 
 
+# meta_path -> ((mtime_ns, size), parsed meta)；避免每次 autoadd 重复解析未变化的 meta.json
+_dir_meta_cache: dict[str, tuple[tuple[int, int], dict[str, Any]]] = {}
+
+_MAX_DIR_SUMMARIES = 200
+_MAX_DIR_DEPTH = 4
+
+
 def _collect_dir_summaries(kb_dir: Path, *, meta_filename: str) -> list[dict[str, Any]]:
     out: list[dict[str, Any]] = []
-    for dirpath, dirnames, filenames in os.walk(kb_dir):
-        rel = Path(dirpath).relative_to(kb_dir).as_posix() or "."
-        depth = 0 if rel == "." else rel.count("/") + 1
-        if depth > 4:
-            dirnames[:] = []
-            continue
-        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
-        if meta_filename not in filenames:
-            continue
-        meta = read_dir_meta(Path(dirpath), meta_filename=meta_filename)
-        out.append(
-            {
-                "rel_dir": rel,
-                "title": str(meta.get("title", "")),
-                "summary": str(meta.get("summary", "")),
-                "tags": meta.get("tags", []),
-                "keywords": meta.get("keywords", []),
-                "dir_type": str(meta.get("dir_type", "")),
-            }
-        )
-        if len(out) >= 200:
-            break
+
+    def scan(dir_path: str, rel: str, depth: int) -> None:
+        if len(out) >= _MAX_DIR_SUMMARIES:
+            return
+        meta_stat = None
+        subdirs: list[os.DirEntry] = []
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry)
+                    elif entry.name == meta_filename:
+                        try:
+                            meta_stat = entry.stat()
+                        except OSError:
+                            meta_stat = None
+        except OSError:
+            return
+        if meta_stat is not None:
+            meta = _read_meta_cached(os.path.join(dir_path, meta_filename), meta_stat)
+            out.append(
+                {
+                    "rel_dir": rel,
+                    "title": str(meta.get("title", "")),
+                    "summary": str(meta.get("summary", "")),
+                    "tags": meta.get("tags", []),
+                    "keywords": meta.get("keywords", []),
+                    "dir_type": str(meta.get("dir_type", "")),
+                }
+            )
+        if depth >= _MAX_DIR_DEPTH:
+            return
+        for entry in sorted(subdirs, key=lambda e: e.name):
+            if len(out) >= _MAX_DIR_SUMMARIES:
+                return
+            child_rel = entry.name if rel == "." else f"{rel}/{entry.name}"
+            scan(entry.path, child_rel, depth + 1)
+
+    scan(str(kb_dir), ".", 0)
     return out
 
 
-def _extract_json_object(raw: str) -> Any:
-    raw = raw.strip()
+def _prompt_dirs(dirs: list[dict[str, Any]], *, query_text: str) -> list[dict[str, Any]]:
+    """裁剪并压缩目录摘要：按 TF-IDF 相关度取前 _MAX_PROMPT_DIRS 条，字段名替换为单字母缩写。"""
+    kept = _rank_dirs(dirs, query_text=query_text) if len(dirs) > _MAX_PROMPT_DIRS else dirs
+    return [{alias: d.get(field) for alias, field in _DIR_FIELD_ALIASES} for d in kept]
+
+
+def _rank_dirs(dirs: list[dict[str, Any]], *, query_text: str) -> list[dict[str, Any]]:
+    docs_tokens: list[list[str]] = []
+    df: dict[str, int] = {}
+    for d in dirs:
+        text = " ".join(
+            [
+                str(d.get("rel_dir", "")),
+                str(d.get("title", "")),
+                str(d.get("summary", "")),
+                " ".join(str(x) for x in d.get("tags", []) or []),
+                " ".join(str(x) for x in d.get("keywords", []) or []),
+            ]
+        )
+        tokens = _re_token.findall(text.lower())
+        docs_tokens.append(tokens)
+        for t in set(tokens):
+            df[t] = df.get(t, 0) + 1
+
+    query_tokens = set(_re_token.findall(query_text.lower()))
+    n = len(dirs)
+    scored: list[tuple[float, int]] = []
+    for i, tokens in enumerate(docs_tokens):
+        counts: dict[str, int] = {}
+        for t in tokens:
+            counts[t] = counts.get(t, 0) + 1
+        score = 0.0
+        for t in query_tokens:
+            tf = counts.get(t)
+            if tf:
+                score += (1.0 + math.log(tf)) * math.log(1.0 + n / df[t])
+        scored.append((score, i))
+
+    # 分数并列时保持原顺序（靠前目录通常更接近根目录）
+    scored.sort(key=lambda x: (-x[0], x[1]))
+    keep = sorted(i for _, i in scored[:_MAX_PROMPT_DIRS])
+    return [dirs[i] for i in keep]
+
+
+def _read_meta_cached(meta_path: str, st: os.stat_result) -> dict[str, Any]:
+    sig = (int(getattr(st, "st_mtime_ns", int(st.st_mtime * 1e9))), int(st.st_size))
+    cached = _dir_meta_cache.get(meta_path)
+    if cached is not None and cached[0] == sig:
+        return cached[1]
     try:
-        return json.loads(raw)
+        meta = json_loads(Path(meta_path).read_text(encoding="utf-8"))
     except Exception:
-        pass
-    m = _re_json_obj.search(raw)
+        meta = {}
+    if not isinstance(meta, dict):
+        meta = {}
+    _dir_meta_cache[meta_path] = (sig, meta)
+    return meta
+
+
+def _extract_json_object(raw: str) -> Any:
+    raw = raw.strip()
+    if raw[:1] in ("{", "["):
+        try:
+            return json_loads(raw)
+        except Exception:
+            pass
+    start = raw.find("{")
+    if start < 0:
+        return None
+    m = _re_json_obj.search(raw, start)
     if not m:
         return None
     try:
-        return json.loads(m.group(0))
+        return json_loads(m.group(0))
     except Exception:
         return None
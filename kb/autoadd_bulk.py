@@ -1,22 +1,33 @@
 from __future__ import annotations
 
 import logging
+import mmap
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Optional
 
-from .importer import add_to_kb
+from .auto_add import suggest_destinations_batch
+from .importer import add_to_kb, add_with_suggestion
+from .openai_compat import OpenAICompatError
+from .util import fast_content_hash, resolve_path_cached
 
 logger = logging.getLogger(__name__)
 
+_DEFAULT_WORKERS = 4
+
+# 单次 LLM 请求携带的文档数：目录摘要等前缀只发一次，摊薄到 K 个文件
+_BATCH_SIZE = 8
+
 
 def autoadd_inbox(
     kb_root: Path,
     *,
     inbox_dir: Optional[Path] = None,
     move: bool = True,
+    max_workers: int = _DEFAULT_WORKERS,
 ) -> dict[str, Any]:
-    kb_root = kb_root.expanduser().resolve()
+    kb_root = resolve_path_cached(kb_root)
     inbox_dir = (inbox_dir or (kb_root / "_inbox")).expanduser().resolve()
     if not inbox_dir.exists():
         logger.info("autoadd: inbox not found: %s", str(inbox_dir))
@@ -37,27 +48,74 @@ def autoadd_inbox(
     files = list(_walk_inbox_files(inbox_dir))
     logger.info("autoadd: inbox=%s files=%d move=%s", str(inbox_dir), len(files), bool(move))
 
-    for i, abs_path in enumerate(files, start=1):
-        processed += 1
+    text_files: list[tuple[Path, str, str]] = []
+    seen_hashes: dict[str, str] = {}
+    for abs_path in files:
         try:
             rel = abs_path.relative_to(inbox_dir).as_posix()
         except Exception:
             rel = abs_path.as_posix()
-
         if _is_probably_binary(abs_path):
+            processed += 1
             skipped.append({"src": rel, "reason": "binary"})
-            if i == 1 or i == len(files) or (i % 20 == 0):
-                logger.info("autoadd progress %d/%d (skipped binary) src=%s", i, len(files), rel)
             continue
-
         try:
-            out = add_to_kb(kb_root, src=abs_path, dest_rel_dir=None, auto=True, move=move)
-            imported.append({"src": rel, "result": out})
-            if i == 1 or i == len(files) or (i % 20 == 0):
-                logger.info("autoadd progress %d/%d imported src=%s", i, len(files), rel)
+            raw = abs_path.read_bytes()
         except Exception as e:
+            processed += 1
             errors.append({"src": rel, "error": str(e)})
-            logger.warning("autoadd failed src=%s error=%s", rel, str(e))
+            continue
+        content_hash = fast_content_hash(raw)
+        first_rel = seen_hashes.get(content_hash)
+        if first_rel is not None:
+            processed += 1
+            skipped.append({"src": rel, "reason": "duplicate", "duplicate_of": first_rel})
+            continue
+        seen_hashes[content_hash] = rel
+        text_files.append((abs_path, rel, raw.decode("utf-8", errors="replace")))
+
+    batches = [text_files[i : i + _BATCH_SIZE] for i in range(0, len(text_files), _BATCH_SIZE)]
+    workers = max(1, min(int(max_workers), len(batches) or 1))
+
+    def process_batch(items: list[tuple[Path, str, str]]) -> list[tuple[str, dict[str, Any]]]:
+        results: list[tuple[str, dict[str, Any]]] = []
+        suggestions = None
+        try:
+            suggestions = suggest_destinations_batch(
+                kb_root, docs=[{"filename": p.name, "excerpt": t} for p, _, t in items]
+            )
+        except OpenAICompatError as e:
+            logger.warning("autoadd batch suggestion failed, fallback to per-file: %s", str(e))
+
+        if suggestions is None:
+            for abs_path, rel, _text in items:
+                try:
+                    out = add_to_kb(kb_root, src=abs_path, dest_rel_dir=None, auto=True, move=move)
+                    results.append(("imported", {"src": rel, "result": out}))
+                except Exception as e:
+                    logger.warning("autoadd failed src=%s error=%s", rel, str(e))
+                    results.append(("error", {"src": rel, "error": str(e)}))
+            return results
+
+        for (abs_path, rel, text), suggestion in zip(items, suggestions):
+            try:
+                out = add_with_suggestion(kb_root, src=abs_path, suggestion=suggestion, move=move, src_text=text)
+                results.append(("imported", {"src": rel, "result": out}))
+            except Exception as e:
+                logger.warning("autoadd failed src=%s error=%s", rel, str(e))
+                results.append(("error", {"src": rel, "error": str(e)}))
+        return results
+
+    if batches:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for bi, batch_results in enumerate(pool.map(process_batch, batches), start=1):
+                for kind, payload in batch_results:
+                    processed += 1
+                    if kind == "imported":
+                        imported.append(payload)
+                    else:
+                        errors.append(payload)
+                logger.info("autoadd progress batch %d/%d processed=%d", bi, len(batches), processed)
 
     logger.info("autoadd done processed=%d imported=%d skipped=%d errors=%d", processed, len(imported), len(skipped), len(errors))
     return {
@@ -71,18 +129,39 @@ def autoadd_inbox(
 
 
 def _walk_inbox_files(inbox_dir: Path):
-    for dirpath, dirnames, filenames in os.walk(inbox_dir):
-        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
-        for name in filenames:
-            if name.startswith("."):
+    stack = [str(inbox_dir)]
+    while stack:
+        cur = stack.pop()
+        try:
+            with os.scandir(cur) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
                 continue
-            yield Path(dirpath) / name
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file():
+                yield Path(entry.path)
+
+
+# 常见文本扩展名直接放行，免去 open+read
+_TEXT_SUFFIXES = {".md", ".markdown", ".mdown", ".txt", ".py", ".json", ".rst", ".yaml", ".yml"}
+
+_SNIFF_BYTES = 65536
 
 
 def _is_probably_binary(path: Path) -> bool:
+    if path.suffix.lower() in _TEXT_SUFFIXES:
+        return False
     try:
         with path.open("rb") as f:
-            chunk = f.read(4096)
-        return b"\x00" in chunk
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return False
+            # mmap.find 走 C 层 memchr，且不把采样窗口拷贝成 bytes 对象
+            with mmap.mmap(f.fileno(), min(_SNIFF_BYTES, size), access=mmap.ACCESS_READ) as mm:
+                return mm.find(b"\x00") != -1
     except Exception:
         return True
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import argparse
-import json
 import logging
 import os
 import shutil
@@ -10,23 +9,21 @@ import textwrap
 from pathlib import Path
 from typing import Any, Optional
 
-from .autoadd_bulk import autoadd_inbox
-from .ask import ask_kb
-from .bootstrap import init_kb
-from .doctor import doctor_kb, format_doctor_report
-from .indexer import index_kb
-from .importer import add_to_kb
-from .search import search_kb
-from .tree import tree_kb
+# 子命令实现按需导入（见 main 各分支）：避免 `kb search` 之类的调用
+# 把 openai_compat/indexer 等整条依赖链都拉起来
+from .util import json_dump_pretty
 
 logger = logging.getLogger(__name__)
 
 
 def main(argv: Optional[list[str]] = None) -> None:
-    args = _build_parser().parse_args(argv)
+    raw_argv = list(sys.argv[1:]) if argv is None else list(argv)
+    args = _build_parser(raw_argv).parse_args(raw_argv)
     _configure_logging(getattr(args, "log_level", None), json_mode=bool(getattr(args, "json", False)))
     try:
         if args.cmd == "init":
+            from .bootstrap import init_kb
+
             logger.info("init kb_root=%s force=%s", args.kb_root, bool(args.force))
             out = init_kb(Path(args.kb_root), force=args.force)
             _emit(out, json_mode=args.json)
@@ -36,6 +33,8 @@ def main(argv: Optional[list[str]] = None) -> None:
         logger.info("%s kb_root=%s", args.cmd, str(kb_root))
 
         if args.cmd == "add":
+            from .importer import add_to_kb
+
             out = add_to_kb(
                 kb_root,
                 src=Path(args.path),
@@ -46,6 +45,8 @@ def main(argv: Optional[list[str]] = None) -> None:
             _emit(out, json_mode=args.json)
             return
         if args.cmd == "autoadd":
+            from .autoadd_bulk import autoadd_inbox
+
             inbox_dir = Path(args.inbox).expanduser().resolve() if args.inbox else (kb_root / "_inbox")
             move = True
             if getattr(args, "copy", False):
@@ -57,6 +58,8 @@ def main(argv: Optional[list[str]] = None) -> None:
             return
 
         if args.cmd == "index":
+            from .indexer import index_kb
+
             out = index_kb(
                 kb_root,
                 rebuild=bool(args.rebuild),
@@ -67,6 +70,8 @@ def main(argv: Optional[list[str]] = None) -> None:
             return
 
         if args.cmd == "search":
+            from .search import search_kb
+
             hits = search_kb(
                 kb_root,
                 query=args.query,
@@ -88,22 +93,39 @@ def main(argv: Optional[list[str]] = None) -> None:
             return
 
         if args.cmd == "ask":
+            from .ask import ask_kb
+
+            on_delta = None
+            if not args.json:
+                def on_delta(piece: str) -> None:
+                    sys.stdout.write(piece)
+                    sys.stdout.flush()
+
             out = ask_kb(
                 kb_root,
                 query=args.query,
                 top_context=int(args.top_context),
                 semantic=bool(args.semantic),
                 hybrid=bool(args.hybrid),
+                on_delta=on_delta,
             )
-            _emit(out, json_mode=args.json)
+            if args.json:
+                _emit(out, json_mode=True)
+            else:
+                sys.stdout.write("\n")
+                _emit({k: v for k, v in out.items() if k != "answer"}, json_mode=False)
             return
 
         if args.cmd == "repair":
+            from .indexer import index_kb
+
             out = index_kb(kb_root, rebuild=True, embed_chunks=bool(args.embed), only_rel_paths=None)
             _emit(out, json_mode=args.json)
             return
 
         if args.cmd == "tree":
+            from .tree import tree_kb
+
             out = tree_kb(kb_root, depth=args.depth)
             if args.json:
                 _emit(out, json_mode=True)
@@ -112,6 +134,8 @@ def main(argv: Optional[list[str]] = None) -> None:
             return
 
         if args.cmd == "doctor":
+            from .doctor import doctor_kb, format_doctor_report
+
             out = doctor_kb(
                 kb_root,
                 check_chat=bool(args.chat),
@@ -136,11 +160,10 @@ def main(argv: Optional[list[str]] = None) -> None:
 
 def _emit(obj: Any, *, json_mode: bool) -> None:
     if json_mode:
-        sys.stdout.write(json.dumps(obj, ensure_ascii=False, indent=2) + "\n")
+        json_dump_pretty(obj, sys.stdout)
         return
     if isinstance(obj, dict):
-        for k, v in obj.items():
-            sys.stdout.write(f"{k}: {v}\n")
+        sys.stdout.write("".join(f"{k}: {v}\n" for k, v in obj.items()))
         return
     sys.stdout.write(str(obj) + "\n")
 
@@ -224,72 +247,112 @@ def _configure_logging(raw_level: Optional[str], *, json_mode: bool) -> None:
     )
 
 
-def _build_parser() -> argparse.ArgumentParser:
-    p = argparse.ArgumentParser(prog="kb")
-    sub = p.add_subparsers(dest="cmd", required=True)
+def _add_kb_root(sp) -> None:
+    sp.add_argument(
+        "--kb-root",
+        dest="kb_root",
+        default=None,
+        help="知识库根目录路径（可省略：会从当前目录向上寻找 kb_config.json 自动推断）",
+    )
+    sp.add_argument("--json", action="store_true", help="JSON 输出")
+    sp.add_argument("--log-level", default=None, help="日志级别：DEBUG/INFO/WARNING/ERROR（也可用环境变量 KB_LOG_LEVEL）")
+
 
+def _build_init(sub) -> None:
     p_init = sub.add_parser("init", help="初始化知识库根目录结构")
     p_init.add_argument("kb_root", help="知识库根目录路径")
     p_init.add_argument("--force", action="store_true", help="覆盖已有配置文件")
     p_init.add_argument("--json", action="store_true", help="JSON 输出")
     p_init.add_argument("--log-level", default=None, help="日志级别：DEBUG/INFO/WARNING/ERROR（也可用环境变量 KB_LOG_LEVEL）")
 
-    def add_kb_root(sp):
-        sp.add_argument(
-            "--kb-root",
-            dest="kb_root",
-            default=None,
-            help="知识库根目录路径（可省略：会从当前目录向上寻找 kb_config.json 自动推断）",
-        )
-        sp.add_argument("--json", action="store_true", help="JSON 输出")
-        sp.add_argument("--log-level", default=None, help="日志级别：DEBUG/INFO/WARNING/ERROR（也可用环境变量 KB_LOG_LEVEL）")
 
+def _build_add(sub) -> None:
     p_add = sub.add_parser("add", help="导入文档到知识树")
     p_add.add_argument("path", help="文件或目录路径")
-    add_kb_root(p_add)
+    _add_kb_root(p_add)
     p_add.add_argument("--dest", default=None, help="目标目录（相对 kb/）")
     p_add.add_argument("--auto", action="store_true", help="启用 LLM 自动归档（若失败自动退化）")
     p_add.add_argument("--move", action="store_true", help="移动源文件（默认复制）")
 
+
+def _build_autoadd(sub) -> None:
     p_autoadd = sub.add_parser("autoadd", help="自动归档 _inbox 内的所有文件到知识树")
-    add_kb_root(p_autoadd)
+    _add_kb_root(p_autoadd)
     p_autoadd.add_argument("--inbox", default=None, help="待归档目录路径（默认 <kb_root>/_inbox）")
     g_autoadd = p_autoadd.add_mutually_exclusive_group()
     g_autoadd.add_argument("--move", action="store_true", help="移动源文件（默认）")
     g_autoadd.add_argument("--copy", action="store_true", help="复制源文件（保留在 inbox）")
 
+
+def _build_index(sub) -> None:
     p_index = sub.add_parser("index", help="构建或增量更新索引")
-    add_kb_root(p_index)
+    _add_kb_root(p_index)
     p_index.add_argument("--rebuild", action="store_true", help="重建索引数据库")
     p_index.add_argument("--embed", action="store_true", help="生成并写入 embedding（需要配置）")
     p_index.add_argument("--only", action="append", help="仅更新某些 rel_path（可重复）")
 
+
+def _build_search(sub) -> None:
     p_search = sub.add_parser("search", help="混合检索（默认 FTS，可选语义/融合）")
     p_search.add_argument("query", help="查询文本")
-    add_kb_root(p_search)
+    _add_kb_root(p_search)
     p_search.add_argument("--top", type=int, default=10, help="返回条数")
     p_search.add_argument("--semantic", action="store_true", help="仅语义检索（需要 embedding）")
     p_search.add_argument("--hybrid", action="store_true", help="融合 FTS+向量（需要 embedding）")
 
+
+def _build_ask(sub) -> None:
     p_ask = sub.add_parser("ask", help="问答（强制带引用）")
     p_ask.add_argument("query", help="问题")
-    add_kb_root(p_ask)
+    _add_kb_root(p_ask)
     p_ask.add_argument("--top-context", type=int, default=8, help="检索上下文条数")
     p_ask.add_argument("--semantic", action="store_true", help="仅语义检索（需要 embedding）")
     p_ask.add_argument("--hybrid", action="store_true", help="融合 FTS+向量（需要 embedding）")
 
+
+def _build_repair(sub) -> None:
     p_repair = sub.add_parser("repair", help="修复索引/向量一致性（第一版=重建索引）")
-    add_kb_root(p_repair)
+    _add_kb_root(p_repair)
     p_repair.add_argument("--embed", action="store_true", help="重建时生成 embedding（需要配置）")
 
+
+def _build_tree(sub) -> None:
     p_tree = sub.add_parser("tree", help="列出知识树文档（支持深度）")
-    add_kb_root(p_tree)
+    _add_kb_root(p_tree)
     p_tree.add_argument("--depth", type=int, default=None, help="最大目录深度（0=仅根目录）")
 
+
+def _build_doctor(sub) -> None:
     p_doctor = sub.add_parser("doctor", help="检测 OpenAI-compatible 接口可用性（chat/embeddings）")
-    add_kb_root(p_doctor)
+    _add_kb_root(p_doctor)
     p_doctor.add_argument("--chat", action="store_true", help="仅检测 chat/completions")
     p_doctor.add_argument("--embed", action="store_true", help="仅检测 embeddings")
     p_doctor.add_argument("--text", default="ping", help="测试用输入文本")
 
+
+_CMD_BUILDERS = {
+    "init": _build_init,
+    "add": _build_add,
+    "autoadd": _build_autoadd,
+    "index": _build_index,
+    "search": _build_search,
+    "ask": _build_ask,
+    "repair": _build_repair,
+    "tree": _build_tree,
+    "doctor": _build_doctor,
+}
+
+
+def _build_parser(argv: Optional[list[str]] = None) -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="kb")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    # 只构建命中的子命令，省去每次调用时其余 8 个子解析器的构造；
+    # 帮助/未知命令路径退回全量构建
+    cmd = next((a for a in argv if not a.startswith("-")), None) if argv else None
+    if cmd in _CMD_BUILDERS:
+        _CMD_BUILDERS[cmd](sub)
+        return p
+    for build in _CMD_BUILDERS.values():
+        build(sub)
     return p
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
+import copy
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
 
-from .util import read_json, write_json_atomic
+from .util import read_json, resolve_path_cached, write_json_atomic
 
 
 @dataclass(frozen=True)
@@ -15,51 +16,87 @@ class KBPaths:
     config_path: Path
 
 
+# 规范默认配置：只读常量，需要可变副本时走 default_config()
+_DEFAULT_CONFIG: dict[str, Any] = {
+    "schema_version": 1,
+    "paths": {"kb": "kb", "index": "kb_index", "vector": "kb_vector"},
+    "meta_filename": "meta.json",
+    "chunking": {"max_chars": 1200, "overlap_chars": 150, "min_chars": 20},
+    # quantization: "" 表示 float32 原样存储；"int8" 按向量最大值缩放到 int8，体积约为 1/4
+    "embedding": {"quantization": ""},
+    "openai_compat": {
+        "base_url": "",
+        "api_key_env": "KB_OPENAI_API_KEY",
+        "model_chat": "",
+        "model_embed": "",
+        "timeout_s": 60,
+        "max_retries": 2,
+        "concurrency": 8,
+        "embed_batch_size": 128,
+        "embed_batch_tokens": 100000,
+        "extra_headers": {},
+    },
+}
+
+
 def default_config() -> dict[str, Any]:
-    return {
-        "schema_version": 1,
-        "paths": {"kb": "kb", "index": "kb_index", "vector": "kb_vector"},
-        "meta_filename": "meta.json",
-        "chunking": {"max_chars": 1200, "overlap_chars": 150, "min_chars": 20},
-        "openai_compat": {
-            "base_url": "",
-            "api_key_env": "KB_OPENAI_API_KEY",
-            "model_chat": "",
-            "model_embed": "",
-            "timeout_s": 60,
-            "max_retries": 2,
-            "extra_headers": {},
-        },
-    }
+    return copy.deepcopy(_DEFAULT_CONFIG)
+
+
+# config_path -> ((mtime_ns, size), 原始解析结果)；load_config/resolve_paths 共用，
+# 文件变化时按签名自动失效
+_raw_cache: dict[str, tuple[tuple[int, int], Any]] = {}
+
+# config_path -> (签名, KBPaths)；KBPaths 为 frozen dataclass，可安全复用同一实例
+_paths_cache: dict[str, tuple[Optional[tuple[int, int]], KBPaths]] = {}
+
+
+def _read_config_cached(config_path: Path) -> tuple[tuple[int, int], Any]:
+    st = config_path.stat()
+    sig = (int(getattr(st, "st_mtime_ns", int(st.st_mtime * 1e9))), int(st.st_size))
+    key = str(config_path)
+    cached = _raw_cache.get(key)
+    if cached is not None and cached[0] == sig:
+        return sig, cached[1]
+    raw = read_json(config_path)
+    _raw_cache[key] = (sig, raw)
+    return sig, raw
 
 
 def resolve_paths(kb_root: Path) -> KBPaths:
-    kb_root = kb_root.expanduser().resolve()
+    kb_root = resolve_path_cached(kb_root)
     config_path = kb_root / "kb_config.json"
-    cfg = default_config()
-    if config_path.exists():
-        try:
-            cfg = read_json(config_path)
-        except Exception:
-            cfg = default_config()
+    sig: Optional[tuple[int, int]] = None
+    try:
+        sig, cfg = _read_config_cached(config_path)
+    except Exception:
+        # 只读用途，无需可变副本
+        sig, cfg = None, _DEFAULT_CONFIG
+    key = str(config_path)
+    cached = _paths_cache.get(key)
+    if cached is not None and cached[0] == sig and sig is not None:
+        return cached[1]
     paths_cfg = cfg.get("paths") if isinstance(cfg, dict) else None
     if not isinstance(paths_cfg, dict):
-        paths_cfg = default_config()["paths"]
+        paths_cfg = _DEFAULT_CONFIG["paths"]
     kb_dir = kb_root / str(paths_cfg.get("kb", "kb"))
     index_dir = kb_root / str(paths_cfg.get("index", "kb_index"))
     vector_dir = kb_root / str(paths_cfg.get("vector", "kb_vector"))
-    return KBPaths(kb_dir=kb_dir, index_dir=index_dir, vector_dir=vector_dir, config_path=config_path)
+    paths = KBPaths(kb_dir=kb_dir, index_dir=index_dir, vector_dir=vector_dir, config_path=config_path)
+    _paths_cache[key] = (sig, paths)
+    return paths
 
 
 def load_config(kb_root: Path) -> dict[str, Any]:
-    config_path = kb_root.expanduser().resolve() / "kb_config.json"
-    if not config_path.exists():
+    config_path = resolve_path_cached(kb_root) / "kb_config.json"
+    try:
+        _, cfg = _read_config_cached(config_path)
+    except OSError:
         return default_config()
-    cfg = read_json(config_path)
     if not isinstance(cfg, dict):
         return default_config()
     base = default_config()
-    nested_keys = ("paths", "chunking", "openai_compat")
+    nested_keys = ("paths", "chunking", "embedding", "openai_compat")
 
     for k, v in cfg.items():
         if k in nested_keys:
@@ -75,6 +112,12 @@ def load_config(kb_root: Path) -> dict[str, Any]:
     return base
 
 
+def load_config_and_paths(kb_root: Path) -> tuple[dict[str, Any], KBPaths]:
+    """一次取回合并配置与 KBPaths：两者共用 _read_config_cached，仅解析一次配置文件。"""
+    kb_root = resolve_path_cached(kb_root)
+    return load_config(kb_root), resolve_paths(kb_root)
+
+
 def save_config(kb_root: Path, cfg: dict[str, Any]) -> None:
-    kb_root = kb_root.expanduser().resolve()
+    kb_root = resolve_path_cached(kb_root)
     write_json_atomic(kb_root / "kb_config.json", cfg)
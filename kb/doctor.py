@@ -2,12 +2,13 @@ from __future__ import annotations
 
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any
 
 from .config import load_config
-from .openai_compat import OpenAICompatError, chat_completion, embed, from_config_dict
-from .util import getenv_trim
+from .openai_compat import chat_completion, embed, from_config_dict
+from .util import getenv_trim, resolve_path_cached
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +20,7 @@ def doctor_kb(
     check_embed: bool,
     text: str,
 ) -> dict[str, Any]:
-    kb_root = kb_root.expanduser().resolve()
+    kb_root = resolve_path_cached(kb_root)
     cfg = load_config(kb_root)
     oa_cfg = from_config_dict(cfg.get("openai_compat", {}) if isinstance(cfg, dict) else {})
 
@@ -31,16 +32,24 @@ def doctor_kb(
     checks: dict[str, Any] = {}
     ok = True
 
-    if check_embed:
-        r = _check_embed(oa_cfg, text=text)
-        checks["embed"] = r
+    if check_embed and check_chat:
+        # 两个探测都是独立的网络往返，并行后 wall time 约等于较慢的一个
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            f_embed = pool.submit(_check_embed, oa_cfg, text=text)
+            f_chat = pool.submit(_check_chat, oa_cfg, text=text)
+            checks["embed"] = f_embed.result()
+            checks["chat"] = f_chat.result()
+    elif check_embed:
+        checks["embed"] = _check_embed(oa_cfg, text=text)
+    elif check_chat:
+        checks["chat"] = _check_chat(oa_cfg, text=text)
+
+    for name in ("embed", "chat"):
+        r = checks.get(name)
+        if r is None:
+            continue
         ok = ok and bool(r.get("ok"))
-        logger.info("doctor embed ok=%s elapsed_ms=%s", bool(r.get("ok")), r.get("elapsed_ms"))
-    if check_chat:
-        r = _check_chat(oa_cfg, text=text)
-        checks["chat"] = r
-        ok = ok and bool(r.get("ok"))
-        logger.info("doctor chat ok=%s elapsed_ms=%s", bool(r.get("ok")), r.get("elapsed_ms"))
+        logger.info("doctor %s ok=%s elapsed_ms=%s", name, bool(r.get("ok")), r.get("elapsed_ms"))
 
     info = {
         "base_url": oa_cfg.base_url,
@@ -148,33 +157,32 @@ def _doctor_hints(openai_compat: dict[str, Any], checks: dict[str, Any]) -> list
     return hints
 
 
-def _check_embed(oa_cfg, *, text: str) -> dict[str, Any]:
+def _timed_check(probe) -> dict[str, Any]:
+    """统一的探测封装：计时 + 异常转 {ok: False, error}，probe 返回 result 字典。"""
     started = time.perf_counter()
     try:
-        vecs = embed(oa_cfg, texts=[text])
-        elapsed_ms = int((time.perf_counter() - started) * 1000)
-        dim = 0
-        if vecs and isinstance(vecs[0], list):
-            dim = len(vecs[0])
-        return {"ok": True, "elapsed_ms": elapsed_ms, "result": {"vectors": len(vecs), "dim": dim}}
-    except OpenAICompatError as e:
+        result = probe()
         elapsed_ms = int((time.perf_counter() - started) * 1000)
-        return {"ok": False, "elapsed_ms": elapsed_ms, "error": str(e)}
+        return {"ok": True, "elapsed_ms": elapsed_ms, "result": result}
     except Exception as e:
         elapsed_ms = int((time.perf_counter() - started) * 1000)
         return {"ok": False, "elapsed_ms": elapsed_ms, "error": str(e)}
 
 
+def _check_embed(oa_cfg, *, text: str) -> dict[str, Any]:
+    def probe() -> dict[str, Any]:
+        vecs = embed(oa_cfg, texts=[text])
+        dim = 0
+        if vecs and isinstance(vecs[0], list):
+            dim = len(vecs[0])
+        return {"vectors": len(vecs), "dim": dim}
+
+    return _timed_check(probe)
+
+
 def _check_chat(oa_cfg, *, text: str) -> dict[str, Any]:
-    started = time.perf_counter()
-    try:
+    def probe() -> dict[str, Any]:
         out = chat_completion(oa_cfg, messages=[{"role": "user", "content": text}])
-        elapsed_ms = int((time.perf_counter() - started) * 1000)
-        sample = out[:80]
-        return {"ok": True, "elapsed_ms": elapsed_ms, "result": {"length": len(out), "sample": sample}}
-    except OpenAICompatError as e:
-        elapsed_ms = int((time.perf_counter() - started) * 1000)
-        return {"ok": False, "elapsed_ms": elapsed_ms, "error": str(e)}
-    except Exception as e:
-        elapsed_ms = int((time.perf_counter() - started) * 1000)
-        return {"ok": False, "elapsed_ms": elapsed_ms, "error": str(e)}
+        return {"length": len(out), "sample": out[:80]}
+
+    return _timed_check(probe)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+import time
+from array import array
+from pathlib import Path
+from typing import Callable
+
+from .util import sha256_text
+
+logger = logging.getLogger(__name__)
+
+_CACHE_FILENAME = "query_cache.sqlite"
+_MAX_ROWS = 1024
+
+
+def open_cache(vector_dir: Path) -> sqlite3.Connection:
+    vector_dir.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(vector_dir / _CACHE_FILENAME))
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS cache (
+          key TEXT PRIMARY KEY,
+          vec BLOB NOT NULL,
+          ts INTEGER NOT NULL
+        )
+        """
+    )
+    conn.commit()
+    return conn
+
+
+def get_or_compute(vector_dir: Path, *, model_id: str, text: str, compute: Callable[[], list[float]]) -> list[float]:
+    key = sha256_text(f"{model_id}\x00{text}")
+    conn = open_cache(vector_dir)
+    try:
+        row = conn.execute("SELECT vec FROM cache WHERE key=?", (key,)).fetchone()
+        if row is not None:
+            logger.debug("embed cache hit key=%s", key[:12])
+            conn.execute("UPDATE cache SET ts=? WHERE key=?", (int(time.time()), key))
+            conn.commit()
+            arr = array("f")
+            arr.frombytes(bytes(row[0]))
+            return [float(x) for x in arr]
+
+        logger.debug("embed cache miss key=%s", key[:12])
+        vec = [float(x) for x in compute()]
+        arr = array("f", vec)
+        conn.execute(
+            "INSERT OR REPLACE INTO cache(key, vec, ts) VALUES (?, ?, ?)",
+            (key, arr.tobytes(), int(time.time())),
+        )
+        _evict_lru(conn, max_rows=_MAX_ROWS)
+        conn.commit()
+        return vec
+    finally:
+        conn.close()
+
+
+def clear_cache(vector_dir: Path) -> None:
+    path = vector_dir / _CACHE_FILENAME
+    if not path.exists():
+        return
+    conn = open_cache(vector_dir)
+    try:
+        conn.execute("DELETE FROM cache")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _evict_lru(conn: sqlite3.Connection, *, max_rows: int) -> None:
+    n = int(conn.execute("SELECT COUNT(1) FROM cache").fetchone()[0])
+    if n <= max_rows:
+        return
+    conn.execute(
+        "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY ts ASC LIMIT ?)",
+        (n - max_rows,),
+    )
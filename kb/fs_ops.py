@@ -1,18 +1,16 @@
 from __future__ import annotations
 
+import errno
+import os
 import shutil
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
 
-from .util import now_iso, read_json, write_json_atomic
+from .util import now_iso, read_json, resolve_path_cached, write_json_atomic
 
 
-def ensure_dir_meta(dir_path: Path, *, meta_filename: str) -> Path:
-    dir_path.mkdir(parents=True, exist_ok=True)
-    meta_path = dir_path / meta_filename
-    if meta_path.exists():
-        return meta_path
-    meta = {
+def _default_meta(dir_path: Path) -> dict[str, Any]:
+    return {
         "schema_version": 1,
         "title": dir_path.name,
         "summary": "",
@@ -22,21 +20,55 @@ def ensure_dir_meta(dir_path: Path, *, meta_filename: str) -> Path:
         "rules": {},
         "updated_at": now_iso(),
     }
-    write_json_atomic(meta_path, meta)
+
+
+def ensure_dir_meta(dir_path: Path, *, meta_filename: str) -> Path:
+    dir_path.mkdir(parents=True, exist_ok=True)
+    meta_path = dir_path / meta_filename
+    if os.path.lexists(meta_path):
+        return meta_path
+    write_json_atomic(meta_path, _default_meta(dir_path))
     return meta_path
 
 
-def ensure_dir_meta_chain(base_dir: Path, *, rel_dir: str, meta_filename: str) -> list[Path]:
-    base_dir = base_dir.expanduser().resolve()
+def ensure_dir_meta_chain(
+    base_dir: Path,
+    *,
+    rel_dir: str,
+    meta_filename: str,
+    seen: Optional[set[str]] = None,
+) -> list[Path]:
+    """保障 base_dir 到 rel_dir 链路上每级目录存在且带 meta 文件。
+
+    只对最深目录做一次 mkdir(parents=True)，其余层级仅做 meta 存在性检查；
+    传入 seen 集合可在批量导入循环中跳过已处理过的目录。
+    """
+    base_dir = resolve_path_cached(base_dir)
     rel_dir = (rel_dir or "").replace("\\", "/").strip()
-    created: list[Path] = []
-    created.append(ensure_dir_meta(base_dir, meta_filename=meta_filename))
-    if not rel_dir or rel_dir == ".":
-        return created
+    parts = [p for p in rel_dir.split("/") if p and p != "."]
+
+    chain = [base_dir]
     cur = base_dir
-    for part in [p for p in rel_dir.split("/") if p and p != "."]:
+    for part in parts:
         cur = cur / part
-        created.append(ensure_dir_meta(cur, meta_filename=meta_filename))
+        chain.append(cur)
+
+    if seen is not None and str(chain[-1]) in seen:
+        return []
+
+    chain[-1].mkdir(parents=True, exist_ok=True)
+
+    created: list[Path] = []
+    for d in chain:
+        key = str(d)
+        if seen is not None and key in seen:
+            continue
+        meta_path = d / meta_filename
+        if not os.path.lexists(meta_path):
+            write_json_atomic(meta_path, _default_meta(d))
+        created.append(meta_path)
+        if seen is not None:
+            seen.add(key)
     return created
 
 
@@ -48,32 +80,77 @@ def read_dir_meta(dir_path: Path, *, meta_filename: str) -> dict[str, Any]:
     return meta
 
 
-def merge_meta(existing: dict[str, Any], patch: dict[str, Any]) -> dict[str, Any]:
+def merge_meta(existing: dict[str, Any], patch: dict[str, Any]) -> tuple[dict[str, Any], bool]:
+    """合并目录元数据，返回 (merged, changed)。
+
+    仅在内容实际变化时刷新 updated_at；changed 为 False 时调用方应跳过落盘，
+    避免批量导入为每个文件写一份只差时间戳的 meta.json。
+    """
     out = dict(existing)
+    changed = False
     for k, v in patch.items():
         if v is None:
             continue
-        if isinstance(v, list) and isinstance(out.get(k), list):
-            merged = list(out[k])
-            for item in v:
-                if item not in merged:
-                    merged.append(item)
-            out[k] = merged
+        cur = out.get(k)
+        if isinstance(v, list) and isinstance(cur, list):
+            # 先找出真正的新增项，全部已存在时不分配新列表
+            try:
+                seen = set(cur)
+            except TypeError:
+                seen = cur  # 含不可哈希项时退回线性查找
+            new_items = [item for item in v if item not in seen]
+            if new_items:
+                out[k] = cur + new_items
+                changed = True
             continue
-        if isinstance(v, dict) and isinstance(out.get(k), dict):
-            merged = dict(out[k])
-            merged.update(v)
-            out[k] = merged
+        if isinstance(v, dict) and isinstance(cur, dict):
+            if any(cur.get(kk) != vv for kk, vv in v.items()):
+                merged = dict(cur)
+                merged.update(v)
+                out[k] = merged
+                changed = True
             continue
-        if out.get(k) in (None, "", [], {}):
+        if cur in (None, "", [], {}) and cur != v:
             out[k] = v
-    out["updated_at"] = now_iso()
-    return out
+            changed = True
+    if changed:
+        out["updated_at"] = now_iso()
+    return out, changed
+
+
+_HAS_COPY_FILE_RANGE = hasattr(os, "copy_file_range")
+
+_COPY_CHUNK = 1 << 30
+
+
+def _kernel_copy(src: Path, dst: Path) -> None:
+    """copy_file_range 全程在内核态搬运数据，支持 reflink 的文件系统上近乎零拷贝。"""
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        src_fd = fsrc.fileno()
+        dst_fd = fdst.fileno()
+        while True:
+            sent = os.copy_file_range(src_fd, dst_fd, _COPY_CHUNK)
+            if sent == 0:
+                return
 
 
 def copy_or_move(src: Path, dst: Path, *, move: bool) -> None:
     dst.parent.mkdir(parents=True, exist_ok=True)
     if move:
-        shutil.move(str(src), str(dst))
-    else:
-        shutil.copy2(str(src), str(dst))
+        try:
+            # 同一文件系统时只需一次 rename
+            os.replace(src, dst)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(str(src), str(dst))
+        return
+    # 导入的新文档无需 copy2 的 copystat 元数据复制
+    if _HAS_COPY_FILE_RANGE:
+        try:
+            _kernel_copy(src, dst)
+            return
+        except OSError:
+            # 跨设备或文件系统不支持时退回通用路径（Linux 上仍走 sendfile）
+            pass
+    shutil.copyfile(str(src), str(dst))
@@ -2,15 +2,16 @@ from __future__ import annotations
 
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Optional
 
 from .auto_add import apply_auto_suggestion, default_filename, default_inbox_dir, suggest_destination_with_llm
-from .config import load_config, resolve_paths
+from .config import load_config_and_paths
 from .fs_ops import copy_or_move, ensure_dir_meta_chain
 from .markdown import guess_title, upsert_frontmatter
 from .openai_compat import OpenAICompatError
-from .util import ensure_rel_under_base
+from .util import ensure_rel_under_base, resolve_path_cached
 
 logger = logging.getLogger(__name__)
 
@@ -23,9 +24,8 @@ def add_to_kb(
     auto: bool,
     move: bool,
 ) -> dict[str, Any]:
-    kb_root = kb_root.expanduser().resolve()
-    cfg = load_config(kb_root)
-    paths = resolve_paths(kb_root)
+    kb_root = resolve_path_cached(kb_root)
+    cfg, paths = load_config_and_paths(kb_root)
     meta_filename = str(cfg.get("meta_filename", "meta.json"))
 
     src = src.expanduser().resolve()
@@ -40,25 +40,52 @@ def add_to_kb(
         root_rel = ensure_rel_under_base(dest_rel_dir) if dest_rel_dir else f"imports/{base_name}"
         files = list(_walk_markdown(src))
         logger.info("import directory files=%d dest_rel_dir=%s", len(files), root_rel)
-        for i, abs_path in enumerate(files, start=1):
+
+        # 先收集所有目标路径与唯一父目录，目录链只保障一次，文件循环里只剩拷贝
+        targets: list[tuple[Path, str]] = []
+        parent_rels: set[str] = set()
+        for abs_path in files:
+            # rel_from_src 由 scandir 实际遍历得到，必然已规范（无 ..、无空段），
+            # 不必每个文件再过一遍 ensure_rel_under_base 的切分/校验
             rel_from_src = abs_path.relative_to(src).as_posix()
-            target_rel = ensure_rel_under_base(f"{root_rel}/{rel_from_src}")
-            dst = paths.kb_dir / target_rel
-            parent_rel = dst.parent.relative_to(paths.kb_dir).as_posix()
-            parent_rel = "" if parent_rel == "." else parent_rel
-            ensure_dir_meta_chain(paths.kb_dir, rel_dir=parent_rel, meta_filename=meta_filename)
-            copy_or_move(abs_path, dst, move=move)
-            imported.append(target_rel)
-            if i == 1 or i == len(files) or (i % 50 == 0):
-                logger.info("import progress %d/%d -> %s", i, len(files), target_rel)
+            target_rel = f"{root_rel}/{rel_from_src}" if root_rel else rel_from_src
+            parent_rel = target_rel.rsplit("/", 1)[0] if "/" in target_rel else ""
+            parent_rels.add(parent_rel)
+            targets.append((abs_path, target_rel))
+
+        ensured_dirs: set[str] = set()
+        for parent_rel in sorted(parent_rels):
+            ensure_dir_meta_chain(paths.kb_dir, rel_dir=parent_rel, meta_filename=meta_filename, seen=ensured_dirs)
+
+        def _copy_one(item: tuple[Path, str]) -> str:
+            abs_path, target_rel = item
+            copy_or_move(abs_path, paths.kb_dir / target_rel, move=move)
+            return target_rel
+
+        # 每次拷贝互相独立，线程池重叠 I/O 等待；map 保持与顺序执行一致的结果顺序
+        if targets:
+            workers = max(1, min(16, (os.cpu_count() or 4) * 2, len(targets)))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for i, target_rel in enumerate(pool.map(_copy_one, targets), start=1):
+                    imported.append(target_rel)
+                    if i == 1 or i == len(targets) or (i % 50 == 0):
+                        logger.info("import progress %d/%d -> %s", i, len(targets), target_rel)
         return {"imported": imported, "mode": "dir", "dest_rel_dir": root_rel}
 
+    # 三个分支都可能需要原文（auto 失败后还会走 inbox 分支），只读一次
+    src_text_cache: Optional[str] = None
+
+    def _src_text() -> str:
+        nonlocal src_text_cache
+        if src_text_cache is None:
+            src_text_cache = src.read_text(encoding="utf-8", errors="replace")
+        return src_text_cache
+
     if dest_rel_dir:
         rel_dir = ensure_rel_under_base(dest_rel_dir)
         dst_dir = paths.kb_dir / rel_dir if rel_dir else paths.kb_dir
         ensure_dir_meta_chain(paths.kb_dir, rel_dir=rel_dir, meta_filename=meta_filename)
-        src_text = src.read_text(encoding="utf-8", errors="replace")
-        title = guess_title(src_text, fallback=src.stem)
+        title = guess_title(_src_text(), fallback=src.stem)
         filename = default_filename(src, title=title)
         dst = dst_dir / filename
         copy_or_move(src, dst, move=move)
@@ -67,33 +94,10 @@ def add_to_kb(
         return {"imported": imported, "mode": "manual", "dest_rel_dir": rel_dir}
 
     if auto:
-        src_text = src.read_text(encoding="utf-8", errors="replace")
         try:
             logger.info("auto archive: call LLM for destination suggestion")
-            suggestion = suggest_destination_with_llm(kb_root, src_text=src_text, src_name=src.name)
-            rel_dir, filename, _ = apply_auto_suggestion(kb_root, suggestion=suggestion, meta_filename=meta_filename)
-            title = str(suggestion.get("doc_title") or "").strip() or guess_title(src_text, fallback=src.stem)
-            if not filename:
-                filename = default_filename(src, title=title)
-            dst_dir = paths.kb_dir / rel_dir if rel_dir else paths.kb_dir
-            dst = dst_dir / filename
-            copy_or_move(src, dst, move=move)
-            doc_summary = str(suggestion.get("doc_summary") or "").strip()
-            tags = suggestion.get("tags") if isinstance(suggestion.get("tags"), list) else []
-            keywords = suggestion.get("keywords") if isinstance(suggestion.get("keywords"), list) else []
-            try:
-                dst_text = dst.read_text(encoding="utf-8", errors="replace")
-                patched = upsert_frontmatter(
-                    dst_text,
-                    patch={"title": title, "summary": doc_summary, "tags": tags, "keywords": keywords},
-                )
-                if patched != dst_text:
-                    dst.write_text(patched, encoding="utf-8")
-            except Exception as e:
-                logger.warning("frontmatter update skipped: %s", str(e))
-            imported.append(dst.relative_to(paths.kb_dir).as_posix())
-            logger.info("imported (auto) -> %s", imported[-1])
-            return {"imported": imported, "mode": "auto", "dest_rel_dir": rel_dir, "suggestion": suggestion}
+            suggestion = suggest_destination_with_llm(kb_root, src_text=_src_text(), src_name=src.name)
+            return add_with_suggestion(kb_root, src=src, suggestion=suggestion, move=move, src_text=_src_text())
         except OpenAICompatError as e:
             logger.warning("auto archive failed, fallback to inbox: %s", str(e))
 
@@ -101,8 +105,7 @@ def add_to_kb(
     rel_dir = ensure_rel_under_base(rel_dir)
     dst_dir = paths.kb_dir / rel_dir
     ensure_dir_meta_chain(paths.kb_dir, rel_dir=rel_dir, meta_filename=meta_filename)
-    src_text = src.read_text(encoding="utf-8", errors="replace")
-    title = guess_title(src_text, fallback=src.stem)
+    title = guess_title(_src_text(), fallback=src.stem)
     filename = default_filename(src, title=title)
     dst = dst_dir / filename
     copy_or_move(src, dst, move=move)
@@ -111,11 +114,69 @@ def add_to_kb(
     return {"imported": imported, "mode": "inbox", "dest_rel_dir": rel_dir}
 
 
+def add_with_suggestion(
+    kb_root: Path,
+    *,
+    src: Path,
+    suggestion: dict[str, Any],
+    move: bool,
+    src_text: Optional[str] = None,
+) -> dict[str, Any]:
+    kb_root = resolve_path_cached(kb_root)
+    cfg, paths = load_config_and_paths(kb_root)
+    meta_filename = str(cfg.get("meta_filename", "meta.json"))
+
+    src = src.expanduser().resolve()
+    if src_text is None:
+        src_text = src.read_text(encoding="utf-8", errors="replace")
+
+    rel_dir, filename, _ = apply_auto_suggestion(kb_root, suggestion=suggestion, meta_filename=meta_filename)
+    title = str(suggestion.get("doc_title") or "").strip() or guess_title(src_text, fallback=src.stem)
+    if not filename:
+        filename = default_filename(src, title=title)
+    dst_dir = paths.kb_dir / rel_dir if rel_dir else paths.kb_dir
+    dst = dst_dir / filename
+    doc_summary = str(suggestion.get("doc_summary") or "").strip()
+    tags = suggestion.get("tags") if isinstance(suggestion.get("tags"), list) else []
+    keywords = suggestion.get("keywords") if isinstance(suggestion.get("keywords"), list) else []
+
+    # 建议为空时跳过 frontmatter 往返；有补丁时在内存里打好再落盘，只写一次
+    patched: Optional[str] = None
+    if doc_summary or tags or keywords or title != src.stem:
+        try:
+            patched = upsert_frontmatter(
+                src_text,
+                patch={"title": title, "summary": doc_summary, "tags": tags, "keywords": keywords},
+            )
+        except Exception as e:
+            logger.warning("frontmatter update skipped: %s", str(e))
+            patched = None
+    if patched is None or patched == src_text:
+        copy_or_move(src, dst, move=move)
+    else:
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        dst.write_text(patched, encoding="utf-8")
+        if move:
+            src.unlink(missing_ok=True)
+    imported = [dst.relative_to(paths.kb_dir).as_posix()]
+    logger.info("imported (auto) -> %s", imported[-1])
+    return {"imported": imported, "mode": "auto", "dest_rel_dir": rel_dir, "suggestion": suggestion}
+
+
 def _walk_markdown(root: Path):
-    for dirpath, dirnames, filenames in os.walk(root):
-        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
-        for name in filenames:
-            if name.startswith("."):
+    # DirEntry.is_dir 在 Linux 上复用 readdir 的 d_type，比 os.walk 少一次 stat
+    stack = [str(root)]
+    while stack:
+        cur = stack.pop()
+        try:
+            with os.scandir(cur) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
                 continue
-            if name.lower().endswith(".md"):
-                yield Path(dirpath) / name
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.name.lower().endswith(".md"):
+                yield Path(entry.path)
@@ -2,26 +2,33 @@ from __future__ import annotations
 
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Iterable, Optional
 
 from .config import load_config, resolve_paths
 from .fs_ops import ensure_dir_meta, read_dir_meta
-from .markdown import chunk_markdown, extract_links, guess_title
+from .markdown import chunk_markdown, guess_title
 from .openai_compat import OpenAICompatError, embed, from_config_dict
+from .semantic_cache import clear_cache as clear_semantic_cache
 from .store_sqlite import (
+    fetch_doc_embeddings_by_text_hash,
     init_schema,
     log_action,
     open_db,
     upsert_dir_meta,
     upsert_doc_and_chunks,
     upsert_embeddings,
+    upsert_embeddings_raw,
     delete_doc,
 )
-from .util import ensure_rel_under_base, now_iso, sha256_bytes, sha256_text
+from .util import ensure_rel_under_base, fast_content_hash, now_iso, resolve_path_cached, sha256_text
 
 logger = logging.getLogger(__name__)
 
+# 外层事务的提交粒度：兼顾崩溃后最多重做的文档数与 fsync 次数
+_COMMIT_EVERY = 500
+
 
 def index_kb(
     kb_root: Path,
@@ -30,7 +37,7 @@ def index_kb(
     embed_chunks: bool,
     only_rel_paths: Optional[list[str]] = None,
 ) -> dict[str, Any]:
-    kb_root = kb_root.expanduser().resolve()
+    kb_root = resolve_path_cached(kb_root)
     cfg = load_config(kb_root)
     paths = resolve_paths(kb_root)
     meta_filename = str(cfg.get("meta_filename", "meta.json"))
@@ -56,41 +63,38 @@ def index_kb(
         _refresh_dir_meta_cache(conn, paths.kb_dir, meta_filename=meta_filename)
         conn.commit()
 
-        existing = {
-            r["rel_path"]: {
-                "doc_id": r["doc_id"],
-                "content_hash": r["content_hash"],
-                "mtime_ns": int(r["mtime_ns"] or 0),
-                "size": int(r["size"] or 0),
-            }
-            for r in conn.execute("SELECT doc_id, rel_path, content_hash, mtime_ns, size FROM docs")
-        }
+        only = {ensure_rel_under_base(p) for p in only_rel_paths} if only_rel_paths else None
+        existing = _load_existing_docs(conn, only=only)
 
         cur_files = list(_scan_markdown_files(paths.kb_dir, meta_filename=meta_filename))
-        if only_rel_paths:
-            only = {ensure_rel_under_base(p) for p in only_rel_paths}
-            cur_files = [p for p in cur_files if _rel_path(paths.kb_dir, p) in only]
+        if only is not None:
+            cur_files = [(p, st) for p, st in cur_files if _rel_path(paths.kb_dir, p) in only]
 
         logger.info("scan markdown files=%d", len(cur_files))
 
-        cur_rel_set = {_rel_path(paths.kb_dir, p) for p in cur_files}
+        cur_rel_set = {_rel_path(paths.kb_dir, p) for p, _ in cur_files}
 
         deleted = [v["doc_id"] for k, v in existing.items() if k not in cur_rel_set]
-        changed: list[Path] = []
+        changed: list[tuple[Path, os.stat_result]] = []
+        touched: list[tuple[int, int, str]] = []
         unchanged = 0
 
-        for abs_path in cur_files:
+        for abs_path, st in cur_files:
             rel_path = _rel_path(paths.kb_dir, abs_path)
-            st = abs_path.stat()
             size = int(st.st_size)
             mtime_ns = int(getattr(st, "st_mtime_ns", int(st.st_mtime * 1e9)))
-            raw = abs_path.read_bytes()
-            content_hash = sha256_bytes(raw)
             prev = existing.get(rel_path)
-            if prev and prev["content_hash"] == content_hash and prev["size"] == size and prev["mtime_ns"] == mtime_ns:
+            if prev and int(prev["size"] or 0) == size and int(prev["mtime_ns"] or 0) == mtime_ns:
+                # size+mtime_ns 都没变就不读文件：重索引的大头是未变更文档
                 unchanged += 1
                 continue
-            changed.append(abs_path)
+            if prev and prev["content_hash"] == fast_content_hash(abs_path.read_bytes()):
+                # 仅元数据变化（如 touch）：内容指纹兜底，避免整篇重索引；
+                # 回写新 stat，下次就能走上面的免读快路径
+                touched.append((mtime_ns, size, prev["doc_id"]))
+                unchanged += 1
+                continue
+            changed.append((abs_path, st))
 
         logger.info("diff deleted=%d changed=%d unchanged=%d", len(deleted), len(changed), unchanged)
 
@@ -101,22 +105,29 @@ def index_kb(
         conn.execute("BEGIN")
         for doc_id in deleted:
             delete_doc(conn, doc_id=doc_id)
+        if touched:
+            conn.executemany("UPDATE docs SET mtime_ns=?, size=? WHERE doc_id=?", touched)
         conn.commit()
 
         oa_cfg = from_config_dict(cfg.get("openai_compat", {}) if isinstance(cfg, dict) else {})
+        quantization = str(cfg.get("embedding", {}).get("quantization", "") or "")
         can_embed = embed_chunks and bool(oa_cfg.base_url and oa_cfg.model_embed)
         if embed_chunks and not can_embed:
             logger.warning("embed requested but openai_compat.base_url/model_embed not configured")
 
-        for i, abs_path in enumerate(changed, start=1):
+        # 整个增量批次走一个外层事务，每 _COMMIT_EVERY 篇提交一次：
+        # 避免每篇文档 + 每批向量各 fsync 一次，批量导入是数量级的差距
+        docs_in_tx = 0
+        if changed:
+            conn.execute("BEGIN IMMEDIATE")
+        for i, (abs_path, st) in enumerate(changed, start=1):
             rel_path = _rel_path(paths.kb_dir, abs_path)
             logger.info("indexing %d/%d: %s", i, len(changed), rel_path)
-            st = abs_path.stat()
             raw = abs_path.read_bytes()
-            content_hash = sha256_bytes(raw)
+            content_hash = fast_content_hash(raw)
             text = raw.decode("utf-8", errors="replace")
 
-            fm, chunks = chunk_markdown(
+            fm, chunks, links = chunk_markdown(
                 text,
                 max_chars=int(cfg.get("chunking", {}).get("max_chars", 1200)),
                 overlap_chars=int(cfg.get("chunking", {}).get("overlap_chars", 150)),
@@ -145,9 +156,12 @@ def index_kb(
                     }
                 )
 
-            links = extract_links(text)
             doc_id = sha256_text(rel_path)
-            conn = _transactional_upsert(
+            # 旧向量按 text_hash 留档：局部编辑时未变动的 chunk 不必重新请求 embedding
+            reusable: dict[str, tuple[int, bytes, float, float]] = {}
+            if can_embed and chunk_dicts:
+                reusable = fetch_doc_embeddings_by_text_hash(conn, doc_id=doc_id, model=oa_cfg.model_embed)
+            upsert_doc_and_chunks(
                 conn,
                 doc_id=doc_id,
                 rel_path=rel_path,
@@ -159,7 +173,7 @@ def index_kb(
                 mtime_ns=int(getattr(st, "st_mtime_ns", int(st.st_mtime * 1e9))),
                 size=int(st.st_size),
                 content_hash=content_hash,
-                chunk_dicts=chunk_dicts,
+                chunks=chunk_dicts,
                 links=links,
             )
 
@@ -167,17 +181,41 @@ def index_kb(
             updated_chunks += len(chunk_dicts)
 
             if can_embed and chunk_dicts:
+                reused = [c for c in chunk_dicts if c["text_hash"] in reusable]
+                misses = [c for c in chunk_dicts if c["text_hash"] not in reusable]
+                if reused:
+                    upsert_embeddings_raw(
+                        conn,
+                        model=oa_cfg.model_embed,
+                        rows=[(c["chunk_id"],) + reusable[c["text_hash"]] for c in reused],
+                    )
                 try:
-                    logger.info("embedding chunks=%d: %s", len(chunk_dicts), rel_path)
-                    vecs = _embed_in_batches(oa_cfg, [c["text"] for c in chunk_dicts], batch_size=32)
-                    conn.execute("BEGIN")
-                    upsert_embeddings(conn, model=oa_cfg.model_embed, embeddings=list(zip([c["chunk_id"] for c in chunk_dicts], vecs)))
-                    conn.commit()
-                    embedded_chunks_n += len(chunk_dicts)
+                    if misses:
+                        logger.info("embedding chunks=%d reused=%d: %s", len(misses), len(reused), rel_path)
+                        vecs = _embed_in_batches(
+                            oa_cfg,
+                            [c["text"] for c in misses],
+                            batch_size=int(getattr(oa_cfg, "embed_batch_size", 128) or 128),
+                        )
+                        upsert_embeddings(
+                            conn,
+                            model=oa_cfg.model_embed,
+                            embeddings=list(zip([c["chunk_id"] for c in misses], vecs)),
+                            quantization=quantization,
+                        )
+                        embedded_chunks_n += len(misses)
                 except OpenAICompatError as e:
-                    conn.rollback()
+                    # embed 失败时本文档的新向量一行未写，复用行与文档行保留在事务中
                     logger.warning("embedding failed, skip: %s (%s)", rel_path, str(e))
 
+            docs_in_tx += 1
+            if docs_in_tx >= _COMMIT_EVERY:
+                conn.commit()
+                conn.execute("BEGIN IMMEDIATE")
+                docs_in_tx = 0
+        if changed:
+            conn.commit()
+
         conn.execute("BEGIN")
         log_action(
             conn,
@@ -194,6 +232,9 @@ def index_kb(
         )
         conn.commit()
 
+        if deleted or updated_docs:
+            clear_semantic_cache(paths.vector_dir)
+
         logger.info(
             "index done deleted=%d updated_docs=%d updated_chunks=%d embedded_chunks=%d unchanged=%d",
             len(deleted),
@@ -214,40 +255,25 @@ def index_kb(
         conn.close()
 
 
-def _transactional_upsert(
-    conn,
-    *,
-    doc_id: str,
-    rel_path: str,
-    abs_path: str,
-    title: str,
-    summary: str,
-    tags: list[str],
-    keywords: list[str],
-    mtime_ns: int,
-    size: int,
-    content_hash: str,
-    chunk_dicts: list[dict[str, Any]],
-    links: list[dict[str, str]],
-):
-    conn.execute("BEGIN")
-    upsert_doc_and_chunks(
-        conn,
-        doc_id=doc_id,
-        rel_path=rel_path,
-        abs_path=abs_path,
-        title=title,
-        summary=summary,
-        tags=tags,
-        keywords=keywords,
-        mtime_ns=mtime_ns,
-        size=size,
-        content_hash=content_hash,
-        chunks=chunk_dicts,
-        links=links,
-    )
-    conn.commit()
-    return conn
+def _load_existing_docs(conn, *, only: Optional[set[str]]) -> dict[str, Any]:
+    """取回 diff 需要的 docs 行；given only 时把过滤下推到 SQL。
+
+    rel_path 列带 UNIQUE 约束（自带索引），按 500 个一批走 IN 查询，
+    避免为了几个文件把整张 docs 表拉进内存。
+    """
+    sel = "SELECT doc_id, rel_path, content_hash, mtime_ns, size FROM docs"
+    existing: dict[str, Any] = {}
+    if only is None:
+        for r in conn.execute(sel):
+            existing[r["rel_path"]] = r
+        return existing
+    only_list = sorted(only)
+    for i in range(0, len(only_list), 500):
+        batch = only_list[i : i + 500]
+        placeholders = ",".join("?" * len(batch))
+        for r in conn.execute(f"{sel} WHERE rel_path IN ({placeholders})", batch):
+            existing[r["rel_path"]] = r
+    return existing
 
 
 def _refresh_dir_meta_cache(conn, kb_dir: Path, *, meta_filename: str) -> None:
@@ -260,17 +286,30 @@ def _refresh_dir_meta_cache(conn, kb_dir: Path, *, meta_filename: str) -> None:
         upsert_dir_meta(conn, dir_rel_path=rel, meta=meta)
 
 
-def _scan_markdown_files(kb_dir: Path, *, meta_filename: str) -> Iterable[Path]:
-    for dirpath, dirnames, filenames in os.walk(kb_dir):
-        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
-        for name in filenames:
+def _scan_markdown_files(kb_dir: Path, *, meta_filename: str) -> Iterable[tuple[Path, os.stat_result]]:
+    """os.scandir 遍历 .md 文件，顺带产出 DirEntry 缓存的 stat，免去 diff 阶段的二次系统调用。"""
+    stack = [str(kb_dir)]
+    while stack:
+        cur = stack.pop()
+        try:
+            with os.scandir(cur) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        for entry in entries:
+            name = entry.name
             if name.startswith("."):
                 continue
-            if name == meta_filename:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+                continue
+            if name == meta_filename or not name.lower().endswith(".md"):
                 continue
-            if not name.lower().endswith(".md"):
+            try:
+                st = entry.stat()
+            except OSError:
                 continue
-            yield Path(dirpath) / name
+            yield Path(entry.path), st
 
 
 def _rel_path(kb_dir: Path, abs_path: Path) -> str:
@@ -300,13 +339,59 @@ def _as_str_list(v: Any) -> list[str]:
     return []
 
 
+def _approx_tokens(text: str) -> int:
+    # 粗略估算：ASCII 约 4 字符/token（4 字节），CJK 约 1 字/token（3 字节），
+    # 统一按 UTF-8 字节数 //3 取偏保守的上界
+    return max(1, len(text.encode("utf-8")) // 3)
+
+
+def _pack_batches(texts: list[str], *, max_count: int, max_tokens: int) -> list[list[str]]:
+    batches: list[list[str]] = []
+    cur: list[str] = []
+    cur_tokens = 0
+    for t in texts:
+        t_tokens = _approx_tokens(t)
+        if cur and (len(cur) >= max_count or cur_tokens + t_tokens > max_tokens):
+            batches.append(cur)
+            cur = []
+            cur_tokens = 0
+        cur.append(t)
+        cur_tokens += t_tokens
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+def _embed_split_on_error(oa_cfg, batch: list[str]) -> list[list[float]]:
+    try:
+        return embed(oa_cfg, texts=batch)
+    except OpenAICompatError as e:
+        msg = str(e)
+        # 400/413 多半是单次请求超过服务端上限：对半拆分重试，其余错误原样抛出
+        if len(batch) > 1 and ("400" in msg or "413" in msg):
+            logger.warning("embed batch of %d rejected, splitting: %s", len(batch), msg)
+            mid = len(batch) // 2
+            return _embed_split_on_error(oa_cfg, batch[:mid]) + _embed_split_on_error(oa_cfg, batch[mid:])
+        raise
+
+
 def _embed_in_batches(oa_cfg, texts: list[str], *, batch_size: int) -> list[list[float]]:
+    max_tokens = max(1, int(getattr(oa_cfg, "embed_batch_tokens", 100000) or 100000))
+    batches = _pack_batches(texts, max_count=max(1, batch_size), max_tokens=max_tokens)
+    if not batches:
+        return []
+    if len(batches) == 1:
+        return _embed_split_on_error(oa_cfg, batches[0])
+    # embedding 请求是纯 I/O 等待，多批并发把总延迟从 批数×RTT 压到 ~RTT；
+    # 429/超时的退避重试在 _post_json 内部完成，这里只管并发与顺序
+    workers = max(1, min(int(getattr(oa_cfg, "concurrency", 8) or 1), len(batches)))
     out: list[list[float]] = []
-    i = 0
-    while i < len(texts):
-        batch = texts[i : i + batch_size]
-        if logger.isEnabledFor(logging.DEBUG):
-            logger.debug("embed batch %d-%d/%d", i + 1, min(i + len(batch), len(texts)), len(texts))
-        out.extend(embed(oa_cfg, texts=batch))
-        i += batch_size
+    if workers == 1:
+        for batch in batches:
+            out.extend(_embed_split_on_error(oa_cfg, batch))
+        return out
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # pool.map 按提交顺序产出，向量顺序与 texts 保持一致
+        for vecs in pool.map(lambda batch: _embed_split_on_error(oa_cfg, batch), batches):
+            out.extend(vecs)
     return out
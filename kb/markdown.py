@@ -1,20 +1,41 @@
 from __future__ import annotations
 
 import re
-from dataclasses import dataclass
 from typing import Any, Iterable, Optional
 
 from .util import sha256_text
 
+try:  # 可选加速：装有 PyYAML 时用 C 实现的 SafeLoader 解析 frontmatter
+    import yaml as _yaml
+
+    _yaml_loader = getattr(_yaml, "CSafeLoader", _yaml.SafeLoader)
+except Exception:
+    _yaml = None
+    _yaml_loader = None
+
 
-@dataclass(frozen=True)
 class Chunk:
-    chunk_index: int
-    heading_path: str
-    start_line: int
-    end_line: int
-    text: str
-    text_hash: str
+    """切分结果。__slots__ 省掉每实例 __dict__，大库切出十万级 chunk 时内存减半；
+    dataclass(slots=True) 需要 3.10，项目下限是 3.9，故手写。"""
+
+    __slots__ = ("chunk_index", "heading_path", "start_line", "end_line", "text", "text_hash")
+
+    def __init__(
+        self,
+        *,
+        chunk_index: int,
+        heading_path: str,
+        start_line: int,
+        end_line: int,
+        text: str,
+        text_hash: str,
+    ) -> None:
+        self.chunk_index = chunk_index
+        self.heading_path = heading_path
+        self.start_line = start_line
+        self.end_line = end_line
+        self.text = text
+        self.text_hash = text_hash
 
 
 _re_heading = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
@@ -35,6 +56,14 @@ def parse_frontmatter(lines: list[str]) -> tuple[dict[str, Any], int]:
     if end is None:
         return {}, 0
     raw = "\n".join(lines[1:end]).strip()
+    if _yaml is not None:
+        try:
+            meta = _yaml.load(raw, Loader=_yaml_loader)
+        except Exception:
+            meta = None
+        if isinstance(meta, dict):
+            return meta, end + 1
+        # 解析失败或结果不是映射时退回内置的简化解析器
     meta = _parse_simple_yaml(raw)
     return meta, end + 1
 
@@ -176,12 +205,13 @@ def chunk_markdown(
     max_chars: int,
     overlap_chars: int,
     min_chars: int,
-) -> tuple[dict[str, Any], list[Chunk]]:
+) -> tuple[dict[str, Any], list[Chunk], list[dict[str, str]]]:
     lines = text.splitlines()
     fm, body_start = parse_frontmatter(lines)
 
     heading_stack: list[tuple[int, str]] = []
     chunks: list[Chunk] = []
+    links: list[dict[str, str]] = []
     chunk_index = 0
 
     paragraph_lines: list[str] = []
@@ -212,7 +242,15 @@ def chunk_markdown(
 
     for i in range(body_start, len(lines)):
         line = lines[i]
-        m = _re_heading.match(line)
+        # 链接提取合并进同一趟行遍历，省掉 extract_links 的两次全文扫描
+        if "](" in line:
+            for lm in _re_md_link.finditer(line):
+                links.append({"kind": "md", "target": lm.group(1).strip()})
+        if "[[" in line:
+            for lm in _re_wiki_link.finditer(line):
+                links.append({"kind": "wiki", "target": lm.group(1).strip()})
+        # 标题行必然以 # 开头，先做 O(1) 判断再进正则
+        m = _re_heading.match(line) if line.startswith("#") else None
         if m:
             flush_paragraph(i)
             level = len(m.group(1))
@@ -232,11 +270,13 @@ def chunk_markdown(
         paragraph_lines.append(line)
 
     flush_paragraph(len(lines))
-    return fm, chunks
+    return fm, chunks, links
 
 
 def guess_title(text: str, fallback: str) -> str:
     for line in text.splitlines():
+        if not line.startswith("#"):
+            continue
         m = _re_heading.match(line)
         if m and len(m.group(1)) == 1:
             return m.group(2).strip()
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import http.client
 import json
+import threading
 import time
 import urllib.error
 import urllib.request
 from dataclasses import dataclass
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
+from urllib.parse import urlsplit
 
 from .util import getenv_trim
 
@@ -19,22 +22,42 @@ class OpenAICompatConfig:
     timeout_s: int
     max_retries: int
     extra_headers: dict[str, str]
+    # 并发 embedding 请求数上限；HTTP 等待期间 GIL 释放，线程池即可近线性加速
+    concurrency: int = 8
+    # 单次 embedding 请求的条数/近似 token 上限，先到者截断一批
+    embed_batch_size: int = 128
+    embed_batch_tokens: int = 100000
+
+
+# serialized cfg -> OpenAICompatConfig；批量调用时同一配置只构造一次
+_from_config_cache: dict[str, OpenAICompatConfig] = {}
 
 
 def from_config_dict(cfg: dict[str, Any]) -> OpenAICompatConfig:
+    try:
+        cache_key = json.dumps(cfg, sort_keys=True, ensure_ascii=False, default=str)
+    except Exception:
+        cache_key = None
+    if cache_key is not None:
+        hit = _from_config_cache.get(cache_key)
+        if hit is not None:
+            return hit
     base_url = str(cfg.get("base_url", "")).rstrip("/")
     api_key_env = str(cfg.get("api_key_env", "KB_OPENAI_API_KEY"))
     model_chat = str(cfg.get("model_chat", ""))
     model_embed = str(cfg.get("model_embed", ""))
     timeout_s = int(cfg.get("timeout_s", 60))
     max_retries = int(cfg.get("max_retries", 2))
+    concurrency = int(cfg.get("concurrency", 8))
+    embed_batch_size = int(cfg.get("embed_batch_size", 128))
+    embed_batch_tokens = int(cfg.get("embed_batch_tokens", 100000))
     extra_headers_raw = cfg.get("extra_headers", {})
     extra_headers: dict[str, str] = {}
     if isinstance(extra_headers_raw, dict):
         for k, v in extra_headers_raw.items():
             if k and v is not None:
                 extra_headers[str(k)] = str(v)
-    return OpenAICompatConfig(
+    out = OpenAICompatConfig(
         base_url=base_url,
         api_key_env=api_key_env,
         model_chat=model_chat,
@@ -42,7 +65,15 @@ def from_config_dict(cfg: dict[str, Any]) -> OpenAICompatConfig:
         timeout_s=timeout_s,
         max_retries=max_retries,
         extra_headers=extra_headers,
+        concurrency=concurrency,
+        embed_batch_size=embed_batch_size,
+        embed_batch_tokens=embed_batch_tokens,
     )
+    if cache_key is not None:
+        if len(_from_config_cache) > 64:
+            _from_config_cache.clear()
+        _from_config_cache[cache_key] = out
+    return out
 
 
 class OpenAICompatError(RuntimeError):
@@ -60,6 +91,35 @@ def chat_completion(cfg: OpenAICompatConfig, *, messages: list[dict[str, Any]])
         raise OpenAICompatError(f"unexpected chat response: {e}") from e
 
 
+def chat_completion_stream(cfg: OpenAICompatConfig, *, messages: list[dict[str, Any]]) -> Iterator[str]:
+    if not cfg.base_url or not cfg.model_chat:
+        raise OpenAICompatError("openai_compat.base_url/model_chat not configured")
+    payload = {"model": cfg.model_chat, "messages": messages, "stream": True}
+    body = json.dumps(payload).encode("utf-8")
+    url = f"{cfg.base_url}/v1/chat/completions"
+    req = urllib.request.Request(url=url, data=body, headers=_request_headers(cfg), method="POST")
+    try:
+        resp = urllib.request.urlopen(req, timeout=cfg.timeout_s)
+    except (urllib.error.URLError, urllib.error.HTTPError, TimeoutError) as e:
+        raise OpenAICompatError(str(e)) from e
+    with resp:
+        for raw_line in resp:
+            line = raw_line.decode("utf-8", errors="replace").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                obj = json.loads(data)
+                delta = obj["choices"][0].get("delta") or {}
+                piece = delta.get("content")
+            except Exception:
+                continue
+            if piece:
+                yield piece
+
+
 def embed(cfg: OpenAICompatConfig, *, texts: list[str]) -> list[list[float]]:
     if not cfg.base_url or not cfg.model_embed:
         raise OpenAICompatError("openai_compat.base_url/model_embed not configured")
@@ -73,25 +133,91 @@ def embed(cfg: OpenAICompatConfig, *, texts: list[str]) -> list[list[float]]:
         raise OpenAICompatError(f"unexpected embeddings response: {e}") from e
 
 
-def _post_json(cfg: OpenAICompatConfig, url: str, payload: dict[str, Any]) -> dict[str, Any]:
-    body = json.dumps(payload).encode("utf-8")
+def _request_headers(cfg: OpenAICompatConfig) -> dict[str, str]:
     headers = {"Content-Type": "application/json"}
     headers.update(cfg.extra_headers)
     api_key = getenv_trim(cfg.api_key_env)
     if api_key:
         headers["Authorization"] = f"Bearer {api_key}"
+    return headers
+
+
+class _HTTPStatusError(Exception):
+    """非 2xx 响应；消息里保留状态码，上层据此判断 400/413 拆批等策略。"""
+
+
+# 每线程一份 {(scheme, netloc): HTTPConnection}：embedding 批次并发跑在线程池里，
+# 线程内复用连接即可把 N 次 TLS 握手摊薄成 1 次，且无需加锁
+_conn_local = threading.local()
+
+
+def _get_connection(scheme: str, netloc: str, timeout: int) -> http.client.HTTPConnection:
+    pool = getattr(_conn_local, "pool", None)
+    if pool is None:
+        pool = _conn_local.pool = {}
+    key = (scheme, netloc)
+    conn = pool.get(key)
+    if conn is None:
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        conn = cls(netloc, timeout=timeout)
+        pool[key] = conn
+    return conn
+
+
+def _proxy_applies(scheme: str, netloc: str) -> bool:
+    proxies = urllib.request.getproxies()
+    if scheme not in proxies:
+        return False
+    host = netloc.rsplit("@", 1)[-1]
+    try:
+        return not urllib.request.proxy_bypass(host)
+    except Exception:
+        return True
+
+
+def _http_post(url: str, *, body: bytes, headers: dict[str, str], timeout: int) -> bytes:
+    parts = urlsplit(url)
+    # http.client 直连不认 http(s)_proxy 环境变量；配了代理就退回 urllib，
+    # 与 chat_completion_stream 的传输行为保持一致
+    if _proxy_applies(parts.scheme, parts.netloc):
+        req = urllib.request.Request(url=url, data=body, headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                return resp.read()
+        except urllib.error.HTTPError as e:
+            # 统一成 _HTTPStatusError，上层按状态码做 400/413 拆批
+            raise _HTTPStatusError(f"HTTP Error {e.code}: {e.reason}") from e
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    conn = _get_connection(parts.scheme, parts.netloc, timeout)
+    try:
+        conn.request("POST", path, body=body, headers=headers)
+        resp = conn.getresponse()
+        raw = resp.read()
+    except Exception:
+        # 连接状态不明时关掉，HTTPConnection 下次 request 会自动重连
+        conn.close()
+        raise
+    if resp.status >= 400:
+        conn.close()
+        raise _HTTPStatusError(f"HTTP Error {resp.status}: {resp.reason}")
+    return raw
+
+
+def _post_json(cfg: OpenAICompatConfig, url: str, payload: dict[str, Any]) -> dict[str, Any]:
+    body = json.dumps(payload).encode("utf-8")
+    headers = _request_headers(cfg)
 
     last_err: Optional[Exception] = None
     for attempt in range(cfg.max_retries + 1):
         try:
-            req = urllib.request.Request(url=url, data=body, headers=headers, method="POST")
-            with urllib.request.urlopen(req, timeout=cfg.timeout_s) as resp:
-                raw = resp.read().decode("utf-8")
-            out = json.loads(raw)
+            raw = _http_post(url, body=body, headers=headers, timeout=cfg.timeout_s)
+            out = json.loads(raw.decode("utf-8"))
             if not isinstance(out, dict):
                 raise OpenAICompatError("response is not a JSON object")
             return out
-        except (urllib.error.URLError, urllib.error.HTTPError, json.JSONDecodeError, TimeoutError) as e:
+        except (OSError, http.client.HTTPException, _HTTPStatusError, json.JSONDecodeError, TimeoutError) as e:
             last_err = e
             if attempt >= cfg.max_retries:
                 break
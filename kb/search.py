@@ -2,14 +2,17 @@ from __future__ import annotations
 
 import heapq
 import logging
+import math
 import time
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Optional
 
 from .config import load_config, resolve_paths
+from .embed_cache import get_or_compute
 from .openai_compat import OpenAICompatError, embed, from_config_dict
 from .store_sqlite import fetch_chunk_records, iter_embeddings, open_db, read_embedding, search_fts
+from .util import resolve_path_cached
 
 logger = logging.getLogger(__name__)
 
@@ -49,7 +52,7 @@ def search_kb(
     fts_k: Optional[int] = None,
     vec_k: Optional[int] = None,
 ) -> list[RetrievedChunk]:
-    kb_root = kb_root.expanduser().resolve()
+    kb_root = resolve_path_cached(kb_root)
     cfg = load_config(kb_root)
     paths = resolve_paths(kb_root)
     db_path = paths.index_dir / "index.sqlite"
@@ -71,7 +74,7 @@ def search_kb(
         vec_scores: dict[str, float] = {}
         oa_cfg = from_config_dict(cfg.get("openai_compat", {}) if isinstance(cfg, dict) else {})
         if semantic or hybrid:
-            vec_scores = _semantic_scores(conn, oa_cfg, query=query, top_k=vec_k)
+            vec_scores = _semantic_scores(conn, oa_cfg, query=query, top_k=vec_k, vector_dir=paths.vector_dir)
             logger.info("vec hits=%d", len(vec_scores))
 
         merged: dict[str, tuple[float, str]] = {}
@@ -91,11 +94,17 @@ def search_kb(
         else:
             merged = {cid: (s, "fts") for cid, s in fts_scores.items()}
 
-        ranked = sorted(merged.items(), key=lambda x: x[1][0], reverse=True)[:top_k]
+        # 只要前 top_k 条，nlargest 是 O(N log k)，不必整表 sorted
+        ranked = heapq.nlargest(top_k, merged.items(), key=lambda x: x[1][0])
         chunk_ids = [cid for cid, _ in ranked]
         rows = fetch_chunk_records(conn, chunk_ids=chunk_ids)
+        # 按 chunk_id 对齐：某个 id 查不到记录时跳过，不能让 zip 错位
+        row_by_id = {r["chunk_id"]: r for r in rows}
         out: list[RetrievedChunk] = []
-        for (cid, (score, source)), row in zip(ranked, rows):
+        for cid, (score, source) in ranked:
+            row = row_by_id.get(cid)
+            if row is None:
+                continue
             out.append(
                 RetrievedChunk(
                     chunk_id=cid,
@@ -121,12 +130,16 @@ def _fts_sim(bm25_score: float) -> float:
     return 1.0 / (1.0 + s)
 
 
-def _semantic_scores(conn, oa_cfg, *, query: str, top_k: int) -> dict[str, float]:
+def _semantic_scores(conn, oa_cfg, *, query: str, top_k: int, vector_dir: Path) -> dict[str, float]:
     if not (oa_cfg.base_url and oa_cfg.model_embed):
         raise OpenAICompatError("openai_compat.base_url/model_embed not configured")
     started = time.perf_counter()
-    q = embed(oa_cfg, texts=[query])[0]
-    qv = [float(x) for x in q]
+    qv = get_or_compute(
+        vector_dir,
+        model_id=oa_cfg.model_embed,
+        text=query,
+        compute=lambda: embed(oa_cfg, texts=[query])[0],
+    )
     q_norm = _l2_norm_list(qv)
     if q_norm <= 0:
         return {}
@@ -137,14 +150,18 @@ def _semantic_scores(conn, oa_cfg, *, query: str, top_k: int) -> dict[str, float
 
     heap: list[tuple[float, str]] = []
     scanned = 0
-    for chunk_id, dim, blob, norm in iter_embeddings(conn, model=oa_cfg.model_embed):
+    for chunk_id, dim, blob, norm, scale in iter_embeddings(conn, model=oa_cfg.model_embed):
         scanned += 1
         if logger.isEnabledFor(logging.DEBUG) and scanned % 5000 == 0 and n_total > 0:
             logger.debug("semantic scan progress %d/%d", scanned, n_total)
         if dim <= 0 or norm <= 0:
             continue
-        v = read_embedding(blob)
-        score = _dot_list_array(qv, v) / (q_norm * norm)
+        v = read_embedding(blob, scale=scale)
+        dot = _dot_list_array(qv, v)
+        if scale > 0:
+            # int8 量化存储：反量化只需把点积整体乘回 scale
+            dot *= scale
+        score = dot / (q_norm * norm)
         if len(heap) < top_k:
             heapq.heappush(heap, (score, chunk_id))
         else:
@@ -157,16 +174,24 @@ def _semantic_scores(conn, oa_cfg, *, query: str, top_k: int) -> dict[str, float
     return {cid: float(max(0.0, s)) for s, cid in best}
 
 
-def _dot_list_array(a: list[float], b) -> float:
+# Python 3.12+ 有 C 实现的 math.sumprod，整条点积在 C 层完成；旧版本退回 zip 累加
+_sumprod = getattr(math, "sumprod", None)
+
+
+def _dot_list_array(a, b) -> float:
+    if len(a) != len(b):
+        n = min(len(a), len(b))
+        a = a[:n]
+        b = b[:n]
+    if _sumprod is not None:
+        return float(_sumprod(a, b))
     s = 0.0
-    n = min(len(a), len(b))
-    for i in range(n):
-        s += float(a[i]) * float(b[i])
+    for x, y in zip(a, b):
+        s += x * y
     return s
 
 
-def _l2_norm_list(a: list[float]) -> float:
-    s = 0.0
-    for x in a:
-        s += float(x) * float(x)
-    return s**0.5
+def _l2_norm_list(a) -> float:
+    if _sumprod is not None:
+        return math.sqrt(float(_sumprod(a, a)))
+    return math.sqrt(sum(x * x for x in a))
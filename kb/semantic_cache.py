@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Optional
+
+from .util import json_dumps_compact
+
+logger = logging.getLogger(__name__)
+
+_CACHE_FILENAME = "semantic_cache.sqlite"
+_MAX_ROWS = 256
+_TTL_S = 7 * 24 * 3600
+
+DEFAULT_THRESHOLD = 0.95
+
+
+def open_cache(vector_dir: Path) -> sqlite3.Connection:
+    vector_dir.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(vector_dir / _CACHE_FILENAME))
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS answers (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          model TEXT NOT NULL,
+          query TEXT NOT NULL,
+          vec BLOB NOT NULL,
+          answer TEXT NOT NULL,
+          sources_json TEXT NOT NULL,
+          ts INTEGER NOT NULL
+        )
+        """
+    )
+    conn.commit()
+    return conn
+
+
+def lookup_answer(
+    vector_dir: Path,
+    *,
+    model_id: str,
+    query_vec: list[float],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> Optional[dict[str, Any]]:
+    q_norm = _l2_norm(query_vec)
+    if q_norm <= 0:
+        return None
+    conn = open_cache(vector_dir)
+    try:
+        now = int(time.time())
+        best: Optional[tuple[float, Any]] = None
+        for row in conn.execute("SELECT id, query, vec, answer, sources_json, ts FROM answers WHERE model=?", (model_id,)):
+            if now - int(row[5]) > _TTL_S:
+                continue
+            vec = array("f")
+            vec.frombytes(bytes(row[2]))
+            v_norm = _l2_norm(vec)
+            if v_norm <= 0 or len(vec) != len(query_vec):
+                continue
+            sim = sum(a * float(b) for a, b in zip(query_vec, vec)) / (q_norm * v_norm)
+            if sim >= threshold and (best is None or sim > best[0]):
+                best = (sim, row)
+        if best is None:
+            return None
+        sim, row = best
+        logger.info("semantic cache hit sim=%.4f query=%s", sim, str(row[1])[:60])
+        conn.execute("UPDATE answers SET ts=? WHERE id=?", (now, int(row[0])))
+        conn.commit()
+        return {"query": str(row[1]), "answer": str(row[3]), "sources": json.loads(row[4])}
+    finally:
+        conn.close()
+
+
+def store_answer(
+    vector_dir: Path,
+    *,
+    model_id: str,
+    query: str,
+    query_vec: list[float],
+    answer: str,
+    sources: list[dict[str, Any]],
+) -> None:
+    arr = array("f", [float(x) for x in query_vec])
+    conn = open_cache(vector_dir)
+    try:
+        conn.execute(
+            "INSERT INTO answers(model, query, vec, answer, sources_json, ts) VALUES (?, ?, ?, ?, ?, ?)",
+            (model_id, query, arr.tobytes(), answer, json_dumps_compact(sources), int(time.time())),
+        )
+        _evict_lru(conn, max_rows=_MAX_ROWS)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def clear_cache(vector_dir: Path) -> None:
+    path = vector_dir / _CACHE_FILENAME
+    if not path.exists():
+        return
+    conn = open_cache(vector_dir)
+    try:
+        conn.execute("DELETE FROM answers")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _evict_lru(conn: sqlite3.Connection, *, max_rows: int) -> None:
+    n = int(conn.execute("SELECT COUNT(1) FROM answers").fetchone()[0])
+    if n <= max_rows:
+        return
+    conn.execute(
+        "DELETE FROM answers WHERE id IN (SELECT id FROM answers ORDER BY ts ASC LIMIT ?)",
+        (n - max_rows,),
+    )
+
+
+def _l2_norm(vec) -> float:
+    s = 0.0
+    for x in vec:
+        s += float(x) * float(x)
+    return s**0.5
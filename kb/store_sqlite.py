@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import functools
+import math
+import re
 import sqlite3
 from array import array
 from dataclasses import dataclass
@@ -9,6 +12,9 @@ from typing import Any, Iterable, Optional
 from .util import json_dumps_compact, now_iso, sha256_text
 
 
+_sumprod = getattr(math, "sumprod", None)
+
+
 @dataclass(frozen=True)
 class SearchHit:
     chunk_id: str
@@ -17,11 +23,21 @@ class SearchHit:
 
 def open_db(path: Path) -> sqlite3.Connection:
     path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(path))
+    # 语句缓存按 SQL 文本命中；上调到 512 覆盖全部热点语句，免去反复 prepare
+    conn = sqlite3.connect(str(path), cached_statements=512)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys=ON")
     conn.execute("PRAGMA journal_mode=WAL")
     conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    # 负值单位为 KiB：约 64MiB 页缓存，批量写入时显著减少换页
+    conn.execute("PRAGMA cache_size=-65536")
+    # 读路径（FTS 扫描、向量全表遍历）走 mmap 省 pread 系统调用；上限 256MiB
+    conn.execute("PRAGMA mmap_size=268435456")
+    # 旧版库的 embeddings 没有 scale 列，而 search/ask 只读不走 init_schema，
+    # 开连接时就地补列，避免 SELECT e.scale 直接报错；新建的空库无表可迁移
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='embeddings'").fetchone():
+        _ensure_column(conn, "embeddings", "scale", "REAL NOT NULL DEFAULT 0")
     return conn
 
 
@@ -75,10 +91,13 @@ def init_schema(conn: sqlite3.Connection) -> None:
           dim INTEGER NOT NULL,
           embedding BLOB NOT NULL,
           norm REAL NOT NULL,
+          scale REAL NOT NULL DEFAULT 0,
           created_at TEXT NOT NULL
         )
         """
     )
+    # 旧库没有 scale 列（0 表示 float32 未量化），补列即可兼容
+    _ensure_column(conn, "embeddings", "scale", "REAL NOT NULL DEFAULT 0")
 
     conn.execute(
         """
@@ -116,6 +135,35 @@ def init_schema(conn: sqlite3.Connection) -> None:
     conn.commit()
 
 
+def _autocommit(fn):
+    """调用方没开事务时，把整个写入包成一个 BEGIN IMMEDIATE/COMMIT。
+
+    批量路径（index_kb 的外层事务）不受影响：已在事务内则原样执行；
+    零散调用则避免依赖 sqlite3 的隐式事务、每条语句各自落盘。
+    """
+
+    @functools.wraps(fn)
+    def wrapper(conn: sqlite3.Connection, *args: Any, **kwargs: Any):
+        if conn.in_transaction:
+            return fn(conn, *args, **kwargs)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            out = fn(conn, *args, **kwargs)
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+        return out
+
+    return wrapper
+
+
+def _ensure_column(conn: sqlite3.Connection, table: str, column: str, decl: str) -> None:
+    cols = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in cols:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
 def log_action(conn: sqlite3.Connection, action: str, details: Optional[dict[str, Any]] = None) -> None:
     conn.execute(
         "INSERT INTO audit_log(ts, action, details_json) VALUES (?, ?, ?)",
@@ -144,13 +192,15 @@ def delete_doc(conn: sqlite3.Connection, *, doc_id: str) -> None:
     if row is None:
         return
     rel_path = row["rel_path"]
-    chunk_ids = [r["chunk_id"] for r in conn.execute("SELECT chunk_id FROM chunks WHERE doc_id=?", (doc_id,))]
-    if chunk_ids:
-        conn.executemany("DELETE FROM embeddings WHERE chunk_id=?", [(cid,) for cid in chunk_ids])
+    conn.execute(
+        "DELETE FROM embeddings WHERE chunk_id IN (SELECT chunk_id FROM chunks WHERE doc_id=?)",
+        (doc_id,),
+    )
     conn.execute("DELETE FROM chunk_fts WHERE rel_path=?", (rel_path,))
     conn.execute("DELETE FROM docs WHERE doc_id=?", (doc_id,))
 
 
+@_autocommit
 def upsert_doc_and_chunks(
     conn: sqlite3.Connection,
     *,
@@ -198,50 +248,61 @@ def upsert_doc_and_chunks(
         ),
     )
 
-    old_chunk_ids = [r["chunk_id"] for r in conn.execute("SELECT chunk_id FROM chunks WHERE doc_id=?", (doc_id,))]
-    if old_chunk_ids:
-        conn.executemany("DELETE FROM embeddings WHERE chunk_id=?", [(cid,) for cid in old_chunk_ids])
+    # 子查询一条语句删完旧向量，省去先 SELECT 回 Python 再逐 id DELETE 的往返
+    conn.execute(
+        "DELETE FROM embeddings WHERE chunk_id IN (SELECT chunk_id FROM chunks WHERE doc_id=?)",
+        (doc_id,),
+    )
     conn.execute("DELETE FROM chunks WHERE doc_id=?", (doc_id,))
     conn.execute("DELETE FROM chunk_fts WHERE rel_path=?", (rel_path,))
     conn.execute("DELETE FROM links WHERE source_rel_path=?", (rel_path,))
 
-    chunk_rows: list[tuple[Any, ...]] = []
-    fts_rows: list[tuple[Any, ...]] = []
-    for ch in chunks:
-        chunk_id = ch["chunk_id"]
-        chunk_rows.append(
-            (
-                chunk_id,
-                doc_id,
-                int(ch["chunk_index"]),
-                ch.get("heading_path") or "",
-                int(ch.get("start_line") or 0),
-                int(ch.get("end_line") or 0),
-                ch["text"],
-                ch["text_hash"],
-            )
-        )
-        fts_rows.append(
-            (
-                chunk_id,
-                _fts_text(ch["text"]),
-                _fts_text(title),
-                rel_path,
-                _fts_text(ch.get("heading_path") or ""),
-            )
-        )
-
-    if chunk_rows:
+    # title 对整个文档不变，heading_path 在同一文档内大量重复：
+    # 归一化一次后复用，免得每个 chunk 重扫同样的字符串
+    title_fts = _fts_text(title)
+    heading_fts_cache: dict[str, str] = {}
+
+    def heading_fts(hp: str) -> str:
+        out = heading_fts_cache.get(hp)
+        if out is None:
+            out = heading_fts_cache[hp] = _fts_text(hp)
+        return out
+
+    # executemany 接受任意可迭代对象：行元组按需生成、用完即弃，
+    # 大文档入库时不再整批攒两份行列表
+    chunk_list = chunks if isinstance(chunks, list) else list(chunks)
+    if chunk_list:
         conn.executemany(
             """
             INSERT INTO chunks(chunk_id, doc_id, chunk_index, heading_path, start_line, end_line, text, text_hash)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """,
-            chunk_rows,
+            (
+                (
+                    ch["chunk_id"],
+                    doc_id,
+                    int(ch["chunk_index"]),
+                    ch.get("heading_path") or "",
+                    int(ch.get("start_line") or 0),
+                    int(ch.get("end_line") or 0),
+                    ch["text"],
+                    ch["text_hash"],
+                )
+                for ch in chunk_list
+            ),
         )
         conn.executemany(
             "INSERT INTO chunk_fts(chunk_id, text, title, rel_path, heading_path) VALUES (?, ?, ?, ?, ?)",
-            fts_rows,
+            (
+                (
+                    ch["chunk_id"],
+                    _fts_text(ch["text"]),
+                    title_fts,
+                    rel_path,
+                    heading_fts(ch.get("heading_path") or ""),
+                )
+                for ch in chunk_list
+            ),
         )
 
     link_rows = [(rel_path, lk.get("target", ""), lk.get("kind", "md"), lk.get("anchor")) for lk in links if lk.get("target")]
@@ -252,32 +313,103 @@ def upsert_doc_and_chunks(
         )
 
 
+@_autocommit
 def upsert_embeddings(
     conn: sqlite3.Connection,
     *,
     model: str,
     embeddings: Iterable[tuple[str, list[float]]],
+    quantization: str = "",
 ) -> None:
+    int8 = quantization == "int8"
+    # 整批共用同一时间戳：datetime 格式化在万级批量里不便宜，语义上也同属一次写入
+    ts = now_iso()
     rows: list[tuple[Any, ...]] = []
     for chunk_id, vec in embeddings:
-        arr = array("f", [float(x) for x in vec])
+        # array 构造自身就做数值转 float32，无需先逐元素 float()
+        arr = array("f", vec)
         norm = _l2_norm(arr)
-        rows.append((chunk_id, model, len(arr), arr.tobytes(), float(norm), now_iso()))
-    if not rows:
-        return
-    conn.executemany(
+        if int8:
+            # 按向量最大绝对值缩放到 [-127, 127]；norm 仍取原始 float 向量的范数
+            m = max((abs(x) for x in arr), default=0.0)
+            scale = m / 127.0 if m > 0 else 1.0
+            q = array("b", [round(x / scale) for x in arr])
+            rows.append((chunk_id, model, len(q), q.tobytes(), float(norm), float(scale), ts))
+        else:
+            rows.append((chunk_id, model, len(arr), arr.tobytes(), float(norm), 0.0, ts))
+    _write_embedding_rows(conn, rows)
+
+
+def fetch_doc_embeddings_by_text_hash(
+    conn: sqlite3.Connection,
+    *,
+    doc_id: str,
+    model: str,
+) -> dict[str, tuple[int, bytes, float, float]]:
+    """取回某文档现有向量，按 chunk 的 text_hash 索引，供重索引时按内容复用。"""
+    out: dict[str, tuple[int, bytes, float, float]] = {}
+    rows = conn.execute(
         """
-        INSERT INTO embeddings(chunk_id, model, dim, embedding, norm, created_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(chunk_id) DO UPDATE SET
-          model=excluded.model,
-          dim=excluded.dim,
-          embedding=excluded.embedding,
-          norm=excluded.norm,
-          created_at=excluded.created_at
+        SELECT c.text_hash, e.dim, e.embedding, e.norm, e.scale
+        FROM chunks c
+        JOIN embeddings e ON e.chunk_id = c.chunk_id
+        WHERE c.doc_id = ? AND e.model = ?
         """,
-        rows,
+        (doc_id, model),
     )
+    for r in rows:
+        out[r["text_hash"]] = (int(r["dim"]), bytes(r["embedding"]), float(r["norm"]), float(r["scale"] or 0.0))
+    return out
+
+
+@_autocommit
+def upsert_embeddings_raw(
+    conn: sqlite3.Connection,
+    *,
+    model: str,
+    rows: Iterable[tuple[str, int, bytes, float, float]],
+) -> None:
+    """按存储格式原样写入 (chunk_id, dim, blob, norm, scale)，用于复用已有向量。"""
+    ts = now_iso()
+    payload = [(chunk_id, model, dim, blob, norm, scale, ts) for chunk_id, dim, blob, norm, scale in rows]
+    _write_embedding_rows(conn, payload)
+
+
+# 128 行 × 7 参数 = 896，留在老版本 SQLite 999 个绑定变量的上限之内
+_EMBED_WRITE_BATCH = 128
+
+
+def _write_embedding_rows(conn: sqlite3.Connection, payload: list[tuple[Any, ...]]) -> None:
+    """批量写入 embeddings 行。大批量先按 chunk_id 预删再走多 VALUES 的单条
+    INSERT，把每行一次的 VDBE 启动开销摊到整批；小批量仍用带 UPSERT 的 executemany。"""
+    if not payload:
+        return
+    if len(payload) < 4:
+        conn.executemany(
+            """
+            INSERT INTO embeddings(chunk_id, model, dim, embedding, norm, scale, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(chunk_id) DO UPDATE SET
+              model=excluded.model,
+              dim=excluded.dim,
+              embedding=excluded.embedding,
+              norm=excluded.norm,
+              scale=excluded.scale,
+              created_at=excluded.created_at
+            """,
+            payload,
+        )
+        return
+    for i in range(0, len(payload), _EMBED_WRITE_BATCH):
+        batch = payload[i : i + _EMBED_WRITE_BATCH]
+        marks = ",".join("?" for _ in batch)
+        conn.execute(f"DELETE FROM embeddings WHERE chunk_id IN ({marks})", [row[0] for row in batch])
+        values = ", ".join(["(?, ?, ?, ?, ?, ?, ?)"] * len(batch))
+        flat = [v for row in batch for v in row]
+        conn.execute(
+            f"INSERT INTO embeddings(chunk_id, model, dim, embedding, norm, scale, created_at) VALUES {values}",
+            flat,
+        )
 
 
 def search_fts(conn: sqlite3.Connection, *, query: str, limit: int) -> list[SearchHit]:
@@ -298,34 +430,59 @@ def search_fts(conn: sqlite3.Connection, *, query: str, limit: int) -> list[Sear
 def fetch_chunk_records(conn: sqlite3.Connection, *, chunk_ids: list[str]) -> list[sqlite3.Row]:
     if not chunk_ids:
         return []
-    placeholders = ",".join(["?"] * len(chunk_ids))
-    rows = conn.execute(
-        f"""
-        SELECT c.chunk_id, c.chunk_index, c.heading_path, c.start_line, c.end_line, c.text,
-               d.rel_path, d.title
-        FROM chunks c
-        JOIN docs d ON d.doc_id = c.doc_id
-        WHERE c.chunk_id IN ({placeholders})
-        """,
-        chunk_ids,
-    ).fetchall()
-    by_id = {r["chunk_id"]: r for r in rows}
+    # 快路径：整个 id 列表作为单个 JSON 参数传入，json_each 在引擎内
+    # 按数组下标保序，一条语句查完且不受绑定变量数上限约束
+    try:
+        return conn.execute(
+            """
+            SELECT c.chunk_id, c.chunk_index, c.heading_path, c.start_line, c.end_line, c.text,
+                   d.rel_path, d.title
+            FROM json_each(?) j
+            JOIN chunks c ON c.chunk_id = j.value
+            JOIN docs d ON d.doc_id = c.doc_id
+            ORDER BY j.key
+            """,
+            (json_dumps_compact(chunk_ids),),
+        ).fetchall()
+    except sqlite3.OperationalError:
+        pass  # 老编译没有 json1 扩展，退回分批 IN
+
+    by_id: dict[str, sqlite3.Row] = {}
+    # SQLite 默认变量上限 999，按 900 个一批拆 IN 查询
+    for i in range(0, len(chunk_ids), 900):
+        batch = chunk_ids[i : i + 900]
+        placeholders = ",".join(["?"] * len(batch))
+        for r in conn.execute(
+            f"""
+            SELECT c.chunk_id, c.chunk_index, c.heading_path, c.start_line, c.end_line, c.text,
+                   d.rel_path, d.title
+            FROM chunks c
+            JOIN docs d ON d.doc_id = c.doc_id
+            WHERE c.chunk_id IN ({placeholders})
+            """,
+            batch,
+        ):
+            by_id[r["chunk_id"]] = r
     return [by_id[cid] for cid in chunk_ids if cid in by_id]
 
 
-def iter_embeddings(conn: sqlite3.Connection, *, model: str) -> Iterable[tuple[str, int, bytes, float]]:
-    cur = conn.execute("SELECT chunk_id, dim, embedding, norm FROM embeddings WHERE model=?", (model,))
+def iter_embeddings(conn: sqlite3.Connection, *, model: str) -> Iterable[tuple[str, int, bytes, float, float]]:
+    cur = conn.execute("SELECT chunk_id, dim, embedding, norm, scale FROM embeddings WHERE model=?", (model,))
     for r in cur:
-        yield (r["chunk_id"], int(r["dim"]), bytes(r["embedding"]), float(r["norm"]))
+        yield (r["chunk_id"], int(r["dim"]), bytes(r["embedding"]), float(r["norm"]), float(r["scale"] or 0.0))
 
 
-def read_embedding(blob: bytes) -> array:
-    arr = array("f")
-    arr.frombytes(blob)
-    return arr
+def read_embedding(blob: bytes, *, scale: float = 0.0) -> memoryview:
+    # 直接把 BLOB cast 成 memoryview，不逐元素复制；
+    # 返回值支持 len/下标/迭代，配合 math.sumprod 即可零拷贝打分。
+    # scale > 0 表示 int8 量化存储，调用方需把点积结果再乘 scale
+    return memoryview(blob).cast("b" if scale > 0 else "f")
 
 
 def _l2_norm(arr: array) -> float:
+    # 3.12+ 的 math.sumprod 在 C 层完成整条平方和；旧版本退回解释器循环
+    if _sumprod is not None:
+        return math.sqrt(float(_sumprod(arr, arr)))
     s = 0.0
     for x in arr:
         s += float(x) * float(x)
@@ -349,22 +506,19 @@ def _fts_query(query: str) -> str:
     return q
 
 
+# CJK 统一表意文字（扩展 A / 基本区 / 兼容区）；正则在 C 层整段扫描，
+# 比逐字符 Python 循环快一个量级以上
+_re_cjk = re.compile(r"[㐀-䶿一-鿿豈-﫿]")
+
+
 def _contains_cjk(text: str) -> bool:
-    for ch in text:
-        o = ord(ch)
-        if 0x4E00 <= o <= 0x9FFF:
-            return True
-        if 0x3400 <= o <= 0x4DBF:
-            return True
-        if 0xF900 <= o <= 0xFAFF:
-            return True
-    return False
+    # 纯 ASCII 直接放行：isascii 是一次 C 层扫描，比字符类正则还便宜
+    if text.isascii():
+        return False
+    return _re_cjk.search(text) is not None
 
 
 def _cjk_space(text: str) -> str:
-    out: list[str] = []
-    for ch in text:
-        out.append(ch)
-        if _contains_cjk(ch):
-            out.append(" ")
-    return "".join(out)
+    if text.isascii():
+        return text
+    return _re_cjk.sub(r"\g<0> ", text)
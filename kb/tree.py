@@ -1,6 +1,10 @@
 from __future__ import annotations
 
 import logging
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Optional
 
@@ -32,26 +36,48 @@ def _collect_markdown_docs(kb_dir: Path, *, depth: Optional[int]) -> list[str]:
     docs: list[str] = []
     max_depth = None if depth is None else max(0, int(depth))
 
-    stack: list[tuple[Path, int]] = [(kb_dir, 0)]
-    while stack:
-        cur, d = stack.pop()
-        if max_depth is not None and d > max_depth:
-            continue
-        try:
-            entries = list(cur.iterdir())
-        except FileNotFoundError:
-            continue
-        entries.sort(key=lambda p: (not p.is_dir(), p.name))
-        for p in entries:
-            name = p.name
-            if name.startswith(".") or name == "__pycache__":
-                continue
-            if p.is_dir():
-                stack.append((p, d + 1))
-                continue
-            if p.suffix.lower() in {".md", ".markdown", ".mdown"}:
-                rel = p.relative_to(kb_dir).as_posix()
-                docs.append(rel)
+    # 目录队列 + 线程池并发 scandir：readdir 系统调用期间释放 GIL，
+    # 网络盘/机械盘上各目录的 I/O 得以重叠；遍历顺序无所谓，末尾统一排序。
+    # DirEntry 直接带 readdir 拿到的类型信息，免去 is_dir 每个条目的额外 stat
+    root = str(kb_dir)
+    pending: queue.Queue[Optional[tuple[str, int]]] = queue.Queue()
+    pending.put((root, 0))
+    docs_lock = threading.Lock()
+
+    def drain() -> None:
+        local: list[str] = []
+        while True:
+            item = pending.get()
+            if item is None:
+                break
+            cur, d = item
+            try:
+                if max_depth is None or d <= max_depth:
+                    with os.scandir(cur) as it:
+                        for entry in it:
+                            name = entry.name
+                            if name.startswith(".") or name == "__pycache__":
+                                continue
+                            if entry.is_dir(follow_symlinks=False):
+                                pending.put((entry.path, d + 1))
+                                continue
+                            if name.lower().endswith((".md", ".markdown", ".mdown")):
+                                local.append(os.path.relpath(entry.path, root).replace(os.sep, "/"))
+            except OSError:
+                pass
+            finally:
+                pending.task_done()
+        with docs_lock:
+            docs.extend(local)
+
+    n_workers = min(16, (os.cpu_count() or 4) * 4)
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        futures = [pool.submit(drain) for _ in range(n_workers)]
+        pending.join()  # 所有目录（含中途入队的子目录）处理完毕
+        for _ in futures:
+            pending.put(None)
+        for f in futures:
+            f.result()
 
     docs.sort()
     return docs
@@ -68,20 +94,29 @@ def _format_tree(root_label: str, rel_files: list[str]) -> str:
             node = node["_dirs"].setdefault(part, {"_files": [], "_dirs": {}})
         node["_files"].append(parts[-1])
 
-    def render(node: dict[str, Any], prefix: str) -> list[str]:
-        out: list[str] = []
+    # 显式栈做先序遍历：深目录不吃递归栈，所有行直接写进同一个列表，
+    # 不再逐层返回再拼接子列表
+    lines: list[str] = [root_label + "/"]
+    stack: list[tuple[str, Optional[dict[str, Any]], str]] = []
+
+    def push_entries(node: dict[str, Any], prefix: str) -> None:
         dirnames = sorted(node["_dirs"].keys())
         filenames = sorted(node["_files"])
         entries: list[tuple[str, str]] = [("dir", n) for n in dirnames] + [("file", f) for f in filenames]
-        for i, (kind, name) in enumerate(entries):
+        for i in range(len(entries) - 1, -1, -1):
+            kind, name = entries[i]
             is_last = i == len(entries) - 1
             branch = "└── " if is_last else "├── "
-            out.append(prefix + branch + (name + "/" if kind == "dir" else name))
             if kind == "dir":
                 child_prefix = prefix + ("    " if is_last else "│   ")
-                out.extend(render(node["_dirs"][name], child_prefix))
-        return out
+                stack.append((prefix + branch + name + "/", node["_dirs"][name], child_prefix))
+            else:
+                stack.append((prefix + branch + name, None, ""))
 
-    lines = [root_label + "/"]
-    lines.extend(render(root, ""))
+    push_entries(root, "")
+    while stack:
+        line, child, child_prefix = stack.pop()
+        lines.append(line)
+        if child is not None:
+            push_entries(child, child_prefix)
     return "\n".join(lines)
@@ -2,9 +2,15 @@ import hashlib
 import json
 import os
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Optional
 
+try:  # 可选加速：装有 orjson 时走 C 解析器，否则退回 stdlib json
+    import orjson as _orjson
+except Exception:
+    _orjson = None
+
 
 def now_iso() -> str:
     return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
@@ -20,6 +26,14 @@ def sha256_text(text: str) -> str:
     return sha256_bytes(text.encode("utf-8"))
 
 
+def fast_content_hash(data: bytes) -> str:
+    """变更检测/去重用的非加密指纹：blake2b 比 sha256 快且 stdlib 自带。
+
+    仅用于内容比对，不要用在需要抗碰撞攻击的场景（那种继续用 sha256_*）。
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
 def read_text(path: Path) -> str:
     return path.read_text(encoding="utf-8")
 
@@ -36,6 +50,9 @@ def read_json(path: Path) -> Any:
 
 
 def write_json_atomic(path: Path, obj: Any, *, indent: int = 2) -> None:
+    if _orjson is not None and indent == 2:
+        write_text_atomic(path, _orjson.dumps(obj, option=_orjson.OPT_INDENT_2).decode("utf-8") + "\n")
+        return
     write_text_atomic(path, json.dumps(obj, ensure_ascii=False, indent=indent) + "\n")
 
 
@@ -43,17 +60,32 @@ def safe_relpath(path: Path) -> str:
     return path.as_posix().lstrip("/")
 
 
+@lru_cache(maxsize=256)
 def ensure_rel_under_base(rel: str) -> str:
     rel = rel.replace("\\", "/").strip()
     rel = rel.lstrip("/")
     if rel in ("", "."):
         return ""
     parts = [p for p in rel.split("/") if p not in ("", ".")]
-    if any(p == ".." for p in parts):
+    if ".." in parts:
         raise ValueError("invalid relative path")
     return "/".join(parts)
 
 
+# 原始路径串 -> 解析结果；kb_root 在一次进程内基本固定，
+# 免去各入口重复 expanduser+resolve 的 O(深度) 次 lstat
+_resolve_cache: dict[str, Path] = {}
+
+
+def resolve_path_cached(p: Path) -> Path:
+    key = str(p)
+    cached = _resolve_cache.get(key)
+    if cached is None:
+        cached = p.expanduser().resolve()
+        _resolve_cache[key] = cached
+    return cached
+
+
 def getenv_trim(name: str) -> Optional[str]:
     v = os.getenv(name)
     if v is None:
@@ -63,4 +95,32 @@ def getenv_trim(name: str) -> Optional[str]:
 
 
 def json_dumps_compact(obj: Any) -> str:
+    if _orjson is not None:
+        return _orjson.dumps(obj).decode("utf-8")
     return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def json_dump_pretty(obj: Any, fp) -> None:
+    """带缩进 JSON 写入文本流并补换行。
+
+    orjson 路径一次性生成 bytes，能绕过 TextIOWrapper 时直接写底层 buffer；
+    stdlib 路径用 json.dump 流式写出，避免为大结果构造整串。
+    """
+    if _orjson is not None:
+        data = _orjson.dumps(obj, option=_orjson.OPT_INDENT_2) + b"\n"
+        buffer = getattr(fp, "buffer", None)
+        if buffer is not None:
+            fp.flush()
+            buffer.write(data)
+            buffer.flush()
+        else:
+            fp.write(data.decode("utf-8"))
+        return
+    json.dump(obj, fp, ensure_ascii=False, indent=2)
+    fp.write("\n")
+
+
+def json_loads(text: Any) -> Any:
+    if _orjson is not None:
+        return _orjson.loads(text)
+    return json.loads(text)
@@ -0,0 +1,27 @@
+"""测试共享的 kb_root 模板：init_kb 全进程只跑一次，其余用例克隆目录即可。"""
+
+import atexit
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from kb.bootstrap import init_kb
+
+_template_dir: Optional[Path] = None
+
+
+def _template() -> Path:
+    global _template_dir
+    if _template_dir is None:
+        d = Path(tempfile.mkdtemp(prefix="kb_tpl_"))
+        init_kb(d, force=False)
+        atexit.register(shutil.rmtree, str(d), True)
+        _template_dir = d
+    return _template_dir
+
+
+def clone_kb(kb_root: Path) -> Path:
+    """把预初始化好的模板复制进 kb_root，效果等同 init_kb(kb_root, force=False)。"""
+    shutil.copytree(_template(), kb_root, dirs_exist_ok=True)
+    return kb_root
@@ -4,12 +4,32 @@ import tempfile
 import unittest
 from trace import Trace
 
+try:  # 可选加速：装有 coverage.py 时走其 C tracer，比 trace 的纯 Python settrace 快一个量级以上
+    import coverage as _coverage
+except Exception:
+    _coverage = None
+
 
 def main() -> int:
     repo_root = Path(__file__).resolve().parents[1]
     if str(repo_root) not in sys.path:
         sys.path.insert(0, str(repo_root))
 
+    loader = unittest.TestLoader()
+    suite = loader.discover("tests")
+    runner = unittest.TextTestRunner(verbosity=2)
+
+    if _coverage is not None:
+        cov = _coverage.Coverage(source=[str(repo_root / "kb")])
+        cov.start()
+        try:
+            result = runner.run(suite)
+        finally:
+            cov.stop()
+        cov.report(show_missing=True)
+        return 0 if result.wasSuccessful() else 1
+
+    # 退路：stdlib trace，无外部依赖但明显更慢
     ignoredirs = []
     repo_root_str = str(repo_root)
     for p in sys.path:
@@ -24,10 +44,6 @@ def main() -> int:
         if Path(rp).is_dir():
             ignoredirs.append(rp)
 
-    loader = unittest.TestLoader()
-    suite = loader.discover("tests")
-    runner = unittest.TextTestRunner(verbosity=2)
-
     tracer = Trace(
         count=True,
         trace=False,
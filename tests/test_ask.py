@@ -106,6 +106,46 @@ class TestAskKB(unittest.TestCase):
         self.assertEqual(p_search.call_count, 1)
         self.assertEqual(p_chat.call_count, 1)
 
+    def test_ask_kb_streams_deltas_via_on_delta(self):
+        """
+        描述：传入 on_delta 时，ask_kb 应走 chat_completion_stream，逐段回调并返回拼接后的完整 answer。
+        前置条件：对 search_kb/chat_completion_stream 进行 stub。
+        测试步骤：
+          1) patch kb.ask.search_kb 返回固定 chunks
+          2) patch kb.ask.chat_completion_stream 产出两个 delta
+          3) 以 on_delta 回调调用 ask_kb
+        预期结果：
+          - on_delta 按顺序收到每个 delta
+          - answer 为全部 delta 拼接
+          - 非流式 chat_completion 未被调用
+        """
+        fake_chunks = [
+            RetrievedChunk(
+                chunk_id="c1",
+                rel_path="a.md",
+                title="A",
+                heading_path="",
+                start_line=1,
+                end_line=2,
+                text="ctx",
+                score=0.9,
+                source="fts",
+            )
+        ]
+        deltas: list[str] = []
+
+        with tempfile.TemporaryDirectory() as td:
+            kb_root = Path(td)
+            with patch("kb.ask.search_kb", return_value=fake_chunks):
+                with patch("kb.ask.chat_completion_stream", return_value=iter(["AN", "SWER"])) as p_stream:
+                    with patch("kb.ask.chat_completion") as p_chat:
+                        out = ask_kb(kb_root, query="Q", top_context=1, semantic=False, hybrid=False, on_delta=deltas.append)
+
+        self.assertEqual(deltas, ["AN", "SWER"])
+        self.assertEqual(out["answer"], "ANSWER")
+        self.assertEqual(p_stream.call_count, 1)
+        self.assertEqual(p_chat.call_count, 0)
+
 
 if __name__ == "__main__":
     unittest.main()
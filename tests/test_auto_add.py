@@ -4,8 +4,9 @@ import unittest
 from pathlib import Path
 from unittest.mock import patch
 
+from kb import auto_add
 from kb.auto_add import _extract_json_object, apply_auto_suggestion, default_filename, suggest_destination_with_llm
-from kb.bootstrap import init_kb
+from _kb_fixture import clone_kb
 from kb.openai_compat import OpenAICompatError
 
 
@@ -55,7 +56,7 @@ class TestApplyAutoSuggestion(unittest.TestCase):
         """
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
 
             suggestion = {
                 "suggested_rel_dir": "notes",
@@ -76,7 +77,7 @@ class TestApplyAutoSuggestion(unittest.TestCase):
     def test_apply_auto_suggestion_creates_meta_for_parent_dirs(self):
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
 
             suggestion = {
                 "suggested_rel_dir": "a/b/c",
@@ -93,7 +94,7 @@ class TestApplyAutoSuggestion(unittest.TestCase):
     def test_apply_auto_suggestion_applies_dir_meta_chain(self):
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
 
             suggestion = {
                 "suggested_rel_dir": "a/b/c",
@@ -116,6 +117,10 @@ class TestApplyAutoSuggestion(unittest.TestCase):
 
 
 class TestSuggestDestinationWithLLM(unittest.TestCase):
+    def setUp(self):
+        # 建议缓存按内容哈希进程内复用，这里各用例共用 src_text="x"，需隔离
+        auto_add._llm_suggest_cache.clear()
+
     def test_suggest_destination_with_llm_raises_on_invalid_json(self):
         """
         描述：模型返回无法解析为 JSON 对象时应抛 OpenAICompatError。
@@ -127,7 +132,7 @@ class TestSuggestDestinationWithLLM(unittest.TestCase):
         """
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
             with patch("kb.auto_add.chat_completion", return_value="not json"):
                 with self.assertRaises(OpenAICompatError):
                     suggest_destination_with_llm(kb_root, src_text="x", src_name="x.md")
@@ -143,7 +148,7 @@ class TestSuggestDestinationWithLLM(unittest.TestCase):
         """
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
             payload = {
                 "doc_title": "T",
                 "doc_summary": "S",
@@ -3,14 +3,14 @@ import unittest
 from pathlib import Path
 
 from kb.autoadd_bulk import autoadd_inbox
-from kb.bootstrap import init_kb
+from _kb_fixture import clone_kb
 
 
 class TestAutoAddBulk(unittest.TestCase):
     def test_autoadd_moves_text_files_out_of_inbox_by_default(self):
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
 
             inbox_dir = kb_root / "_inbox"
             (inbox_dir / "a.md").write_text("# A\n\nhello\n", encoding="utf-8")
@@ -33,7 +33,7 @@ class TestAutoAddBulk(unittest.TestCase):
     def test_autoadd_skips_hidden_and_binary_files(self):
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
 
             inbox_dir = kb_root / "_inbox"
             (inbox_dir / ".hidden.md").write_text("# hidden\n", encoding="utf-8")
@@ -1,30 +1,47 @@
 import io
-import json
+import re
 import tempfile
 import unittest
 from contextlib import redirect_stdout
 from pathlib import Path
 
-from kb.bootstrap import init_kb
+from _kb_fixture import clone_kb
 from kb.cli import main
 from kb.store_sqlite import init_schema, open_db, upsert_doc_and_chunks
-from kb.util import sha256_text
+from kb.util import json_loads, sha256_text
+
+# 固定输入的哈希在模块加载时算一次即可，每个用例不必重复计算
+_REL_PATH = "notes/a.md"
+_DOC_ID = sha256_text(_REL_PATH)
+_CHUNK_ID = sha256_text(_REL_PATH + "#0")
+_DOC_HASH = sha256_text("doc")
+_TEXT = "离线优先 工具"
+_TEXT_HASH = sha256_text(_TEXT)
+
+# 文本输出的关键片段按出现顺序并成一条正则，一次扫描代替逐个 assertIn
+_EXPECTED_TEXT_RE = re.compile(
+    r"Query: 离线优先.*Mode: fts.*Hits: 1.*\[1\] notes/a\.md:L10-L12.*heading: H1.*source: fts.*离线优先 工具",
+    re.S,
+)
 
 
 class TestCliSearch(unittest.TestCase):
+    def setUp(self):
+        # 复用同一块输出缓冲，各处用前清空即可
+        self.buf = io.StringIO()
+
     def _make_min_index(self, kb_root: Path) -> None:
         db_path = (kb_root / "kb_index" / "index.sqlite").expanduser().resolve()
         conn = open_db(db_path)
         try:
+            # 测试库用后即弃：建库阶段关掉日志与刷盘，提交不等磁盘
+            conn.executescript("PRAGMA journal_mode=MEMORY; PRAGMA synchronous=OFF;")
             init_schema(conn)
-            rel_path = "notes/a.md"
-            doc_id = sha256_text(rel_path)
-            chunk_id = sha256_text(rel_path + "#0")
-            conn.execute("BEGIN")
+            # 单笔写入交给 _autocommit 包事务
             upsert_doc_and_chunks(
                 conn,
-                doc_id=doc_id,
-                rel_path=rel_path,
+                doc_id=_DOC_ID,
+                rel_path=_REL_PATH,
                 abs_path="/abs/a.md",
                 title="A",
                 summary="",
@@ -32,52 +49,48 @@ class TestCliSearch(unittest.TestCase):
                 keywords=[],
                 mtime_ns=1,
                 size=1,
-                content_hash=sha256_text("doc"),
+                content_hash=_DOC_HASH,
                 chunks=[
                     {
-                        "chunk_id": chunk_id,
+                        "chunk_id": _CHUNK_ID,
                         "chunk_index": 0,
                         "heading_path": "H1",
                         "start_line": 10,
                         "end_line": 12,
-                        "text": "离线优先 工具",
-                        "text_hash": sha256_text("离线优先 工具"),
+                        "text": _TEXT,
+                        "text_hash": _TEXT_HASH,
                     }
                 ],
                 links=[],
             )
-            conn.commit()
         finally:
             conn.close()
 
     def test_cli_search_text_output(self):
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
             self._make_min_index(kb_root)
 
-            buf = io.StringIO()
+            buf = self.buf
+            buf.seek(0)
+            buf.truncate()
             with redirect_stdout(buf):
                 main(["search", "离线优先", "--kb-root", str(kb_root), "--top", "3"])
-            out = buf.getvalue()
-            self.assertIn("Query: 离线优先", out)
-            self.assertIn("Mode: fts", out)
-            self.assertIn("Hits: 1", out)
-            self.assertIn("[1] notes/a.md:L10-L12", out)
-            self.assertIn("heading: H1", out)
-            self.assertIn("source: fts", out)
-            self.assertIn("离线优先 工具", out)
+            self.assertRegex(buf.getvalue(), _EXPECTED_TEXT_RE)
 
     def test_cli_search_json_output_unchanged(self):
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
             self._make_min_index(kb_root)
 
-            buf = io.StringIO()
+            buf = self.buf
+            buf.seek(0)
+            buf.truncate()
             with redirect_stdout(buf):
                 main(["search", "离线优先", "--kb-root", str(kb_root), "--top", "3", "--json"])
-            payload = json.loads(buf.getvalue())
+            payload = json_loads(buf.getvalue())
             self.assertEqual(payload["query"], "离线优先")
             self.assertEqual(len(payload["results"]), 1)
             self.assertEqual(payload["results"][0]["path"], "notes/a.md")
@@ -6,22 +6,28 @@ from contextlib import redirect_stdout
 from pathlib import Path
 from unittest.mock import patch
 
-from kb.bootstrap import init_kb
+from _kb_fixture import clone_kb
 from kb.cli import main
 
 
 class TestCliTree(unittest.TestCase):
+    def setUp(self):
+        # 复用同一块输出缓冲，各处用前清空即可
+        self.buf = io.StringIO()
+
     def test_cli_tree_text_and_json(self):
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
 
             kb_dir = kb_root / "kb"
             (kb_dir / "root.md").write_text("# Root\n", encoding="utf-8")
             (kb_dir / "notes").mkdir(parents=True, exist_ok=True)
             (kb_dir / "notes" / "a.md").write_text("# A\n", encoding="utf-8")
 
-            buf = io.StringIO()
+            buf = self.buf
+            buf.seek(0)
+            buf.truncate()
             with redirect_stdout(buf):
                 main(["tree", "--kb-root", str(kb_root), "--depth", "0"])
             text_out = buf.getvalue()
@@ -29,7 +35,9 @@ class TestCliTree(unittest.TestCase):
             self.assertIn("root.md", text_out)
             self.assertNotIn("notes/a.md", text_out)
 
-            buf = io.StringIO()
+            buf = self.buf
+            buf.seek(0)
+            buf.truncate()
             with redirect_stdout(buf):
                 main(["tree", "--kb-root", str(kb_root), "--depth", "1", "--json"])
             payload = json.loads(buf.getvalue())
@@ -39,19 +47,23 @@ class TestCliTree(unittest.TestCase):
     def test_cli_tree_auto_kb_root_and_error_json(self):
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
 
             kb_dir = kb_root / "kb"
             (kb_dir / "root.md").write_text("# Root\n", encoding="utf-8")
 
-            buf = io.StringIO()
+            buf = self.buf
+            buf.seek(0)
+            buf.truncate()
             with patch("pathlib.Path.cwd", return_value=(kb_root / "kb")), redirect_stdout(buf):
                 main(["tree", "--depth", "0"])
             self.assertIn("root.md", buf.getvalue())
 
         with tempfile.TemporaryDirectory() as td:
             not_a_repo = Path(td)
-            buf = io.StringIO()
+            buf = self.buf
+            buf.seek(0)
+            buf.truncate()
             with patch("pathlib.Path.cwd", return_value=not_a_repo), redirect_stdout(buf):
                 with self.assertRaises(SystemExit) as cm:
                     main(["tree", "--depth", "0", "--json"])
@@ -7,6 +7,23 @@ from kb.config import default_config, load_config, resolve_paths, save_config
 
 
 class TestConfig(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # 全类共用一个临时 kb_root：用例只读写 kb_config.json，
+        # setUp 清掉该文件即可，省去每个用例一轮 mkdtemp + 清理
+        cls._td = tempfile.TemporaryDirectory()
+        cls.kb_root = Path(cls._td.name)
+        cls.root = cls.kb_root.expanduser().resolve()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._td.cleanup()
+
+    def setUp(self):
+        cfg_path = self.kb_root / "kb_config.json"
+        if cfg_path.exists():
+            cfg_path.unlink()
+
     def test_default_config_shape(self):
         """
         描述：验证默认配置的结构与关键字段。
@@ -34,21 +51,18 @@ class TestConfig(unittest.TestCase):
     def test_resolve_paths_uses_default_when_config_missing(self):
         """
         描述：未创建 kb_config.json 时，resolve_paths 应使用默认路径配置。
-        前置条件：临时目录内不存在 kb_config.json。
+        前置条件：kb_root 内不存在 kb_config.json。
         测试步骤：
-          1) 在临时目录作为 kb_root 调用 resolve_paths()
+          1) 以 kb_root 调用 resolve_paths()
         预期结果：
           - kb_dir/index_dir/vector_dir/config_path 均落在 kb_root 下
           - 子目录名为默认值 kb/kb_index/kb_vector
         """
-        with tempfile.TemporaryDirectory() as td:
-            kb_root = Path(td)
-            root = kb_root.expanduser().resolve()
-            paths = resolve_paths(kb_root)
-            self.assertEqual(paths.config_path, root / "kb_config.json")
-            self.assertEqual(paths.kb_dir, root / "kb")
-            self.assertEqual(paths.index_dir, root / "kb_index")
-            self.assertEqual(paths.vector_dir, root / "kb_vector")
+        paths = resolve_paths(self.kb_root)
+        self.assertEqual(paths.config_path, self.root / "kb_config.json")
+        self.assertEqual(paths.kb_dir, self.root / "kb")
+        self.assertEqual(paths.index_dir, self.root / "kb_index")
+        self.assertEqual(paths.vector_dir, self.root / "kb_vector")
 
     def test_resolve_paths_applies_paths_override(self):
         """
@@ -60,17 +74,14 @@ class TestConfig(unittest.TestCase):
         预期结果：
           - kb_dir/index_dir/vector_dir 使用自定义值
         """
-        with tempfile.TemporaryDirectory() as td:
-            kb_root = Path(td)
-            root = kb_root.expanduser().resolve()
-            cfg = default_config()
-            cfg["paths"] = {"kb": "data", "index": "idx", "vector": "vec"}
-            (kb_root / "kb_config.json").write_text(json.dumps(cfg), encoding="utf-8")
+        cfg = default_config()
+        cfg["paths"] = {"kb": "data", "index": "idx", "vector": "vec"}
+        (self.kb_root / "kb_config.json").write_text(json.dumps(cfg), encoding="utf-8")
 
-            paths = resolve_paths(kb_root)
-            self.assertEqual(paths.kb_dir, root / "data")
-            self.assertEqual(paths.index_dir, root / "idx")
-            self.assertEqual(paths.vector_dir, root / "vec")
+        paths = resolve_paths(self.kb_root)
+        self.assertEqual(paths.kb_dir, self.root / "data")
+        self.assertEqual(paths.index_dir, self.root / "idx")
+        self.assertEqual(paths.vector_dir, self.root / "vec")
 
     def test_resolve_paths_falls_back_on_invalid_config_json(self):
         """
@@ -83,14 +94,11 @@ class TestConfig(unittest.TestCase):
           - 不抛异常
           - 使用默认的 kb/kb_index/kb_vector
         """
-        with tempfile.TemporaryDirectory() as td:
-            kb_root = Path(td)
-            root = kb_root.expanduser().resolve()
-            (kb_root / "kb_config.json").write_text("{not valid json", encoding="utf-8")
-            paths = resolve_paths(kb_root)
-            self.assertEqual(paths.kb_dir, root / "kb")
-            self.assertEqual(paths.index_dir, root / "kb_index")
-            self.assertEqual(paths.vector_dir, root / "kb_vector")
+        (self.kb_root / "kb_config.json").write_text("{not valid json", encoding="utf-8")
+        paths = resolve_paths(self.kb_root)
+        self.assertEqual(paths.kb_dir, self.root / "kb")
+        self.assertEqual(paths.index_dir, self.root / "kb_index")
+        self.assertEqual(paths.vector_dir, self.root / "kb_vector")
 
     def test_resolve_paths_falls_back_when_paths_is_not_dict(self):
         """
@@ -102,14 +110,11 @@ class TestConfig(unittest.TestCase):
         预期结果：
           - 使用默认 kb/kb_index/kb_vector
         """
-        with tempfile.TemporaryDirectory() as td:
-            kb_root = Path(td)
-            root = kb_root.expanduser().resolve()
-            (kb_root / "kb_config.json").write_text(json.dumps({"paths": []}), encoding="utf-8")
-            paths = resolve_paths(kb_root)
-            self.assertEqual(paths.kb_dir, root / "kb")
-            self.assertEqual(paths.index_dir, root / "kb_index")
-            self.assertEqual(paths.vector_dir, root / "kb_vector")
+        (self.kb_root / "kb_config.json").write_text(json.dumps({"paths": []}), encoding="utf-8")
+        paths = resolve_paths(self.kb_root)
+        self.assertEqual(paths.kb_dir, self.root / "kb")
+        self.assertEqual(paths.index_dir, self.root / "kb_index")
+        self.assertEqual(paths.vector_dir, self.root / "kb_vector")
 
     def test_load_config_deep_merge_for_nested_dicts(self):
         """
@@ -122,14 +127,12 @@ class TestConfig(unittest.TestCase):
           - chunking.max_chars 为覆盖值
           - chunking.overlap_chars/min_chars 保留默认值
         """
-        with tempfile.TemporaryDirectory() as td:
-            kb_root = Path(td)
-            partial = {"chunking": {"max_chars": 42}}
-            (kb_root / "kb_config.json").write_text(json.dumps(partial), encoding="utf-8")
-            cfg = load_config(kb_root)
-            self.assertEqual(cfg["chunking"]["max_chars"], 42)
-            self.assertEqual(cfg["chunking"]["overlap_chars"], default_config()["chunking"]["overlap_chars"])
-            self.assertEqual(cfg["chunking"]["min_chars"], default_config()["chunking"]["min_chars"])
+        partial = {"chunking": {"max_chars": 42}}
+        (self.kb_root / "kb_config.json").write_text(json.dumps(partial), encoding="utf-8")
+        cfg = load_config(self.kb_root)
+        self.assertEqual(cfg["chunking"]["max_chars"], 42)
+        self.assertEqual(cfg["chunking"]["overlap_chars"], default_config()["chunking"]["overlap_chars"])
+        self.assertEqual(cfg["chunking"]["min_chars"], default_config()["chunking"]["min_chars"])
 
     def test_load_config_returns_default_when_root_has_non_dict_json(self):
         """
@@ -141,12 +144,10 @@ class TestConfig(unittest.TestCase):
         预期结果：
           - 返回值与 default_config() 的关键字段一致
         """
-        with tempfile.TemporaryDirectory() as td:
-            kb_root = Path(td)
-            (kb_root / "kb_config.json").write_text("[]", encoding="utf-8")
-            cfg = load_config(kb_root)
-            self.assertEqual(cfg["schema_version"], default_config()["schema_version"])
-            self.assertEqual(cfg["paths"], default_config()["paths"])
+        (self.kb_root / "kb_config.json").write_text("[]", encoding="utf-8")
+        cfg = load_config(self.kb_root)
+        self.assertEqual(cfg["schema_version"], default_config()["schema_version"])
+        self.assertEqual(cfg["paths"], default_config()["paths"])
 
     def test_load_config_raises_on_invalid_json(self):
         """
@@ -158,29 +159,25 @@ class TestConfig(unittest.TestCase):
         预期结果：
           - 抛出异常（json.JSONDecodeError）
         """
-        with tempfile.TemporaryDirectory() as td:
-            kb_root = Path(td)
-            (kb_root / "kb_config.json").write_text("{oops", encoding="utf-8")
-            with self.assertRaises(json.JSONDecodeError):
-                load_config(kb_root)
+        (self.kb_root / "kb_config.json").write_text("{oops", encoding="utf-8")
+        with self.assertRaises(json.JSONDecodeError):
+            load_config(self.kb_root)
 
     def test_save_config_round_trip(self):
         """
         描述：save_config 应将配置写入 kb_config.json，且可被 load_config 再读出。
-        前置条件：临时目录作为 kb_root。
+        前置条件：共享临时目录作为 kb_root。
         测试步骤：
           1) 调用 save_config 写入自定义配置
           2) 调用 load_config 读取
         预期结果：
           - 读取结果包含写入的字段（并与默认配置合并）
         """
-        with tempfile.TemporaryDirectory() as td:
-            kb_root = Path(td)
-            cfg = default_config()
-            cfg["meta_filename"] = "META.json"
-            save_config(kb_root, cfg)
-            loaded = load_config(kb_root)
-            self.assertEqual(loaded["meta_filename"], "META.json")
+        cfg = default_config()
+        cfg["meta_filename"] = "META.json"
+        save_config(self.kb_root, cfg)
+        loaded = load_config(self.kb_root)
+        self.assertEqual(loaded["meta_filename"], "META.json")
 
 
 if __name__ == "__main__":
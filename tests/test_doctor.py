@@ -4,16 +4,23 @@ import unittest
 from pathlib import Path
 from unittest.mock import patch
 
+import kb.openai_compat as _oc
+
 from kb.doctor import doctor_kb
 from kb.doctor import format_doctor_report
-from kb.util import write_json_atomic
+from kb.util import json_dumps_compact
+
+
+def _write_cfg(path, cfg):
+    # 测试配置用后即弃，直接写文件即可，不必走 write_json_atomic 的临时文件 + rename
+    path.write_text(json_dumps_compact(cfg), encoding="utf-8")
 
 
 class TestDoctor(unittest.TestCase):
     def test_doctor_runs_chat_and_embed(self):
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            write_json_atomic(
+            _write_cfg(
                 kb_root / "kb_config.json",
                 {
                     "openai_compat": {
@@ -34,7 +41,7 @@ class TestDoctor(unittest.TestCase):
                 raise AssertionError(url)
 
             with patch.dict(os.environ, {"KB_TEST_KEY": "secret"}):
-                with patch("kb.openai_compat._post_json", side_effect=fake_post_json):
+                with patch.object(_oc, "_post_json", side_effect=fake_post_json):
                     out = doctor_kb(kb_root, check_chat=False, check_embed=False, text="ping")
 
             self.assertTrue(out["ok"])
@@ -55,7 +62,7 @@ class TestDoctor(unittest.TestCase):
     def test_doctor_supports_single_check(self):
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            write_json_atomic(
+            _write_cfg(
                 kb_root / "kb_config.json",
                 {
                     "openai_compat": {
@@ -67,7 +74,7 @@ class TestDoctor(unittest.TestCase):
                 },
             )
 
-            with patch("kb.openai_compat._post_json", return_value={"choices": [{"message": {"content": "ok"}}]}):
+            with patch.object(_oc, "_post_json", return_value={"choices": [{"message": {"content": "ok"}}]}):
                 out = doctor_kb(kb_root, check_chat=True, check_embed=False, text="ping")
             self.assertIn("chat", out["checks"])
             self.assertNotIn("embed", out["checks"])
@@ -2,25 +2,27 @@ import tempfile
 import unittest
 from pathlib import Path
 
-from kb.bootstrap import init_kb
+from _kb_fixture import clone_kb
 from kb.indexer import index_kb
 from kb.importer import add_to_kb
 from kb.search import search_kb
 
+# 固定语料在导入时编码一次，用例里直接写 bytes
+_DEMO_MD = (
+    "# 离线优先知识库\n\n这是一个离线优先的本地知识库工具。\n\n## 检索\n\n支持关键词检索与引用定位。\n"
+).encode("utf-8")
+
 
 class TestE2E(unittest.TestCase):
     def test_init_add_index_search_and_delete(self):
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
 
             src_dir = kb_root / "_src"
             src_dir.mkdir(parents=True, exist_ok=True)
             src = src_dir / "demo.md"
-            src.write_text(
-                "# 离线优先知识库\n\n这是一个离线优先的本地知识库工具。\n\n## 检索\n\n支持关键词检索与引用定位。\n",
-                encoding="utf-8",
-            )
+            src.write_bytes(_DEMO_MD)
 
             add_out = add_to_kb(kb_root, src=src, dest_rel_dir="notes", auto=False, move=False)
             self.assertEqual(add_out["mode"], "manual")
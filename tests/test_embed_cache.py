@@ -0,0 +1,84 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from kb.embed_cache import clear_cache, get_or_compute
+
+
+class TestEmbedCache(unittest.TestCase):
+    def test_get_or_compute_caches_by_model_and_text(self):
+        """
+        描述：get_or_compute 首次应调用 compute 并落盘，重复查询应命中缓存不再计算。
+        前置条件：空的 vector_dir。
+        测试步骤：
+          1) 首次调用 get_or_compute
+          2) 用相同 (model_id, text) 再次调用
+        预期结果：
+          - compute 仅被调用 1 次
+          - 两次返回向量近似相等
+        """
+        with tempfile.TemporaryDirectory() as td:
+            vector_dir = Path(td) / "kb_vector"
+            calls = []
+
+            def compute():
+                calls.append(1)
+                return [3.0, 4.0]
+
+            v1 = get_or_compute(vector_dir, model_id="m", text="q", compute=compute)
+            v2 = get_or_compute(vector_dir, model_id="m", text="q", compute=compute)
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(len(v1), 2)
+            for a, b in zip(v1, v2):
+                self.assertAlmostEqual(a, b, places=5)
+
+    def test_different_model_or_text_misses_cache(self):
+        """
+        描述：key 由 model_id 与 text 共同决定，任一变化都应触发重新计算。
+        前置条件：已缓存 ("m", "q")。
+        测试步骤：
+          1) 写入 ("m", "q")
+          2) 分别查询 ("m2", "q") 与 ("m", "q2")
+        预期结果：
+          - compute 总计被调用 3 次
+        """
+        with tempfile.TemporaryDirectory() as td:
+            vector_dir = Path(td) / "kb_vector"
+            calls = []
+
+            def compute():
+                calls.append(1)
+                return [1.0]
+
+            get_or_compute(vector_dir, model_id="m", text="q", compute=compute)
+            get_or_compute(vector_dir, model_id="m2", text="q", compute=compute)
+            get_or_compute(vector_dir, model_id="m", text="q2", compute=compute)
+            self.assertEqual(len(calls), 3)
+
+    def test_clear_cache_forces_recompute(self):
+        """
+        描述：clear_cache 应清空缓存，使后续查询重新计算。
+        前置条件：已缓存 1 条记录。
+        测试步骤：
+          1) get_or_compute 写入缓存
+          2) clear_cache
+          3) 再次 get_or_compute
+        预期结果：
+          - compute 被调用 2 次
+        """
+        with tempfile.TemporaryDirectory() as td:
+            vector_dir = Path(td) / "kb_vector"
+            calls = []
+
+            def compute():
+                calls.append(1)
+                return [1.0, 2.0]
+
+            get_or_compute(vector_dir, model_id="m", text="q", compute=compute)
+            clear_cache(vector_dir)
+            get_or_compute(vector_dir, model_id="m", text="q", compute=compute)
+            self.assertEqual(len(calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -59,15 +59,18 @@ class TestDirMeta(unittest.TestCase):
         前置条件：existing/patc h 均为 dict。
         测试步骤：
           1) 对 tags/rules/summary/title 等字段合并
+          2) 再用等价 patch 重复合并（无实际变化场景）
         预期结果：
           - tags 去重合并
           - rules 合并更新
           - summary/title 非空不被覆盖
-          - updated_at 被刷新
+          - 有变化时 changed=True 且 updated_at 被刷新
+          - 无变化时 changed=False 且 updated_at 不变
         """
         existing = {"title": "T", "summary": "", "tags": ["a"], "keywords": [], "rules": {"x": 1}, "updated_at": "old"}
         patch = {"title": "T2", "summary": "S", "tags": ["a", "b"], "keywords": ["k"], "rules": {"y": 2}, "ignored": None}
-        merged = merge_meta(existing, patch)
+        merged, changed = merge_meta(existing, patch)
+        self.assertTrue(changed)
         self.assertEqual(merged["title"], "T")
         self.assertEqual(merged["summary"], "S")
         self.assertEqual(merged["tags"], ["a", "b"])
@@ -75,6 +78,10 @@ class TestDirMeta(unittest.TestCase):
         self.assertEqual(merged["rules"], {"x": 1, "y": 2})
         self.assertNotEqual(merged["updated_at"], "old")
 
+        merged2, changed2 = merge_meta(merged, {"tags": ["a"], "rules": {"x": 1}, "title": "T3"})
+        self.assertFalse(changed2)
+        self.assertEqual(merged2["updated_at"], merged["updated_at"])
+
     def test_ensure_dir_meta_chain_creates_meta_for_each_level(self):
         with tempfile.TemporaryDirectory() as td:
             root = Path(td)
@@ -3,7 +3,7 @@ import unittest
 from pathlib import Path
 from unittest.mock import patch
 
-from kb.bootstrap import init_kb
+from _kb_fixture import clone_kb
 from kb.markdown import parse_frontmatter
 from kb.importer import add_to_kb
 from kb.openai_compat import OpenAICompatError
@@ -21,7 +21,7 @@ class TestImporter(unittest.TestCase):
         """
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
             with self.assertRaises(FileNotFoundError):
                 add_to_kb(kb_root, src=kb_root / "nope.md", dest_rel_dir=None, auto=False, move=False)
 
@@ -39,7 +39,7 @@ class TestImporter(unittest.TestCase):
         """
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
 
             src_dir = kb_root / "_src"
             src_dir.mkdir(parents=True, exist_ok=True)
@@ -70,7 +70,7 @@ class TestImporter(unittest.TestCase):
         """
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
 
             src_dir = kb_root / "_src"
             src_dir.mkdir(parents=True, exist_ok=True)
@@ -103,7 +103,7 @@ class TestImporter(unittest.TestCase):
         """
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
 
             src_dir = kb_root / "_src"
             src_dir.mkdir(parents=True, exist_ok=True)
@@ -134,7 +134,7 @@ class TestImporter(unittest.TestCase):
         """
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
 
             src_root = kb_root / "_src_dir"
             (src_root / "sub").mkdir(parents=True, exist_ok=True)
@@ -163,7 +163,7 @@ class TestImporter(unittest.TestCase):
         """
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
             src_dir = kb_root / "_src"
             src_dir.mkdir(parents=True, exist_ok=True)
             src = src_dir / "demo.md"
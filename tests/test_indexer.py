@@ -4,7 +4,7 @@ import unittest
 from pathlib import Path
 from unittest.mock import patch
 
-from kb.bootstrap import init_kb
+from _kb_fixture import clone_kb
 from kb.indexer import index_kb
 from kb.openai_compat import OpenAICompatError
 from kb.store_sqlite import open_db
@@ -26,7 +26,7 @@ class TestIndexerBasicFlow(unittest.TestCase):
         """
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
             kb_dir = (kb_root / "kb").expanduser().resolve()
 
             p = kb_dir / "notes"
@@ -57,7 +57,7 @@ class TestIndexerBasicFlow(unittest.TestCase):
         """
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
             kb_dir = (kb_root / "kb").expanduser().resolve()
 
             (kb_dir / "a").mkdir(parents=True, exist_ok=True)
@@ -91,7 +91,7 @@ class TestIndexerBasicFlow(unittest.TestCase):
         """
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
             kb_dir = (kb_root / "kb").expanduser().resolve()
 
             (kb_dir / "notes").mkdir(parents=True, exist_ok=True)
@@ -147,7 +147,7 @@ class TestIndexerEmbeddings(unittest.TestCase):
         """
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
             self._write_openai_embed_config(kb_root)
 
             kb_dir = (kb_root / "kb").expanduser().resolve()
@@ -183,7 +183,7 @@ class TestIndexerEmbeddings(unittest.TestCase):
         """
         with tempfile.TemporaryDirectory() as td:
             kb_root = Path(td)
-            init_kb(kb_root, force=False)
+            clone_kb(kb_root)
             self._write_openai_embed_config(kb_root)
 
             kb_dir = (kb_root / "kb").expanduser().resolve()
@@ -120,7 +120,7 @@ class TestMarkdownChunking(unittest.TestCase):
                 "",  # 12
             ]
         )
-        fm, chunks = chunk_markdown(text, max_chars=10_000, overlap_chars=0, min_chars=1)
+        fm, chunks, _links = chunk_markdown(text, max_chars=10_000, overlap_chars=0, min_chars=1)
         self.assertEqual(fm.get("title"), "Doc")
         self.assertEqual(fm.get("tags"), ["t1"])
 
@@ -151,7 +151,7 @@ class TestMarkdownChunking(unittest.TestCase):
         """
         long_para = "0123456789" * 10  # 100 chars
         text = f"# H1\n\n{long_para}\n"
-        _, chunks = chunk_markdown(text, max_chars=20, overlap_chars=5, min_chars=1)
+        _, chunks, _ = chunk_markdown(text, max_chars=20, overlap_chars=5, min_chars=1)
         self.assertGreaterEqual(len(chunks), 4)
         for c in chunks:
             self.assertLessEqual(len(c.text.strip()), 20)
@@ -1,25 +1,15 @@
+import dataclasses
 import json
 import os
-import tempfile
 import unittest
 import urllib.error
 from unittest.mock import patch
 
-from kb.openai_compat import OpenAICompatError, chat_completion, embed, from_config_dict
+from kb.openai_compat import OpenAICompatError, chat_completion, chat_completion_stream, embed, from_config_dict
 
-
-class _FakeHTTPResponse:
-    def __init__(self, payload: dict):
-        self._raw = json.dumps(payload).encode("utf-8")
-
-    def read(self) -> bytes:
-        return self._raw
-
-    def __enter__(self):
-        return self
-
-    def __exit__(self, exc_type, exc, tb):
-        return False
+# 本模块全程不碰文件系统；各用例从同一份基准配置 replace 出差异字段，
+# 不必每次都走 from_config_dict 的规范化逻辑
+_CFG_BASE = from_config_dict({"base_url": "http://x", "model_chat": "m", "model_embed": "m", "max_retries": 0})
 
 
 class TestOpenAICompatConfig(unittest.TestCase):
@@ -60,7 +50,7 @@ class TestOpenAICompatAPI(unittest.TestCase):
         预期结果：
           - 抛 OpenAICompatError
         """
-        cfg = from_config_dict({"base_url": "", "model_chat": ""})
+        cfg = dataclasses.replace(_CFG_BASE, base_url="", model_chat="")
         with self.assertRaises(OpenAICompatError):
             chat_completion(cfg, messages=[])
 
@@ -73,7 +63,7 @@ class TestOpenAICompatAPI(unittest.TestCase):
         预期结果：
           - 抛 OpenAICompatError
         """
-        cfg = from_config_dict({"base_url": "", "model_embed": ""})
+        cfg = dataclasses.replace(_CFG_BASE, base_url="", model_embed="")
         with self.assertRaises(OpenAICompatError):
             embed(cfg, texts=["q"])
 
@@ -87,9 +77,8 @@ class TestOpenAICompatAPI(unittest.TestCase):
         预期结果：
           - 返回 content 字符串
         """
-        cfg = from_config_dict({"base_url": "http://x", "model_chat": "m"})
         with patch("kb.openai_compat._post_json", return_value={"choices": [{"message": {"content": "hi"}}]}):
-            out = chat_completion(cfg, messages=[{"role": "user", "content": "x"}])
+            out = chat_completion(_CFG_BASE, messages=[{"role": "user", "content": "x"}])
         self.assertEqual(out, "hi")
 
     def test_embed_sorts_by_index(self):
@@ -102,147 +91,138 @@ class TestOpenAICompatAPI(unittest.TestCase):
         预期结果：
           - embeddings 输出顺序与 index 升序一致
         """
-        cfg = from_config_dict({"base_url": "http://x", "model_embed": "m"})
         payload = {"data": [{"index": 1, "embedding": [2]}, {"index": 0, "embedding": [1]}]}
         with patch("kb.openai_compat._post_json", return_value=payload):
-            out = embed(cfg, texts=["a", "b"])
+            out = embed(_CFG_BASE, texts=["a", "b"])
         self.assertEqual(out, [[1], [2]])
 
     def test_post_json_adds_auth_and_extra_headers(self):
         """
         描述：_post_json 应添加 Authorization（当 env 存在）与 extra_headers。
-        前置条件：设置环境变量；urlopen 返回有效 JSON。
+        前置条件：设置环境变量；_http_post 返回有效 JSON。
         测试步骤：
-          1) patch urllib.request.urlopen 检查 Request headers
+          1) patch kb.openai_compat._http_post 检查 headers
           2) 调用 chat_completion（触发 _post_json）
         预期结果：
           - Authorization: Bearer <key> 存在
           - extra_headers 被透传
         """
-        cfg = from_config_dict(
-            {"base_url": "http://x", "model_chat": "m", "api_key_env": "KB_TEST_KEY", "max_retries": 0, "extra_headers": {"X-Test": "1"}}
-        )
+        cfg = dataclasses.replace(_CFG_BASE, api_key_env="KB_TEST_KEY", extra_headers={"X-Test": "1"})
 
-        def fake_urlopen(req, timeout):
-            self.assertEqual(req.get_method(), "POST")
-            hdrs = {str(k).lower(): str(v) for k, v in getattr(req, "headers", {}).items()}
+        def fake_http_post(url, *, body, headers, timeout):
+            hdrs = {str(k).lower(): str(v) for k, v in headers.items()}
             self.assertEqual(hdrs.get("x-test"), "1")
             self.assertEqual(hdrs.get("authorization"), "Bearer secret")
-            return _FakeHTTPResponse({"choices": [{"message": {"content": "ok"}}]})
+            return json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode("utf-8")
 
         with patch.dict(os.environ, {"KB_TEST_KEY": "secret"}):
-            with patch("urllib.request.urlopen", side_effect=fake_urlopen):
+            with patch("kb.openai_compat._http_post", side_effect=fake_http_post):
                 out = chat_completion(cfg, messages=[{"role": "user", "content": "x"}])
         self.assertEqual(out, "ok")
 
     def test_post_json_retries_then_succeeds(self):
         """
         描述：_post_json 遇到网络错误时应按 max_retries 重试，最终成功返回 JSON。
-        前置条件：第一次 urlopen 抛 URLError，第二次返回有效响应；sleep 被 patch 以免延迟。
+        前置条件：第一次 _http_post 抛 URLError，第二次返回有效响应；sleep 被 patch 以免延迟。
         测试步骤：
-          1) patch urllib.request.urlopen: raise -> success
+          1) patch kb.openai_compat._http_post: raise -> success
           2) patch time.sleep
           3) 调用 embed（触发 _post_json）
         预期结果：
           - 成功返回 embedding 列表
-          - urlopen 被调用至少 2 次
+          - _http_post 被调用至少 2 次
         """
-        cfg = from_config_dict({"base_url": "http://x", "model_embed": "m", "max_retries": 1, "timeout_s": 1})
+        cfg = dataclasses.replace(_CFG_BASE, max_retries=1, timeout_s=1)
         calls = {"n": 0}
 
-        def fake_urlopen(req, timeout):
+        def fake_http_post(url, *, body, headers, timeout):
             calls["n"] += 1
             if calls["n"] == 1:
                 raise urllib.error.URLError("boom")
-            return _FakeHTTPResponse({"data": [{"index": 0, "embedding": [1.0]}]})
+            return json.dumps({"data": [{"index": 0, "embedding": [1.0]}]}).encode("utf-8")
 
-        with patch("urllib.request.urlopen", side_effect=fake_urlopen):
+        with patch("kb.openai_compat._http_post", side_effect=fake_http_post):
             with patch("time.sleep", return_value=None):
                 out = embed(cfg, texts=["q"])
         self.assertEqual(out, [[1.0]])
         self.assertGreaterEqual(calls["n"], 2)
 
-    def test_chat_completion_raises_on_unexpected_response_shape(self):
+    def test_chat_completion_stream_assembles_deltas_until_done(self):
         """
-        描述：chat_completion 遇到非预期响应结构时应抛 OpenAICompatError（封装解析异常）。
-        前置条件：_post_json 返回缺失 choices/message/content 的对象。
+        描述：chat_completion_stream 应按 SSE data: 行组装 delta，跳过无关/畸形事件，遇 [DONE] 终止。
+        前置条件：urlopen 被 stub 返回固定字节行序列。
         测试步骤：
-          1) patch kb.openai_compat._post_json 返回不完整结构
-          2) 调用 chat_completion
+          1) patch urllib.request.urlopen 返回含注释行/非法 JSON/缺 delta/[DONE] 的行流
+          2) 消费 chat_completion_stream 迭代器
         预期结果：
-          - 抛 OpenAICompatError
+          - 仅产出两个有效 delta 且顺序正确
+          - [DONE] 之后的事件不再产出
         """
-        cfg = from_config_dict({"base_url": "http://x", "model_chat": "m"})
-        with patch("kb.openai_compat._post_json", return_value={"choices": []}):
-            with self.assertRaises(OpenAICompatError):
-                chat_completion(cfg, messages=[{"role": "user", "content": "x"}])
 
-    def test_embed_raises_on_unexpected_response_shape(self):
-        """
-        描述：embed 遇到非预期响应结构时应抛 OpenAICompatError。
-        前置条件：_post_json 返回缺失 embedding 的 data 项。
-        测试步骤：
-          1) patch kb.openai_compat._post_json
-          2) 调用 embed
-        预期结果：
-          - 抛 OpenAICompatError
-        """
-        cfg = from_config_dict({"base_url": "http://x", "model_embed": "m"})
-        with patch("kb.openai_compat._post_json", return_value={"data": [{"index": 0}]}):
-            with self.assertRaises(OpenAICompatError):
-                embed(cfg, texts=["q"])
+        class _FakeStream:
+            def __init__(self, lines):
+                self._lines = lines
 
-    def test_post_json_raises_when_response_is_not_object(self):
-        """
-        描述：_post_json 解析到 JSON 但根对象不是 dict 时应抛 OpenAICompatError。
-        前置条件：urlopen 返回 JSON 数组。
-        测试步骤：
-          1) patch urllib.request.urlopen 返回 \"[]\"
-          2) 调用 chat_completion（触发 _post_json）
-        预期结果：
-          - 抛 OpenAICompatError
-        """
-        cfg = from_config_dict({"base_url": "http://x", "model_chat": "m", "max_retries": 0})
-
-        class _Resp:
             def __enter__(self):
                 return self
 
             def __exit__(self, exc_type, exc, tb):
                 return False
 
-            def read(self):
-                return b"[]"
-
-        with patch("urllib.request.urlopen", return_value=_Resp()):
-            with self.assertRaises(OpenAICompatError):
-                chat_completion(cfg, messages=[{"role": "user", "content": "x"}])
-
-    def test_post_json_raises_on_invalid_json(self):
-        """
-        描述：_post_json 返回无法解析的 JSON 时，应在重试耗尽后抛 OpenAICompatError。
-        前置条件：urlopen 返回非法 JSON；max_retries=0。
+            def __iter__(self):
+                return iter(self._lines)
+
+        lines = [
+            b'data: {"choices":[{"delta":{"content":"\xe4\xbd\xa0"}}]}\n',
+            b"\n",
+            b": keep-alive\n",
+            b"data: not json\n",
+            b'data: {"choices":[]}\n',
+            b'data: {"choices":[{"delta":{}}]}\n',
+            b'data: {"choices":[{"delta":{"content":"\xe5\xa5\xbd"}}]}\n',
+            b"data: [DONE]\n",
+            b'data: {"choices":[{"delta":{"content":"late"}}]}\n',
+        ]
+        with patch("urllib.request.urlopen", return_value=_FakeStream(lines)):
+            pieces = list(chat_completion_stream(_CFG_BASE, messages=[{"role": "user", "content": "x"}]))
+        self.assertEqual(pieces, ["你", "好"])
+
+    def test_chat_completion_stream_requires_configuration(self):
+        """
+        描述：chat_completion_stream 未配置 base_url/model_chat 时应抛 OpenAICompatError。
+        前置条件：cfg.base_url 为空。
         测试步骤：
-          1) patch urllib.request.urlopen 返回 'not json'
-          2) 调用 embed
+          1) 消费 chat_completion_stream
         预期结果：
           - 抛 OpenAICompatError
         """
-        cfg = from_config_dict({"base_url": "http://x", "model_embed": "m", "max_retries": 0})
-
-        class _Resp:
-            def __enter__(self):
-                return self
-
-            def __exit__(self, exc_type, exc, tb):
-                return False
-
-            def read(self):
-                return b"not json"
+        cfg = dataclasses.replace(_CFG_BASE, base_url="", model_chat="")
+        with self.assertRaises(OpenAICompatError):
+            list(chat_completion_stream(cfg, messages=[]))
 
-        with patch("urllib.request.urlopen", return_value=_Resp()):
-            with self.assertRaises(OpenAICompatError):
-                embed(cfg, texts=["q"])
+    def test_malformed_responses_raise_openai_compat_error(self):
+        """
+        描述：响应结构异常（缺字段/根非 dict/非法 JSON）时，chat_completion 与 embed 均应抛 OpenAICompatError。
+        前置条件：共用一份同时配置 model_chat/model_embed 的 cfg；max_retries=0。
+        测试步骤：
+          1) 按矩阵逐项 patch _post_json 或 _http_post 返回坏响应
+          2) 在 subTest 中调用 chat_completion / embed
+        预期结果：
+          - 每一项均抛 OpenAICompatError
+        """
+        call_chat = lambda: chat_completion(_CFG_BASE, messages=[{"role": "user", "content": "x"}])
+        call_embed = lambda: embed(_CFG_BASE, texts=["q"])
+        cases = [
+            ("chat 缺 choices[0].message.content", "_post_json", {"choices": []}, call_chat),
+            ("embed data 项缺 embedding", "_post_json", {"data": [{"index": 0}]}, call_embed),
+            ("根对象不是 dict", "_http_post", b"[]", call_chat),
+            ("非法 JSON", "_http_post", b"not json", call_embed),
+        ]
+        for name, target, bad, call in cases:
+            with self.subTest(name):
+                with patch("kb.openai_compat." + target, return_value=bad):
+                    with self.assertRaises(OpenAICompatError):
+                        call()
 
 
 if __name__ == "__main__":
@@ -1,31 +1,113 @@
-import json
+import shutil
 import tempfile
 import unittest
 from pathlib import Path
 from unittest.mock import patch
 
-from kb.bootstrap import init_kb
+from _kb_fixture import clone_kb
 from kb.openai_compat import OpenAICompatError
 from kb.search import RetrievedChunk, _fts_sim, search_kb
 from kb.store_sqlite import init_schema, open_db, upsert_doc_and_chunks, upsert_embeddings
 from kb.util import sha256_text
 
+# 语义/混合用例只需要这两个键，直接 stub 掉 kb.search 的配置读取，
+# 免去每个用例读改写一轮 kb_config.json
+_EMBED_CFG = {"openai_compat": {"base_url": "http://x", "model_embed": "m"}}
+
+# 固定输入的哈希在模块加载时算一次，用例里直接引用常量
+_DOC_HASH = sha256_text("doc")
+_C0 = sha256_text("d.md#0")
+_C1 = sha256_text("d.md#1")
+
+
+def _chunk(idx, rel_path, text, *, heading="", start=1, end=1):
+    # 拼 chunk 字典的样板收拢到一处，chunk_id/text_hash 随手算好
+    return {
+        "chunk_id": sha256_text(f"{rel_path}#{idx}"),
+        "chunk_index": idx,
+        "heading_path": heading,
+        "start_line": start,
+        "end_line": end,
+        "text": text,
+        "text_hash": sha256_text(text),
+    }
+
 
 class TestSearchKB(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # 模板 kb_root 里带一个建好 schema 的空 index.sqlite；
+        # 各用例整树复制即可，init_kb 与 DDL 全类只跑一次
+        cls._td = tempfile.TemporaryDirectory()
+        cls._template = Path(cls._td.name) / "tpl"
+        clone_kb(cls._template)
+        conn = open_db((cls._template / "kb_index" / "index.sqlite").resolve())
+        try:
+            init_schema(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        # embed 的 stub 在类级启动一次，各用例只改 return_value，
+        # 省去每个用例 patch 进出时对模块全局的反复替换
+        cls._embed_patch = patch("kb.search.embed")
+        cls.mock_embed = cls._embed_patch.start()
+        cls.addClassCleanup(cls._embed_patch.stop)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._td.cleanup()
+
+    def setUp(self):
+        # 用例只读写 index.sqlite：不必整树复制模板，建好 kb_index 再拷一个库文件即可，
+        # 配置走 load_config 的缺省回退
+        td = tempfile.TemporaryDirectory()
+        self.addCleanup(td.cleanup)
+        self.kb_root = Path(td.name)
+        (self.kb_root / "kb_index").mkdir()
+        self.db_path = (self.kb_root / "kb_index" / "index.sqlite").resolve()
+        shutil.copy(self._template / "kb_index" / "index.sqlite", self.db_path)
+
+    def _seed_db(self, *, rel_path, title, chunks, embeddings=None):
+        # 统一的种子数据入口：单事务写入 doc/chunks（可选 embeddings）后立即关连接
+        conn = open_db(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            upsert_doc_and_chunks(
+                conn,
+                doc_id=sha256_text(rel_path),
+                rel_path=rel_path,
+                abs_path="/abs/" + rel_path,
+                title=title,
+                summary="",
+                tags=[],
+                keywords=[],
+                mtime_ns=1,
+                size=1,
+                content_hash=_DOC_HASH,
+                chunks=chunks,
+                links=[],
+            )
+            if embeddings:
+                upsert_embeddings(conn, model="m", embeddings=embeddings)
+            conn.commit()
+        finally:
+            conn.close()
+
     def test_search_raises_when_index_db_missing(self):
         """
         描述：索引库不存在时，search_kb 应抛出明确错误提示用户先 index。
-        前置条件：仅 init_kb（不会创建 index.sqlite）。
+        前置条件：kb_root 就绪但 index.sqlite 被移除。
         测试步骤：
           1) 调用 search_kb
         预期结果：
           - 抛 RuntimeError
         """
-        with tempfile.TemporaryDirectory() as td:
-            kb_root = Path(td)
-            init_kb(kb_root, force=False)
-            with self.assertRaises(RuntimeError):
-                search_kb(kb_root, query="x", top_k=5, semantic=False, hybrid=False)
+        for suffix in ("", "-wal", "-shm"):
+            p = Path(str(self.db_path) + suffix)
+            if p.exists():
+                p.unlink()
+        with self.assertRaises(RuntimeError):
+            search_kb(self.kb_root, query="x", top_k=5, semantic=False, hybrid=False)
 
     def test_search_fts_returns_retrieved_chunks(self):
         """
@@ -39,54 +121,18 @@ class TestSearchKB(unittest.TestCase):
           - source == 'fts'
           - line_range 信息正确（start_line/end_line > 0）
         """
-        with tempfile.TemporaryDirectory() as td:
-            kb_root = Path(td)
-            init_kb(kb_root, force=False)
-            paths = (kb_root / "kb_index").expanduser().resolve()
-            db_path = paths / "index.sqlite"
+        self._seed_db(
+            rel_path="notes/a.md",
+            title="A",
+            chunks=[_chunk(0, "notes/a.md", "离线优先 工具", heading="H1", start=10, end=12)],
+        )
 
-            conn = open_db(db_path)
-            try:
-                init_schema(conn)
-                rel_path = "notes/a.md"
-                doc_id = sha256_text(rel_path)
-                chunk_id = sha256_text(rel_path + "#0")
-                conn.execute("BEGIN")
-                upsert_doc_and_chunks(
-                    conn,
-                    doc_id=doc_id,
-                    rel_path=rel_path,
-                    abs_path="/abs/a.md",
-                    title="A",
-                    summary="",
-                    tags=[],
-                    keywords=[],
-                    mtime_ns=1,
-                    size=1,
-                    content_hash=sha256_text("doc"),
-                    chunks=[
-                        {
-                            "chunk_id": chunk_id,
-                            "chunk_index": 0,
-                            "heading_path": "H1",
-                            "start_line": 10,
-                            "end_line": 12,
-                            "text": "离线优先 工具",
-                            "text_hash": sha256_text("离线优先 工具"),
-                        }
-                    ],
-                    links=[],
-                )
-                conn.commit()
-            finally:
-                conn.close()
-
-            hits = search_kb(kb_root, query="离线优先", top_k=3, semantic=False, hybrid=False)
-            self.assertGreaterEqual(len(hits), 1)
-            self.assertTrue(all(isinstance(h, RetrievedChunk) for h in hits))
-            self.assertEqual(hits[0].source, "fts")
-            self.assertGreater(hits[0].start_line, 0)
-            self.assertGreaterEqual(hits[0].end_line, hits[0].start_line)
+        hits = search_kb(self.kb_root, query="离线优先", top_k=3, semantic=False, hybrid=False)
+        self.assertGreaterEqual(len(hits), 1)
+        self.assertTrue(all(isinstance(h, RetrievedChunk) for h in hits))
+        self.assertEqual(hits[0].source, "fts")
+        self.assertGreater(hits[0].start_line, 0)
+        self.assertGreaterEqual(hits[0].end_line, hits[0].start_line)
 
     def test_semantic_search_requires_embed_config(self):
         """
@@ -97,20 +143,8 @@ class TestSearchKB(unittest.TestCase):
         预期结果：
           - 抛 OpenAICompatError
         """
-        with tempfile.TemporaryDirectory() as td:
-            kb_root = Path(td)
-            init_kb(kb_root, force=False)
-
-            db_path = (kb_root / "kb_index" / "index.sqlite").expanduser().resolve()
-            conn = open_db(db_path)
-            try:
-                init_schema(conn)
-                conn.commit()
-            finally:
-                conn.close()
-
-            with self.assertRaises(OpenAICompatError):
-                search_kb(kb_root, query="q", top_k=3, semantic=True, hybrid=False)
+        with self.assertRaises(OpenAICompatError):
+            search_kb(self.kb_root, query="q", top_k=3, semantic=True, hybrid=False)
 
     def test_semantic_search_ranks_by_cosine_similarity(self):
         """
@@ -124,52 +158,18 @@ class TestSearchKB(unittest.TestCase):
           - 第一个结果为更相似的 chunk
           - source == 'vec'
         """
-        with tempfile.TemporaryDirectory() as td:
-            kb_root = Path(td)
-            init_kb(kb_root, force=False)
-
-            cfg_path = kb_root.expanduser().resolve() / "kb_config.json"
-            cfg = json.loads(cfg_path.read_text(encoding="utf-8"))
-            cfg.setdefault("openai_compat", {})
-            cfg["openai_compat"].update({"base_url": "http://x", "model_embed": "m"})
-            cfg_path.write_text(json.dumps(cfg, ensure_ascii=False), encoding="utf-8")
+        self._seed_db(
+            rel_path="d.md",
+            title="D",
+            chunks=[_chunk(0, "d.md", "good"), _chunk(1, "d.md", "bad", start=2, end=2)],
+            embeddings=[(_C0, [1.0, 0.0]), (_C1, [0.0, 1.0])],
+        )
 
-            db_path = (kb_root / "kb_index" / "index.sqlite").expanduser().resolve()
-            conn = open_db(db_path)
-            try:
-                init_schema(conn)
-                rel_path = "d.md"
-                doc_id = sha256_text(rel_path)
-                c_good = sha256_text(rel_path + "#0")
-                c_bad = sha256_text(rel_path + "#1")
-                conn.execute("BEGIN")
-                upsert_doc_and_chunks(
-                    conn,
-                    doc_id=doc_id,
-                    rel_path=rel_path,
-                    abs_path="/abs/d.md",
-                    title="D",
-                    summary="",
-                    tags=[],
-                    keywords=[],
-                    mtime_ns=1,
-                    size=1,
-                    content_hash=sha256_text("doc"),
-                    chunks=[
-                        {"chunk_id": c_good, "chunk_index": 0, "heading_path": "", "start_line": 1, "end_line": 1, "text": "good", "text_hash": sha256_text("good")},
-                        {"chunk_id": c_bad, "chunk_index": 1, "heading_path": "", "start_line": 2, "end_line": 2, "text": "bad", "text_hash": sha256_text("bad")},
-                    ],
-                    links=[],
-                )
-                upsert_embeddings(conn, model="m", embeddings=[(c_good, [1.0, 0.0]), (c_bad, [0.0, 1.0])])
-                conn.commit()
-            finally:
-                conn.close()
-
-            with patch("kb.search.embed", return_value=[[1.0, 0.0]]):
-                hits = search_kb(kb_root, query="q", top_k=2, semantic=True, hybrid=False)
-            self.assertEqual([h.chunk_id for h in hits], [c_good, c_bad])
-            self.assertEqual(hits[0].source, "vec")
+        self.mock_embed.return_value = [[1.0, 0.0]]
+        with patch("kb.search.load_config", return_value=_EMBED_CFG):
+            hits = search_kb(self.kb_root, query="q", top_k=2, semantic=True, hybrid=False)
+        self.assertEqual([h.chunk_id for h in hits], [_C0, _C1])
+        self.assertEqual(hits[0].source, "vec")
 
     def test_semantic_search_returns_empty_when_query_norm_is_zero(self):
         """
@@ -182,27 +182,10 @@ class TestSearchKB(unittest.TestCase):
         预期结果：
           - 返回 []
         """
-        with tempfile.TemporaryDirectory() as td:
-            kb_root = Path(td)
-            init_kb(kb_root, force=False)
-
-            cfg_path = kb_root.expanduser().resolve() / "kb_config.json"
-            cfg = json.loads(cfg_path.read_text(encoding="utf-8"))
-            cfg.setdefault("openai_compat", {})
-            cfg["openai_compat"].update({"base_url": "http://x", "model_embed": "m"})
-            cfg_path.write_text(json.dumps(cfg, ensure_ascii=False), encoding="utf-8")
-
-            db_path = (kb_root / "kb_index" / "index.sqlite").expanduser().resolve()
-            conn = open_db(db_path)
-            try:
-                init_schema(conn)
-                conn.commit()
-            finally:
-                conn.close()
-
-            with patch("kb.search.embed", return_value=[[0.0, 0.0]]):
-                hits = search_kb(kb_root, query="q", top_k=5, semantic=True, hybrid=False)
-            self.assertEqual(hits, [])
+        self.mock_embed.return_value = [[0.0, 0.0]]
+        with patch("kb.search.load_config", return_value=_EMBED_CFG):
+            hits = search_kb(self.kb_root, query="q", top_k=5, semantic=True, hybrid=False)
+        self.assertEqual(hits, [])
 
     def test_hybrid_falls_back_to_fts_when_no_embeddings(self):
         """
@@ -214,47 +197,17 @@ class TestSearchKB(unittest.TestCase):
         预期结果：
           - source == 'fts'
         """
-        with tempfile.TemporaryDirectory() as td:
-            kb_root = Path(td)
-            init_kb(kb_root, force=False)
-
-            cfg_path = kb_root.expanduser().resolve() / "kb_config.json"
-            cfg = json.loads(cfg_path.read_text(encoding="utf-8"))
-            cfg.setdefault("openai_compat", {})
-            cfg["openai_compat"].update({"base_url": "http://x", "model_embed": "m"})
-            cfg_path.write_text(json.dumps(cfg, ensure_ascii=False), encoding="utf-8")
+        self._seed_db(
+            rel_path="d.md",
+            title="D",
+            chunks=[_chunk(0, "d.md", "离线优先")],
+        )
 
-            db_path = (kb_root / "kb_index" / "index.sqlite").expanduser().resolve()
-            conn = open_db(db_path)
-            try:
-                init_schema(conn)
-                rel_path = "d.md"
-                doc_id = sha256_text(rel_path)
-                c0 = sha256_text(rel_path + "#0")
-                conn.execute("BEGIN")
-                upsert_doc_and_chunks(
-                    conn,
-                    doc_id=doc_id,
-                    rel_path=rel_path,
-                    abs_path="/abs/d.md",
-                    title="D",
-                    summary="",
-                    tags=[],
-                    keywords=[],
-                    mtime_ns=1,
-                    size=1,
-                    content_hash=sha256_text("doc"),
-                    chunks=[{"chunk_id": c0, "chunk_index": 0, "heading_path": "", "start_line": 1, "end_line": 1, "text": "离线优先", "text_hash": sha256_text("离线优先")}],
-                    links=[],
-                )
-                conn.commit()
-            finally:
-                conn.close()
-
-            with patch("kb.search.embed", return_value=[[1.0, 0.0]]):
-                hits = search_kb(kb_root, query="离线优先", top_k=1, semantic=False, hybrid=True)
-            self.assertEqual(len(hits), 1)
-            self.assertEqual(hits[0].source, "fts")
+        self.mock_embed.return_value = [[1.0, 0.0]]
+        with patch("kb.search.load_config", return_value=_EMBED_CFG):
+            hits = search_kb(self.kb_root, query="离线优先", top_k=1, semantic=False, hybrid=True)
+        self.assertEqual(len(hits), 1)
+        self.assertEqual(hits[0].source, "fts")
 
     def test_hybrid_marks_overlapping_candidates_as_hybrid_source(self):
         """
@@ -267,49 +220,19 @@ class TestSearchKB(unittest.TestCase):
         预期结果：
           - 返回结果 source 为 'hybrid'（至少 top1）
         """
-        with tempfile.TemporaryDirectory() as td:
-            kb_root = Path(td)
-            init_kb(kb_root, force=False)
-
-            cfg_path = kb_root.expanduser().resolve() / "kb_config.json"
-            cfg = json.loads(cfg_path.read_text(encoding="utf-8"))
-            cfg.setdefault("openai_compat", {})
-            cfg["openai_compat"].update({"base_url": "http://x", "model_embed": "m"})
-            cfg_path.write_text(json.dumps(cfg, ensure_ascii=False), encoding="utf-8")
-
-            db_path = (kb_root / "kb_index" / "index.sqlite").expanduser().resolve()
-            conn = open_db(db_path)
-            try:
-                init_schema(conn)
-                rel_path = "d.md"
-                doc_id = sha256_text(rel_path)
-                c0 = sha256_text(rel_path + "#0")
-                conn.execute("BEGIN")
-                upsert_doc_and_chunks(
-                    conn,
-                    doc_id=doc_id,
-                    rel_path=rel_path,
-                    abs_path="/abs/d.md",
-                    title="D",
-                    summary="",
-                    tags=[],
-                    keywords=[],
-                    mtime_ns=1,
-                    size=1,
-                    content_hash=sha256_text("doc"),
-                    chunks=[{"chunk_id": c0, "chunk_index": 0, "heading_path": "", "start_line": 1, "end_line": 1, "text": "离线优先", "text_hash": sha256_text("离线优先")}],
-                    links=[],
-                )
-                upsert_embeddings(conn, model="m", embeddings=[(c0, [1.0, 0.0])])
-                conn.commit()
-            finally:
-                conn.close()
-
-            with patch("kb.search.embed", return_value=[[1.0, 0.0]]):
-                hits = search_kb(kb_root, query="离线优先", top_k=1, semantic=False, hybrid=True)
-            self.assertEqual(len(hits), 1)
-            self.assertEqual(hits[0].chunk_id, c0)
-            self.assertEqual(hits[0].source, "hybrid")
+        self._seed_db(
+            rel_path="d.md",
+            title="D",
+            chunks=[{"chunk_id": _C0, "chunk_index": 0, "heading_path": "", "start_line": 1, "end_line": 1, "text": "离线优先", "text_hash": sha256_text("离线优先")}],
+            embeddings=[(_C0, [1.0, 0.0])],
+        )
+
+        self.mock_embed.return_value = [[1.0, 0.0]]
+        with patch("kb.search.load_config", return_value=_EMBED_CFG):
+            hits = search_kb(self.kb_root, query="离线优先", top_k=1, semantic=False, hybrid=True)
+        self.assertEqual(len(hits), 1)
+        self.assertEqual(hits[0].chunk_id, _C0)
+        self.assertEqual(hits[0].source, "hybrid")
 
 
 class TestSearchHelpers(unittest.TestCase):
@@ -0,0 +1,69 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from kb.semantic_cache import clear_cache, lookup_answer, store_answer
+
+
+class TestSemanticCache(unittest.TestCase):
+    def test_lookup_hits_above_threshold(self):
+        """
+        描述：当查询向量与已缓存向量的余弦相似度达到阈值时，应返回缓存的答案与引用。
+        前置条件：缓存中已写入 1 条记录。
+        测试步骤：
+          1) store_answer 写入 ("q", [1,0])
+          2) 用同向量 lookup_answer
+        预期结果：
+          - 返回 dict 含 answer/sources
+        """
+        with tempfile.TemporaryDirectory() as td:
+            vector_dir = Path(td) / "kb_vector"
+            store_answer(
+                vector_dir,
+                model_id="m",
+                query="q",
+                query_vec=[1.0, 0.0],
+                answer="A",
+                sources=[{"path": "a.md"}],
+            )
+            hit = lookup_answer(vector_dir, model_id="m", query_vec=[1.0, 0.0])
+            self.assertIsNotNone(hit)
+            self.assertEqual(hit["answer"], "A")
+            self.assertEqual(hit["sources"], [{"path": "a.md"}])
+
+    def test_lookup_misses_below_threshold_or_other_model(self):
+        """
+        描述：相似度低于阈值或 model 不同的查询不应命中缓存。
+        前置条件：缓存中已写入 ("m", [1,0])。
+        测试步骤：
+          1) 用正交向量 lookup_answer
+          2) 用相同向量但不同 model lookup_answer
+        预期结果：
+          - 两次均返回 None
+        """
+        with tempfile.TemporaryDirectory() as td:
+            vector_dir = Path(td) / "kb_vector"
+            store_answer(vector_dir, model_id="m", query="q", query_vec=[1.0, 0.0], answer="A", sources=[])
+            self.assertIsNone(lookup_answer(vector_dir, model_id="m", query_vec=[0.0, 1.0]))
+            self.assertIsNone(lookup_answer(vector_dir, model_id="m2", query_vec=[1.0, 0.0]))
+
+    def test_clear_cache_invalidates_entries(self):
+        """
+        描述：clear_cache 应清空缓存（供 index 后失效使用）。
+        前置条件：缓存中已写入 1 条记录。
+        测试步骤：
+          1) store_answer 写入
+          2) clear_cache
+          3) lookup_answer
+        预期结果：
+          - 返回 None
+        """
+        with tempfile.TemporaryDirectory() as td:
+            vector_dir = Path(td) / "kb_vector"
+            store_answer(vector_dir, model_id="m", query="q", query_vec=[1.0, 0.0], answer="A", sources=[])
+            clear_cache(vector_dir)
+            self.assertIsNone(lookup_answer(vector_dir, model_id="m", query_vec=[1.0, 0.0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
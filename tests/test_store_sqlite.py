@@ -1,6 +1,7 @@
 import sqlite3
 import tempfile
 import unittest
+from array import array
 from pathlib import Path
 
 from kb.store_sqlite import (
@@ -18,31 +19,67 @@ from kb.store_sqlite import (
 )
 from kb.util import sha256_text
 
+# 固定输入的哈希在模块加载时算一次，用例里直接引用常量
+_REL = "notes/demo.md"
+_DOC_ID = sha256_text(_REL)
+_C0 = sha256_text(_REL + "#0")
+_C1 = sha256_text(_REL + "#1")
+_DOC_HASH = sha256_text("doc")
+
+
+def _insert_doc(conn, *, rel_path, title, chunks, links=(), **doc_kw):
+    # 一次调用写完整篇文档：单事务 + 生产端 executemany 批量路径
+    kw = dict(summary="", tags=[], keywords=[], mtime_ns=1, size=1, content_hash=_DOC_HASH)
+    kw.update(doc_kw)
+    upsert_doc_and_chunks(
+        conn,
+        doc_id=sha256_text(rel_path),
+        rel_path=rel_path,
+        abs_path="/abs/" + rel_path,
+        title=title,
+        chunks=chunks,
+        links=list(links),
+        **kw,
+    )
+
 
 class TestSQLiteSchemaAndUpsert(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # 全类共用一条内存库连接：建库 + 全套 DDL（含 FTS5 虚表）只跑一次，
+        # 各用例的写入由 SAVEPOINT 包住，tearDown 回滚即还原成空库；
+        # open_db 对 :memory: 同样适用，测试不落盘
+        cls.conn = open_db(Path(":memory:"))
+        init_schema(cls.conn)
+        cls.conn.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def setUp(self):
+        self.conn.execute("SAVEPOINT t")
+
+    def tearDown(self):
+        self.conn.execute("ROLLBACK TO t")
+        self.conn.execute("RELEASE t")
+
     def test_init_schema_creates_expected_tables(self):
         """
         描述：init_schema 应创建第一版所需的核心表与 FTS5 虚表。
         前置条件：连接到新建的 SQLite 数据库。
         测试步骤：
-          1) open_db + init_schema
+          1) open_db + init_schema（由类级 fixture 完成）
           2) 查询 sqlite_master
         预期结果：
           - docs/chunks/embeddings/dirs/links/audit_log 存在
           - chunk_fts（FTS5）存在
         """
-        with tempfile.TemporaryDirectory() as td:
-            db_path = Path(td) / "index.sqlite"
-            conn = open_db(db_path)
-            try:
-                init_schema(conn)
-                rows = conn.execute("SELECT name, type FROM sqlite_master").fetchall()
-                names = {(r["name"], r["type"]) for r in rows}
-                for t in ("docs", "chunks", "embeddings", "dirs", "links", "audit_log"):
-                    self.assertIn((t, "table"), names)
-                self.assertTrue(any(n == "chunk_fts" for n, _ in names))
-            finally:
-                conn.close()
+        rows = self.conn.execute("SELECT name, type FROM sqlite_master").fetchall()
+        names = {(r["name"], r["type"]) for r in rows}
+        for t in ("docs", "chunks", "embeddings", "dirs", "links", "audit_log"):
+            self.assertIn((t, "table"), names)
+        self.assertTrue(any(n == "chunk_fts" for n, _ in names))
 
     def test_log_action_inserts_audit_row(self):
         """
@@ -55,19 +92,10 @@ class TestSQLiteSchemaAndUpsert(unittest.TestCase):
           - audit_log 行数增加
           - action 字段正确
         """
-        with tempfile.TemporaryDirectory() as td:
-            db_path = Path(td) / "index.sqlite"
-            conn = open_db(db_path)
-            try:
-                init_schema(conn)
-                conn.execute("BEGIN")
-                log_action(conn, "index", {"x": 1})
-                conn.commit()
-                row = conn.execute("SELECT action, details_json FROM audit_log ORDER BY id DESC LIMIT 1").fetchone()
-                self.assertEqual(row["action"], "index")
-                self.assertIn('"x":1', row["details_json"])
-            finally:
-                conn.close()
+        log_action(self.conn, "index", {"x": 1})
+        row = self.conn.execute("SELECT action, details_json FROM audit_log ORDER BY id DESC LIMIT 1").fetchone()
+        self.assertEqual(row["action"], "index")
+        self.assertIn('"x":1', row["details_json"])
 
     def test_upsert_dir_meta_is_idempotent(self):
         """
@@ -80,26 +108,15 @@ class TestSQLiteSchemaAndUpsert(unittest.TestCase):
           - dirs 表中仍只有 1 条记录
           - meta_hash 随 meta 变化而变化
         """
-        with tempfile.TemporaryDirectory() as td:
-            db_path = Path(td) / "index.sqlite"
-            conn = open_db(db_path)
-            try:
-                init_schema(conn)
-                conn.execute("BEGIN")
-                upsert_dir_meta(conn, dir_rel_path="notes", meta={"title": "A"})
-                conn.commit()
-                row1 = conn.execute("SELECT meta_hash FROM dirs WHERE dir_rel_path='notes'").fetchone()
-
-                conn.execute("BEGIN")
-                upsert_dir_meta(conn, dir_rel_path="notes", meta={"title": "B"})
-                conn.commit()
-                row2 = conn.execute("SELECT meta_hash FROM dirs WHERE dir_rel_path='notes'").fetchone()
-
-                self.assertNotEqual(row1["meta_hash"], row2["meta_hash"])
-                n = int(conn.execute("SELECT COUNT(*) AS n FROM dirs WHERE dir_rel_path='notes'").fetchone()["n"])
-                self.assertEqual(n, 1)
-            finally:
-                conn.close()
+        upsert_dir_meta(self.conn, dir_rel_path="notes", meta={"title": "A"})
+        row1 = self.conn.execute("SELECT meta_hash FROM dirs WHERE dir_rel_path='notes'").fetchone()
+
+        upsert_dir_meta(self.conn, dir_rel_path="notes", meta={"title": "B"})
+        row2 = self.conn.execute("SELECT meta_hash FROM dirs WHERE dir_rel_path='notes'").fetchone()
+
+        self.assertNotEqual(row1["meta_hash"], row2["meta_hash"])
+        n = int(self.conn.execute("SELECT COUNT(*) AS n FROM dirs WHERE dir_rel_path='notes'").fetchone()["n"])
+        self.assertEqual(n, 1)
 
     def test_upsert_doc_and_chunks_then_search_and_fetch(self):
         """
@@ -114,68 +131,57 @@ class TestSQLiteSchemaAndUpsert(unittest.TestCase):
           - fetch_chunk_records 返回的 rel_path/title/heading_path/text 等字段正确
           - links 表写入 2 条记录
         """
-        with tempfile.TemporaryDirectory() as td:
-            db_path = Path(td) / "index.sqlite"
-            conn = open_db(db_path)
-            try:
-                init_schema(conn)
-                rel_path = "notes/demo.md"
-                doc_id = sha256_text(rel_path)
-                chunks = [
-                    {
-                        "chunk_id": sha256_text(rel_path + "#0"),
-                        "chunk_index": 0,
-                        "heading_path": "H1",
-                        "start_line": 1,
-                        "end_line": 3,
-                        "text": "离线优先 知识库 工具",
-                        "text_hash": sha256_text("离线优先 知识库 工具"),
-                    },
-                    {
-                        "chunk_id": sha256_text(rel_path + "#1"),
-                        "chunk_index": 1,
-                        "heading_path": "H1 > H2",
-                        "start_line": 4,
-                        "end_line": 7,
-                        "text": "支持关键词检索与引用定位。",
-                        "text_hash": sha256_text("支持关键词检索与引用定位。"),
-                    },
-                ]
-                links = [{"kind": "md", "target": "https://example.com"}, {"kind": "wiki", "target": "Some Page"}]
-
-                conn.execute("BEGIN")
-                upsert_doc_and_chunks(
-                    conn,
-                    doc_id=doc_id,
-                    rel_path=rel_path,
-                    abs_path="/abs/demo.md",
-                    title="Demo",
-                    summary="S",
-                    tags=["t1"],
-                    keywords=["k1"],
-                    mtime_ns=1,
-                    size=2,
-                    content_hash=sha256_text("doc"),
-                    chunks=chunks,
-                    links=links,
-                )
-                conn.commit()
+        conn = self.conn
+        rel_path = _REL
+        chunks = [
+            {
+                "chunk_id": _C0,
+                "chunk_index": 0,
+                "heading_path": "H1",
+                "start_line": 1,
+                "end_line": 3,
+                "text": "离线优先 知识库 工具",
+                "text_hash": sha256_text("离线优先 知识库 工具"),
+            },
+            {
+                "chunk_id": _C1,
+                "chunk_index": 1,
+                "heading_path": "H1 > H2",
+                "start_line": 4,
+                "end_line": 7,
+                "text": "支持关键词检索与引用定位。",
+                "text_hash": sha256_text("支持关键词检索与引用定位。"),
+            },
+        ]
+        links = [{"kind": "md", "target": "https://example.com"}, {"kind": "wiki", "target": "Some Page"}]
 
-                hits = search_fts(conn, query="离线优先", limit=10)
-                self.assertGreaterEqual(len(hits), 1)
-                chunk_ids = [h.chunk_id for h in hits]
+        _insert_doc(conn, rel_path=rel_path, title="Demo", chunks=chunks, links=links, summary="S", tags=["t1"], keywords=["k1"], size=2)
 
-                rows = fetch_chunk_records(conn, chunk_ids=chunk_ids[:1])
-                self.assertEqual(len(rows), 1)
-                row = rows[0]
-                self.assertEqual(row["rel_path"], rel_path)
-                self.assertEqual(row["title"], "Demo")
-                self.assertTrue(row["text"])
+        hits = search_fts(conn, query="离线优先", limit=10)
+        self.assertGreaterEqual(len(hits), 1)
+        chunk_ids = [h.chunk_id for h in hits]
 
-                link_count = conn.execute("SELECT COUNT(*) AS n FROM links WHERE source_rel_path=?", (rel_path,)).fetchone()["n"]
-                self.assertEqual(int(link_count), 2)
-            finally:
-                conn.close()
+        # 锁定查询计划：按表名 MATCH 必须走 FTS5 索引（0:M...），
+        # 防止退化成对虚表的线性扫描
+        plan = " ".join(
+            row[3]
+            for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT chunk_id, bm25(chunk_fts) AS score"
+                " FROM chunk_fts WHERE chunk_fts MATCH ? ORDER BY score LIMIT ?",
+                ("离线优先", 10),
+            )
+        )
+        self.assertIn("VIRTUAL TABLE INDEX 0:M", plan)
+
+        rows = fetch_chunk_records(conn, chunk_ids=chunk_ids[:1])
+        self.assertEqual(len(rows), 1)
+        row = rows[0]
+        self.assertEqual(row["rel_path"], rel_path)
+        self.assertEqual(row["title"], "Demo")
+        self.assertTrue(row["text"])
+
+        link_count = conn.execute("SELECT COUNT(*) AS n FROM links WHERE source_rel_path=?", (rel_path,)).fetchone()["n"]
+        self.assertEqual(int(link_count), 2)
 
     def test_delete_doc_removes_chunks_fts_and_embeddings(self):
         """
@@ -188,51 +194,32 @@ class TestSQLiteSchemaAndUpsert(unittest.TestCase):
         预期结果：
           - docs/chunks/embeddings/chunk_fts 均无该文档相关记录
         """
-        with tempfile.TemporaryDirectory() as td:
-            db_path = Path(td) / "index.sqlite"
-            conn = open_db(db_path)
-            try:
-                init_schema(conn)
-                rel_path = "notes/demo.md"
-                doc_id = sha256_text(rel_path)
-                c0 = sha256_text(rel_path + "#0")
-                c1 = sha256_text(rel_path + "#1")
-                chunks = [
-                    {"chunk_id": c0, "chunk_index": 0, "heading_path": "", "start_line": 1, "end_line": 1, "text": "hello world", "text_hash": sha256_text("hello world")},
-                    {"chunk_id": c1, "chunk_index": 1, "heading_path": "", "start_line": 2, "end_line": 2, "text": "another line", "text_hash": sha256_text("another line")},
-                ]
-
-                conn.execute("BEGIN")
-                upsert_doc_and_chunks(
-                    conn,
-                    doc_id=doc_id,
-                    rel_path=rel_path,
-                    abs_path="/abs/demo.md",
-                    title="Demo",
-                    summary="",
-                    tags=[],
-                    keywords=[],
-                    mtime_ns=1,
-                    size=1,
-                    content_hash=sha256_text("doc"),
-                    chunks=chunks,
-                    links=[],
-                )
-                upsert_embeddings(conn, model="m", embeddings=[(c0, [1.0, 0.0]), (c1, [0.0, 1.0])])
-                conn.commit()
+        conn = self.conn
+        rel_path = _REL
+        c0 = _C0
+        c1 = _C1
+        chunks = [
+            {"chunk_id": c0, "chunk_index": 0, "heading_path": "", "start_line": 1, "end_line": 1, "text": "hello world", "text_hash": sha256_text("hello world")},
+            {"chunk_id": c1, "chunk_index": 1, "heading_path": "", "start_line": 2, "end_line": 2, "text": "another line", "text_hash": sha256_text("another line")},
+        ]
 
-                self.assertEqual(conn.execute("SELECT COUNT(*) AS n FROM embeddings").fetchone()["n"], 2)
+        _insert_doc(conn, rel_path=rel_path, title="Demo", chunks=chunks)
+        upsert_embeddings(conn, model="m", embeddings=[(c0, [1.0, 0.0]), (c1, [0.0, 1.0])])
 
-                conn.execute("BEGIN")
-                delete_doc(conn, doc_id=doc_id)
-                conn.commit()
+        self.assertEqual(conn.execute("SELECT COUNT(*) AS n FROM embeddings").fetchone()["n"], 2)
 
-                self.assertEqual(conn.execute("SELECT COUNT(*) AS n FROM docs").fetchone()["n"], 0)
-                self.assertEqual(conn.execute("SELECT COUNT(*) AS n FROM chunks").fetchone()["n"], 0)
-                self.assertEqual(conn.execute("SELECT COUNT(*) AS n FROM embeddings").fetchone()["n"], 0)
-                self.assertEqual(conn.execute("SELECT COUNT(*) AS n FROM chunk_fts WHERE rel_path=?",(rel_path,)).fetchone()["n"], 0)
-            finally:
-                conn.close()
+        delete_doc(conn, doc_id=_DOC_ID)
+
+        # 四张表的残留计数并成一条查询，逐列断言保持定位粒度
+        n_docs, n_chunks, n_embeddings, n_fts = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM docs), (SELECT COUNT(*) FROM chunks),"
+            " (SELECT COUNT(*) FROM embeddings), (SELECT COUNT(*) FROM chunk_fts WHERE rel_path=?)",
+            (rel_path,),
+        ).fetchone()
+        self.assertEqual(n_docs, 0)
+        self.assertEqual(n_chunks, 0)
+        self.assertEqual(n_embeddings, 0)
+        self.assertEqual(n_fts, 0)
 
 
 class TestEmbeddingsHelpers(unittest.TestCase):
@@ -247,30 +234,113 @@ class TestEmbeddingsHelpers(unittest.TestCase):
         预期结果：
           - dim 与输入一致
           - norm > 0
-          - read_embedding 后的数值与输入近似相等
+          - read_embedding 后的数值与输入近似相等（含 128 维真实尺寸向量）
+        """
+        # 1/8 的整数倍可被 float32 精确表示，整向量比较不引入量化噪声
+        vec128 = [(i - 64) / 8.0 for i in range(128)]
+        conn = open_db(Path(":memory:"))
+        try:
+            init_schema(conn)
+            # 单笔写入交给 _autocommit 包事务，不必手写 BEGIN/COMMIT
+            upsert_embeddings(conn, model="m", embeddings=[("c0", [3.0, 4.0]), ("c1", vec128)])
+
+            items = {row[0]: row[1:] for row in iter_embeddings(conn, model="m")}
+            self.assertEqual(set(items), {"c0", "c1"})
+            dim, blob, norm, scale = items["c0"]
+            self.assertEqual(dim, 2)
+            self.assertAlmostEqual(norm, 5.0, places=5)
+            self.assertEqual(scale, 0.0)
+
+            arr = read_embedding(blob)
+            self.assertEqual(len(arr), 2)
+            # 整向量一次性比较最大误差，免去逐元素断言
+            self.assertLess(max(abs(a - b) for a, b in zip(arr, [3.0, 4.0])), 1e-5)
+
+            dim128, blob128, _, _ = items["c1"]
+            self.assertEqual(dim128, 128)
+            self.assertLess(max(abs(a - b) for a, b in zip(read_embedding(blob128), vec128)), 1e-5)
+        finally:
+            conn.close()
+
+    def test_upsert_embeddings_int8_quantization_roundtrip(self):
+        """
+        描述：quantization="int8" 时应存 int8 BLOB 与 per-vector scale，反量化后数值近似。
+        前置条件：已 init_schema。
+        测试步骤：
+          1) upsert_embeddings(quantization="int8") 写入向量
+          2) iter_embeddings 读出 scale > 0
+          3) read_embedding(blob, scale=scale) 解码，乘回 scale 与原值比较
+        预期结果：
+          - BLOB 长度等于 dim（每维 1 字节）
+          - norm 仍为原始 float 向量的范数
+          - 反量化误差在 1% 以内
+        """
+        conn = open_db(Path(":memory:"))
+        try:
+            init_schema(conn)
+            upsert_embeddings(conn, model="m", embeddings=[("c0", [3.0, -4.0])], quantization="int8")
+
+            items = list(iter_embeddings(conn, model="m"))
+            self.assertEqual(len(items), 1)
+            _, dim, blob, norm, scale = items[0]
+            self.assertEqual(dim, 2)
+            self.assertEqual(len(blob), 2)
+            self.assertGreater(scale, 0.0)
+            self.assertAlmostEqual(norm, 5.0, places=5)
+
+            arr = read_embedding(blob, scale=scale)
+            self.assertAlmostEqual(float(arr[0]) * scale, 3.0, delta=0.03)
+            self.assertAlmostEqual(float(arr[1]) * scale, -4.0, delta=0.04)
+        finally:
+            conn.close()
+
+    def test_open_db_migrates_missing_scale_column(self):
+        """
+        描述：旧版库的 embeddings 表没有 scale 列，open_db 应就地补列，读路径无需先跑 init_schema。
+        前置条件：磁盘库按旧 schema 手工建 embeddings 表并写入一行。
+        测试步骤：
+          1) 直接用 sqlite3 建无 scale 列的 embeddings 表
+          2) 用 open_db 重新打开
+          3) 调用 iter_embeddings
+        预期结果：
+          - 不抛 no such column: scale
+          - 旧行的 scale 读出为 0.0（float32 未量化）
         """
         with tempfile.TemporaryDirectory() as td:
             db_path = Path(td) / "index.sqlite"
+            old = sqlite3.connect(str(db_path))
+            old.execute(
+                """
+                CREATE TABLE embeddings (
+                  chunk_id TEXT NOT NULL,
+                  model TEXT NOT NULL,
+                  dim INTEGER NOT NULL,
+                  embedding BLOB NOT NULL,
+                  norm REAL NOT NULL,
+                  created_at TEXT NOT NULL,
+                  PRIMARY KEY (chunk_id, model)
+                )
+                """
+            )
+            blob = array("f", [3.0, 4.0]).tobytes()
+            old.execute(
+                "INSERT INTO embeddings(chunk_id, model, dim, embedding, norm, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                ("c0", "m", 2, blob, 5.0, "t"),
+            )
+            old.commit()
+            old.close()
+
             conn = open_db(db_path)
             try:
-                init_schema(conn)
-                conn.execute("BEGIN")
-                upsert_embeddings(conn, model="m", embeddings=[("c0", [3.0, 4.0])])
-                conn.commit()
-
                 items = list(iter_embeddings(conn, model="m"))
-                self.assertEqual(len(items), 1)
-                chunk_id, dim, blob, norm = items[0]
-                self.assertEqual(chunk_id, "c0")
-                self.assertEqual(dim, 2)
-                self.assertAlmostEqual(norm, 5.0, places=5)
-
-                arr = read_embedding(blob)
-                self.assertEqual(len(arr), 2)
-                self.assertAlmostEqual(float(arr[0]), 3.0, places=5)
-                self.assertAlmostEqual(float(arr[1]), 4.0, places=5)
             finally:
                 conn.close()
+            self.assertEqual(len(items), 1)
+            chunk_id, dim, _, norm, scale = items[0]
+            self.assertEqual(chunk_id, "c0")
+            self.assertEqual(dim, 2)
+            self.assertAlmostEqual(norm, 5.0, places=5)
+            self.assertEqual(scale, 0.0)
 
     def test_fetch_chunk_records_preserves_input_order(self):
         """
@@ -281,41 +351,24 @@ class TestEmbeddingsHelpers(unittest.TestCase):
         预期结果：
           - 返回 rows 的 chunk_id 顺序与输入一致
         """
-        with tempfile.TemporaryDirectory() as td:
-            db_path = Path(td) / "index.sqlite"
-            conn = open_db(db_path)
-            try:
-                init_schema(conn)
-                rel_path = "a.md"
-                doc_id = sha256_text(rel_path)
-                c0 = sha256_text(rel_path + "#0")
-                c1 = sha256_text(rel_path + "#1")
-                chunks = [
-                    {"chunk_id": c0, "chunk_index": 0, "heading_path": "", "start_line": 1, "end_line": 1, "text": "x", "text_hash": sha256_text("x")},
-                    {"chunk_id": c1, "chunk_index": 1, "heading_path": "", "start_line": 2, "end_line": 2, "text": "y", "text_hash": sha256_text("y")},
-                ]
-                conn.execute("BEGIN")
-                upsert_doc_and_chunks(
-                    conn,
-                    doc_id=doc_id,
-                    rel_path=rel_path,
-                    abs_path="/abs/a.md",
-                    title="A",
-                    summary="",
-                    tags=[],
-                    keywords=[],
-                    mtime_ns=1,
-                    size=1,
-                    content_hash=sha256_text("doc"),
-                    chunks=chunks,
-                    links=[],
-                )
-                conn.commit()
+        conn = open_db(Path(":memory:"))
+        try:
+            init_schema(conn)
+            rel_path = "a.md"
+            c0 = sha256_text(rel_path + "#0")
+            c1 = sha256_text(rel_path + "#1")
+            chunks = [
+                {"chunk_id": c0, "chunk_index": 0, "heading_path": "", "start_line": 1, "end_line": 1, "text": "x", "text_hash": sha256_text("x")},
+                {"chunk_id": c1, "chunk_index": 1, "heading_path": "", "start_line": 2, "end_line": 2, "text": "y", "text_hash": sha256_text("y")},
+            ]
+            conn.execute("BEGIN")
+            _insert_doc(conn, rel_path=rel_path, title="A", chunks=chunks)
+            conn.commit()
 
-                rows = fetch_chunk_records(conn, chunk_ids=[c1, c0])
-                self.assertEqual([r["chunk_id"] for r in rows], [c1, c0])
-            finally:
-                conn.close()
+            rows = fetch_chunk_records(conn, chunk_ids=[c1, c0])
+            self.assertEqual([r["chunk_id"] for r in rows], [c1, c0])
+        finally:
+            conn.close()
 
 
 if __name__ == "__main__":
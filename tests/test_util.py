@@ -7,6 +7,7 @@ from typing import Optional
 
 from kb.util import (
     ensure_rel_under_base,
+    fast_content_hash,
     getenv_trim,
     json_dumps_compact,
     now_iso,
@@ -20,44 +21,32 @@ from kb.util import (
 
 
 class TestEnsureRelUnderBase(unittest.TestCase):
-    def test_empty_and_dot_become_empty(self):
+    def test_normalization_cases(self):
         """
-        描述：空串与 '.' 应被规范化为 ''。
+        描述：ensure_rel_under_base 的规范化与防穿越行为（表驱动）。
         前置条件：无。
         测试步骤：
-          1) ensure_rel_under_base("")
-          2) ensure_rel_under_base(".")
+          1) 按 (输入, 期望或异常) 表逐项调用
         预期结果：
-          - 均返回 ""
-        """
-        self.assertEqual(ensure_rel_under_base(""), "")
-        self.assertEqual(ensure_rel_under_base("."), "")
-
-    def test_normalizes_slashes_and_strips_leading(self):
-        """
-        描述：应移除前导 '/'，并将 '\\\\' 归一为 '/'。
-        前置条件：无。
-        测试步骤：
-          1) 传入包含前导 '/' 与 '\\\\' 的路径
-        预期结果：
-          - 返回无前导 '/' 且分隔符为 '/'
-        """
-        self.assertEqual(ensure_rel_under_base("/a/b"), "a/b")
-        self.assertEqual(ensure_rel_under_base("\\a\\b\\c"), "a/b/c")
-
-    def test_rejects_parent_directory(self):
-        """
-        描述：包含 '..' 的相对路径应抛 ValueError，防止目录穿越。
-        前置条件：无。
-        测试步骤：
-          1) 传入 '../x'、'a/../b'
-        预期结果：
-          - 抛 ValueError
-        """
-        with self.assertRaises(ValueError):
-            ensure_rel_under_base("../x")
-        with self.assertRaises(ValueError):
-            ensure_rel_under_base("a/../b")
+          - 空串与 '.' 归一为 ''
+          - 前导 '/' 被移除，'\\' 归一为 '/'
+          - 含 '..' 的路径抛 ValueError
+        """
+        cases = [
+            ("", ""),
+            (".", ""),
+            ("/a/b", "a/b"),
+            ("\\a\\b\\c", "a/b/c"),
+            ("../x", ValueError),
+            ("a/../b", ValueError),
+        ]
+        for inp, expected in cases:
+            with self.subTest(inp=inp):
+                if isinstance(expected, type) and issubclass(expected, Exception):
+                    with self.assertRaises(expected):
+                        ensure_rel_under_base(inp)
+                else:
+                    self.assertEqual(ensure_rel_under_base(inp), expected)
 
 
 class TestWriteTextAtomic(unittest.TestCase):
@@ -130,6 +119,22 @@ class TestOtherUtils(unittest.TestCase):
         self.assertEqual(sha256_text(t), sha256_bytes(t.encode("utf-8")))
         self.assertEqual(len(sha256_text(t)), 64)
 
+    def test_fast_content_hash_stable_and_distinct(self):
+        """
+        描述：fast_content_hash 对相同输入应稳定，对不同输入应不同。
+        前置条件：无。
+        测试步骤：
+          1) 对同一 bytes 调用两次
+          2) 对不同 bytes 各调用一次
+        预期结果：
+          - 相同输入输出一致，为 32 位 hex（blake2b-128）
+          - 不同输入输出不同
+        """
+        a = fast_content_hash(b"hello")
+        self.assertEqual(a, fast_content_hash(b"hello"))
+        self.assertEqual(len(a), 32)
+        self.assertNotEqual(a, fast_content_hash(b"hello!"))
+
     def test_write_json_atomic_and_read_json_round_trip(self):
         """
         描述：write_json_atomic 应原子写入 JSON，且可被 read_json 读取。